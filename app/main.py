@@ -1,56 +1,438 @@
-from fastapi import FastAPI, HTTPException
+import time
+_T_IMPORT = time.perf_counter()     # import / first-request timings start here
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
 from models.scene import PostData
-from google.cloud import storage
-from services.scene_builder import build_scene, cleanup_temp_files
-from services.batch_submit import submit
+from pydantic import ValidationError
+from services.scene_builder import BuildResult, build_scene, build_scenes, cleanup_temp_files
+from services.batch_submit import RenderTask, get_coalescer, preview_for
+from services.asset_cache import get_asset_cache
+from services.tool_cache import get_tool_cache
+from services.http_fetch import get_fetcher
+from services.blender_pool import get_blender_pool
+from services.jobs import JobQueue, JobRecord, Job, make_backend, FAILED
+from services.admission import get_admission
+from services.uploader import get_uploader
+from services.workspace import get_workspaces
+from services.warmup import get_warmup
+from services import blender_log, build_cache, metrics
+from services.compute_profile import select_profile
 from settings import settings
-import logging
+from contextlib import ExitStack
+import asyncio, json, logging
 
 logger = logging.getLogger("main")
+get_warmup().imported(_T_IMPORT)
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def warm_tool_cache():
+    # first fill happens in the background; jobs arriving earlier fetch on demand
+    get_tool_cache().start()
+    get_workspaces().start()     # sweeps job dirs left by a crashed instance before jobs resume
+    pool = get_blender_pool()
+    pool_started = asyncio.create_task(_start_pool(pool)) if pool else None
+    jobs.start()
+    get_warmup().start(pool_started)
+
+async def _start_pool(pool):
+    try:
+        await pool.start()
+    except Exception as e:
+        logger.error("Blender worker pool failed to start: %s", e)
+
+@app.on_event("shutdown")
+async def stop_tool_cache():
+    await get_warmup().stop()
+    await jobs.stop()
+    await get_workspaces().stop()
+    await get_tool_cache().stop()
+    pool = get_blender_pool()
+    if pool:
+        await pool.stop()
+    await get_fetcher().close()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Cloud Run"""
     return {"status": "healthy", "service": "blender-api"}
 
-@app.post("/render")
-async def render(data: PostData):
+@app.get("/ready")
+async def readiness_check():
+    """503 until the startup warm-up is done, then 200; both carry the startup timings"""
+    warmup = get_warmup()
+    return JSONResponse(status_code=200 if warmup.ready else 503,
+                        content={"status": "ready" if warmup.ready else "warming",
+                                 **warmup.report()})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Model asset cache counters, used to size the cache"""
+    cache = get_asset_cache()
+    return {
+        "models": cache.snapshot() if cache else {"enabled": False},
+        "tools":  get_tool_cache().versions(),
+        "builds": vars(build_cache.stats),
+        "scratch": get_workspaces().snapshot(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, transfer counters and queue gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Parsed payloads of queued jobs, so the worker doesn't decode them a second time.
+# Jobs restored from the SQLite backend aren't here and re-parse their payload.
+_parsed: dict[str, PostData] = {}
+
+def _parse_post(body: bytes) -> PostData:
+    # Validated straight from the bytes (no intermediate dict / list tree);
+    # errors keep FastAPI's 422 shape.
+    try:
+        return PostData.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+@app.post("/render", status_code=202, openapi_extra={"requestBody": {
+    "required": True,
+    "content": {"application/json": {"schema": PostData.model_json_schema()}},
+}})
+async def render(request: Request):
+    """Queue a build; poll the returned status URL for progress."""
+    t0 = time.perf_counter()
+    data = _parse_post(await request.body())
     # Use render_job_id as the only ID throughout the system
     render_job_id = str(data.render_job_id)
-    
+    admission = get_admission()
+    if admission and not admission.has_room(jobs.depth):
+        existing = jobs.get(render_job_id)
+        if existing is None or existing.status == FAILED:
+            # backlog full: let the caller (or another instance) take it later
+            retry_after = admission.reject(jobs.depth)
+            logger.info("Rejected render_job_id=%s: %d jobs waiting, retry after %ds",
+                           render_job_id, jobs.depth + admission.waiting, retry_after)
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+                content={"render_job_id": render_job_id, "status": "rejected",
+                         "detail": "Render queue full", "retry_after_s": retry_after},
+            )
+    rec, created = jobs.enqueue(render_job_id, data.model_dump_json(by_alias=True))
+    if created:
+        _parsed[render_job_id] = data
+    else:
+        logger.info("Duplicate /render for render_job_id=%s (status %s)", render_job_id, rec.status)
+    get_warmup().note_first_request("/render", time.perf_counter() - t0)
+    status_url = f"/render/{render_job_id}"
+    return JSONResponse(
+        status_code=202,
+        headers={"Location": status_url},
+        content={
+            "render_job_id": render_job_id,
+            "status": rec.status,
+            "status_url": status_url,
+            "duplicate": not created,
+        },
+    )
+
+@app.post("/render/batch", status_code=202, openapi_extra={"requestBody": {
+    "required": True,
+    "content": {"application/json": {"schema": {
+        "type": "array", "items": PostData.model_json_schema(),
+        "maxItems": settings.render_batch_max_items}}},
+}})
+async def render_batch(request: Request):
+    """
+    Queue several renders to build together: shared asset downloads and
+    Blender sessions, one joint Batch submission.  Every item gets its own
+    status URL; invalid items are reported and skipped.
+    """
+    try:
+        items = json.loads(await request.body())
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",),
+                                       "msg": f"JSON decode error: {e}", "input": None}])
+    if not isinstance(items, list) or not 0 < len(items) <= settings.render_batch_max_items:
+        raise RequestValidationError([{"type": "list_type", "loc": ("body",),
+                                       "msg": f"Expected a list of 1-{settings.render_batch_max_items} renders",
+                                       "input": None}])
+
+    out: list[dict] = []
+    valid: list[tuple[int, PostData]] = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, PostData.model_validate(item)))
+        except ValidationError as e:
+            out.append({"index": i, "status": "invalid", "errors": jsonable_encoder(
+                [{**err, "loc": ("body", i, *err["loc"])} for err in e.errors(include_url=False)])})
+    if not valid:
+        return JSONResponse(status_code=422, content={"items": out})
+
+    admission = get_admission()
+    if admission and not admission.has_room(jobs.depth):
+        existing = [jobs.get(str(d.render_job_id)) for _, d in valid]
+        if any(r is None or r.status == FAILED for r in existing):
+            retry_after = admission.reject(jobs.depth)
+            logger.info("Rejected batch of %d renders: %d jobs waiting, retry after %ds",
+                        len(valid), jobs.depth + admission.waiting, retry_after)
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+                content={"status": "rejected", "detail": "Render queue full",
+                         "retry_after_s": retry_after},
+            )
+
+    queued = jobs.enqueue_batch([(str(d.render_job_id), d.model_dump_json(by_alias=True))
+                                 for _, d in valid])
+    for (i, data), (rec, created) in zip(valid, queued):
+        if created:
+            _parsed[rec.render_job_id] = data
+        out.append({"index": i, "render_job_id": rec.render_job_id, "status": rec.status,
+                    "status_url": f"/render/{rec.render_job_id}", "duplicate": not created})
+    out.sort(key=lambda r: r["index"])
+    return JSONResponse(status_code=202, content={"items": out})
+
+@app.get("/render/{render_job_id}")
+async def render_status(render_job_id: str):
+    rec = jobs.get(render_job_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown render_job_id {render_job_id}")
+    body = rec.public()
+    # live Blender progress (load / append / save / pass / sample events) of the build
+    body["progress"] = blender_log.progress(render_job_id)
+    return body
+
+@app.get("/admission")
+async def admission_state():
+    """Instance budget, estimates of the running builds, waiting / rejected counters"""
+    admission = get_admission()
+    return admission.snapshot() if admission else {"enabled": False}
+
+async def _upload(result: BuildResult, render_job_id: str, data: PostData, cost=None):
+    """
+    Built (or reused) .blend → GCS; returns (build result, uri, upload stats,
+    build-cache info).  When the cached .blend can't be copied the scene is
+    built after all (admitted again with ``cost``) and that result returned.
+    """
+    object_name = f"renders/{render_job_id}/{render_job_id}.blend"
+    if result.reused:
+        try:
+            uri = await build_cache.reuse(result.reused, object_name)
+        except Exception as e:
+            logger.warning("Build cache copy for render_job_id=%s failed, building instead: %s",
+                           render_job_id, e)
+            result = await _rebuild(data, render_job_id, cost)
+    if result.reused:
+        upload = None
+        cache_info = {"hit": True, "source": result.reused["object"],
+                      "saved_seconds": round(result.reused["build_seconds"], 1)}
+        build_cache.stats.hits += 1
+        build_cache.stats.saved_seconds += result.reused["build_seconds"]
+    else:
+        upload = await get_uploader().upload(
+            result.blend, object_name,
+            metadata={"tool_version": result.tool_version})
+        uri = upload.uri
+        cache_info = {"hit": False, "saved_seconds": 0.0}
+        if result.fingerprint:
+            build_cache.stats.misses += 1
+            await build_cache.record(result.fingerprint, object_name, result.seconds,
+                                     upload.bytes)
+    cache_info["fingerprint"] = result.fingerprint
+    return result, uri, upload, cache_info
+
+async def _rebuild(data: PostData, render_job_id: str, cost) -> BuildResult:
+    """Build skipping the cache; runs Blender, so it goes through admission again."""
+    admission = get_admission()
+    if admission and cost:
+        await admission.admit(render_job_id, cost)
     try:
-        local_blend = await build_scene(data, render_job_id)
+        return await build_scene(data, render_job_id, use_cache=False)
+    finally:
+        if admission and cost:
+            admission.release(render_job_id)
 
-        # upload
-        uri = await _upload(local_blend, render_job_id)
+def _blend_bytes(result: BuildResult, upload) -> int:
+    """Size of the .blend the render loads – also on build-cache hits (profile selection)."""
+    return upload.bytes if upload else (result.reused or {}).get("bytes", 0)
 
-        # fire-and-forget submit
-        batch_job_name = submit(render_job_id, uri, data.webhook)
+def _result(result: BuildResult, uri: str, batch_job_name: str, upload, cache_info: dict,
+            estimate, scratch_bytes: int, cost, preview: tuple[int, int] | None) -> dict:
+    blender_s = sum(p["seconds"] for p in result.passes)
+    return {
+        "blend": uri,
+        "batch_job": batch_job_name,
+        "tool_version": result.tool_version,
+        "downloads": result.downloads,
+        "passes": result.passes,
+        "upload": upload.public() if upload else None,
+        "build_cache": cache_info,
+        # handoff .blend: before / after optimisation sizes and timings
+        "artifact": result.artifact,
+        "compute": estimate.public(),
+        "scratch_bytes": scratch_bytes,
+        "admission": cost.public() if cost else None,
+        # quick first image, uploaded to renders/<id>/preview/ before the full render
+        "preview": {"samples": preview[0], "resolution_pct": preview[1]} if preview else None,
+        # breakdown of the build stage; per-stage totals are in the job's "timings"
+        "timings": {
+            "download": round(result.download_seconds, 3),
+            "blender":  round(blender_s, 3),
+            "build_other": round(result.seconds - result.download_seconds - blender_s, 3),
+            "upload":   round(upload.seconds, 3) if upload else 0.0,
+        },
+    }
+
+async def _process(rec: JobRecord, job: Job) -> dict:
+    """download → Blender → upload → Batch submit for one queued job."""
+    render_job_id = rec.render_job_id
+    data = _parsed.pop(render_job_id, None) or PostData.model_validate_json(rec.payload)
+
+    workspaces, admission = get_workspaces(), get_admission()
+    cost = None
+    try:
+        # CPU / memory estimate from object count, model sizes (HEAD) and is360
+        if admission:
+            with job.stage("admission"):
+                cost = await admission.estimate(data)
+                await admission.admit(render_job_id, cost)
+        # /tmp is instance memory: wait for scratch room (or fail) before downloading
+        with job.stage("scratch"):
+            await workspaces.acquire(render_job_id, len(data.scene_objects),
+                                     estimate=cost.scratch_mb * 1024 * 1024 if cost else None)
+        with job.stage("build"):
+            result = await build_scene(data, render_job_id)
+        get_warmup().note_build(result.seconds)
+        if admission:
+            admission.release(render_job_id)      # Blender is done; upload / submit are light
+        scratch_bytes = await workspaces.measure(render_job_id, len(data.scene_objects))
+
+        with job.stage("upload"):
+            result, uri, upload, cache_info = await _upload(result, render_job_id, data, cost)
+
+        # fire-and-forget submit; may share one Batch job with renders arriving alongside
+        with job.stage("submit"):
+            estimate = select_profile(data, _blend_bytes(result, upload))
+            preview = preview_for(data)
+            batch_job_name = await get_coalescer().submit(
+                RenderTask(render_job_id, uri, data.webhook, data.samples, estimate, preview))
 
         logger.info(f"Successfully submitted render job for render_job_id=%s", render_job_id)
-        return {
-            "render_job_id": render_job_id,
-            "blend": uri,
-            "batch_job": batch_job_name,
-            "status": "submitted",
-        }
-        
-    except Exception as e:
-        logger.error(f"Error processing render job for render_job_id=%s: %s", render_job_id, e)
-        raise HTTPException(status_code=500, detail=f"Render job failed: {str(e)}")
+        return _result(result, uri, batch_job_name, upload, cache_info, estimate,
+                       scratch_bytes, cost, preview)
     finally:
+        if admission:
+            admission.release(render_job_id)
         # Always cleanup temporary files, even if there was an error
         try:
-            cleanup_temp_files(render_job_id)
+            with job.stage("cleanup"):
+                cleanup_temp_files(render_job_id)
             logger.info(f"Cleaned up temporary files for render_job_id=%s", render_job_id)
         except Exception as cleanup_error:
             logger.warning(f"Failed to cleanup temp files for render_job_id=%s: %s", render_job_id, cleanup_error)
 
-async def _upload(path, render_job_id):
-    client = storage.Client(project=settings.project_id)
-    bucket = client.bucket(settings.bucket)
-    blob   = bucket.blob(f"renders/{render_job_id}/{render_job_id}.blend")
-    blob.upload_from_filename(path)
-    return f"gs://{settings.bucket}/renders/{render_job_id}/{render_job_id}.blend"
+def _stages(handles: list[Job], name: str) -> ExitStack:
+    """One stage entered on every job of a group."""
+    stack = ExitStack()
+    for job in handles:
+        stack.enter_context(job.stage(name))
+    return stack
+
+async def _process_batch(recs: list[JobRecord], handles: list[Job]) -> list[dict | Exception]:
+    """
+    /render/batch: assets downloaded once for the group, Blender sessions
+    shared, uploads side by side, one joint Batch submission.  An item that
+    fails gets its exception back; the others carry on.
+    """
+    ids  = [r.render_job_id for r in recs]
+    data = [_parsed.pop(r.render_job_id, None) or PostData.model_validate_json(r.payload)
+            for r in recs]
+    out: list[dict | Exception | None] = [None] * len(recs)
+    workspaces, admission = get_workspaces(), get_admission()
+    group_id = f"batch-{ids[0]}"
+    costs = [None] * len(recs)
+
+    def live() -> list[int]:
+        return [i for i, r in enumerate(out) if r is None]
+
+    def settle(idx: list[int], results: list, stage: str):
+        for i, r in zip(idx, results):
+            if isinstance(r, Exception):
+                out[i] = r
+                handles[i].rec.stages[stage]["status"] = FAILED
+
+    try:
+        if admission:
+            with _stages(handles, "admission"):
+                costs = list(await asyncio.gather(*(admission.estimate(d) for d in data)))
+                await admission.admit(group_id, admission.combine(
+                    costs, settings.render_batch_sessions))
+
+        async def scratch(i: int):
+            with handles[i].stage("scratch"):
+                await workspaces.acquire(
+                    ids[i], len(data[i].scene_objects),
+                    estimate=costs[i].scratch_mb * 1024 * 1024 if costs[i] else None)
+        idx = live()
+        for i, r in zip(idx, await asyncio.gather(*(scratch(i) for i in idx),
+                                                  return_exceptions=True)):
+            if isinstance(r, Exception):
+                out[i] = r
+
+        idx = live()
+        with _stages([handles[i] for i in idx], "build"):
+            built = await build_scenes([(data[i], ids[i]) for i in idx])
+        settle(idx, built, "build")
+        results = dict(zip(idx, built))
+        if admission:
+            admission.release(group_id)
+        if live():
+            get_warmup().note_build(min(results[i].seconds for i in live()))
+
+        async def upload(i: int):
+            scratch_bytes = await workspaces.measure(ids[i], len(data[i].scene_objects))
+            with handles[i].stage("upload"):
+                results[i], *uploaded = await _upload(results[i], ids[i], data[i], costs[i])
+                return (*uploaded, scratch_bytes)
+        idx = live()
+        uploads = await asyncio.gather(*(upload(i) for i in idx), return_exceptions=True)
+        for i, r in zip(idx, uploads):
+            if isinstance(r, Exception):
+                out[i] = r
+        uploads = {i: r for i, r in zip(idx, uploads) if not isinstance(r, Exception)}
+
+        idx = live()
+        with _stages([handles[i] for i in idx], "submit"):
+            estimates = {i: select_profile(data[i], _blend_bytes(results[i], uploads[i][1]))
+                         for i in idx}
+            previews = {i: preview_for(data[i]) for i in idx}
+            names = await get_coalescer().submit_group(
+                [RenderTask(ids[i], uploads[i][0], data[i].webhook, data[i].samples, estimates[i],
+                            previews[i]) for i in idx])
+        settle(idx, names, "submit")
+        for i, name in zip(idx, names):
+            if not isinstance(name, Exception):
+                uri, up, cache_info, scratch_bytes = uploads[i]
+                out[i] = _result(results[i], uri, name, up, cache_info, estimates[i],
+                                 scratch_bytes, costs[i], previews[i])
+        logger.info("Batch of %d renders: %d submitted, %d failed", len(out),
+                    sum(isinstance(r, dict) for r in out), sum(isinstance(r, Exception) for r in out))
+        return out
+    finally:
+        if admission:
+            admission.release(group_id)
+        for rid, job in zip(ids, handles):
+            try:
+                with job.stage("cleanup"):
+                    cleanup_temp_files(rid)
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to cleanup temp files for render_job_id=%s: %s", rid, cleanup_error)
+
+jobs = JobQueue(make_backend(), _process, settings.job_workers, group_runner=_process_batch)
+
+metrics.Gauge("render_jobs_queued", "Jobs waiting for a worker", fn=lambda: jobs.depth)
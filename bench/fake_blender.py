@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the Blender executable (``BLENDER_EXE_LOCATION``) used by the
+benchmark.  Understands the three ways the service launches Blender:
+
+    blender <base.blend> -b -P blender_chain.py  -- <chain.json>     single session
+    blender -b -P blender_chain.py -- --batch <batch.json>            shared batch session
+    blender -b -P blender_worker.py                                   warm pool worker
+    blender <src.blend>  -b -P <pass script> [-- -i <config.json>]    legacy per-pass
+
+Every pass "loads" the scene models (reads them, holding their bytes in
+memory like Blender would), prints Blender-like output, sleeps for the
+simulated CPU time and writes a .blend the size of everything it loaded.
+
+Tuned by env:
+    BENCH_PASS_S        seconds per pass                       (default 0.2)
+    BENCH_OBJECT_S      extra seconds per scene object in the scene pass (0.01)
+    BENCH_LOG_LINES     noise lines printed per pass           (200)
+"""
+import json, os, sys, time, zlib
+
+PASS_S    = float(os.environ.get("BENCH_PASS_S", "0.2"))
+OBJECT_S  = float(os.environ.get("BENCH_OBJECT_S", "0.01"))
+LOG_LINES = int(os.environ.get("BENCH_LOG_LINES", "200"))
+
+
+def _scene_pass(cfg_path: str) -> tuple[bytes, str]:
+    """Load every model named in config.json; returns (blob, save location)."""
+    with open(cfg_path) as f:
+        cfg = json.load(f)
+    parts = []
+    for path in {m["ModelBlenderPath"] for m in cfg["SceneModels"]}:
+        with open(path, "rb") as f:
+            parts.append(f.read())
+        print(f"Appended object {os.path.basename(path)}")
+    time.sleep(OBJECT_S * len(cfg["SceneModels"]))
+    return b"".join(parts), cfg["SceneSaveLocation"]
+
+
+def _noise(name: str):
+    for i in range(LOG_LINES):
+        print(f"{name}: building geometry {i}/{LOG_LINES} | synthetic benchmark output line")
+
+
+def _run_pass(name: str, argv: list[str], held: list[bytes]) -> str | None:
+    print(f'Read blend: "{name}"')
+    _noise(name)
+    time.sleep(PASS_S)
+    if "-i" in argv:
+        blob, save_as = _scene_pass(argv[argv.index("-i") + 1])
+        held.append(blob)
+        return save_as
+    return None
+
+
+def _save(path: str, held: list[bytes], compress: bool = False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"BLENDER-v305")
+        for blob in held:
+            f.write(zlib.compress(blob, 1) if compress else blob)
+    print(f'Info: Saved "{os.path.basename(path)}"')
+
+
+def run_manifest(manifest_path: str) -> bool:
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    held, report = [], []
+    for p in manifest["passes"]:
+        t0 = time.perf_counter()
+        _run_pass(p["name"], p["argv"], held)
+        secs = time.perf_counter() - t0
+        report.append({"pass": p["name"], "seconds": round(secs, 3), "ok": True})
+        print(f"@@pass {p['name']} ok {secs:.2f}s", flush=True)
+    opt = manifest.get("optimize") or {}
+    if opt:
+        # nothing to purge in a stub; measures the uncompressed size like the real chain
+        t0 = time.perf_counter()
+        stats = {"compress": bool(opt.get("compress")), "ids_before": len(held), "purged": 0}
+        if opt.get("measure"):
+            stats["before_bytes"] = 12 + sum(map(len, held))
+        report.append({"pass": "optimize", "seconds": round(time.perf_counter() - t0, 3),
+                       "ok": True, "stats": stats})
+    t0 = time.perf_counter()
+    _save(manifest["save_as"], held, bool(opt.get("compress")))
+    report.append({"pass": "save", "seconds": round(time.perf_counter() - t0, 3), "ok": True})
+    with open(manifest["report"], "w") as f:
+        json.dump(report, f)
+    return True
+
+
+def worker():
+    print("@@ready", flush=True)
+    for line in sys.stdin:
+        cmd = json.loads(line)
+        try:
+            ok, error = run_manifest(cmd["manifest"]), None
+        except Exception as e:
+            ok, error = False, repr(e)
+        print("@@result " + json.dumps({"id": cmd["id"], "ok": ok, "error": error}), flush=True)
+
+
+def main(argv: list[str]):
+    script = argv[argv.index("-P") + 1] if "-P" in argv else ""
+    rest = argv[argv.index("--") + 1:] if "--" in argv else []
+    if script.endswith("blender_worker.py"):
+        worker()
+    elif script.endswith("blender_chain.py") and rest[0] == "--batch":
+        with open(rest[1]) as f:
+            items = json.load(f)["items"]
+        for item in items:
+            print(f"@@item {item['id']}", flush=True)
+            try:
+                run_manifest(item["manifest"])
+            except Exception as e:
+                print(f"Error: {e!r}", flush=True)
+    elif script.endswith("blender_chain.py"):
+        run_manifest(rest[0])
+    else:
+        held = []
+        save_as = _run_pass(os.path.basename(script), rest, held)
+        if save_as:
+            _save(save_as, held)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,251 @@
+"""
+Local stand-ins for everything the service talks to, for the benchmark:
+
+• ``AssetServer``  – serves deterministic synthetic files at
+  ``/a/<name>?bytes=N`` with per-request latency and a per-connection
+  bandwidth cap; supports ETag / If-None-Match and ``Range`` like the real
+  blob stores, so the asset cache and resumable fetcher behave normally.
+• ``FakeGCS``      – the slice of the GCS JSON API google-cloud-storage uses
+  here (object get / list / delete, multipart + resumable upload, media
+  download, copyTo) and what the Batch-side ``gcs_stage.py`` helper uses;
+  point ``STORAGE_EMULATOR_HOST`` at it.  Large objects keep size/metadata only.
+• ``FakeBatchClient`` – drop-in for ``batch_v1.BatchServiceClient`` that
+  records jobs after a configurable API latency.
+"""
+from __future__ import annotations
+import asyncio, base64, hashlib, json, re, threading, time, uuid
+from urllib.parse import unquote
+
+import google_crc32c
+from aiohttp import web
+
+KEEP_BYTES = 1 << 20          # fake GCS keeps object bodies up to this size
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Synthetic asset server
+# ──────────────────────────────────────────────────────────────────────────────
+class AssetServer:
+    def __init__(self, latency_ms: float = 0, mbps: float = 0):
+        self.latency = latency_ms / 1000
+        self.rate = mbps * 1024 * 1024 / 8 if mbps > 0 else 0     # bytes/s per connection
+        self.requests = 0
+        self.bytes_sent = 0
+        self._blocks: dict[str, bytes] = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/a/{name}", self.handle)
+        return app
+
+    def _block(self, name: str) -> bytes:
+        b = self._blocks.get(name)
+        if b is None:
+            b = self._blocks[name] = hashlib.sha256(name.encode()).digest() * 2048   # 64 KiB
+        return b
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        name = request.match_info["name"]
+        size = int(request.query.get("bytes", "1024"))
+        etag = f'"{name}-{size}"'
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        if request.method == "HEAD":            # size probes (admission control)
+            return web.Response(headers={"ETag": etag, "Content-Length": str(size),
+                                         "Content-Type": "application/octet-stream"})
+
+        start = 0
+        m = re.match(r"bytes=(\d+)-$", request.headers.get("Range", ""))
+        if m and request.headers.get("If-Range", etag) == etag:
+            start = min(int(m.group(1)), size)
+        resp = web.StreamResponse(status=206 if start else 200,
+                                  headers={"ETag": etag, "Content-Type": "application/octet-stream"})
+        if start:
+            resp.headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+        resp.content_length = size - start
+        await resp.prepare(request)
+
+        block, pos = self._block(name), start
+        t0, sent = time.perf_counter(), 0
+        while pos < size:
+            off = pos % len(block)
+            chunk = block[off:off + min(len(block) - off, size - pos)]
+            await resp.write(chunk)
+            pos += len(chunk)
+            sent += len(chunk)
+            if self.rate:
+                ahead = sent / self.rate - (time.perf_counter() - t0)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        self.bytes_sent += sent
+        await resp.write_eof()
+        return resp
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Fake GCS (JSON API subset)
+# ──────────────────────────────────────────────────────────────────────────────
+class FakeGCS:
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.objects: dict[tuple[str, str], dict] = {}       # (bucket, name) → object
+        self.sessions: dict[str, dict] = {}
+        self.bytes_received = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+    def _resource(self, bucket: str, name: str) -> dict:
+        o = self.objects[(bucket, name)]
+        return {"kind": "storage#object", "bucket": bucket, "name": name,
+                "size": str(o["size"]), "generation": str(o["generation"]),
+                "metadata": o["metadata"], "contentType": o["content_type"],
+                "crc32c": base64.b64encode(o["crc32c"]).decode()}
+
+    def _store(self, bucket: str, name: str, meta: dict, body: bytes | int,
+               crc: bytes | None = None) -> dict:
+        size = body if isinstance(body, int) else len(body)
+        self.bytes_received += size
+        self.objects[(bucket, name)] = {
+            "size": size, "metadata": meta.get("metadata") or {},
+            "crc32c": crc if crc is not None else google_crc32c.Checksum(body).digest(),
+            "content_type": meta.get("contentType", "application/octet-stream"),
+            "data": body if isinstance(body, bytes) and size <= KEEP_BYTES else None,
+            "generation": time.time_ns(),
+        }
+        return self._resource(bucket, name)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path, q = request.raw_path.split("?", 1)[0], request.query
+
+        m = re.match(r"^/storage/v1/b/([^/]+)/o/([^/]+)/copyTo/b/([^/]+)/o/([^/]+)$", path)
+        if m and request.method == "POST":
+            src = self.objects.get((m[1], unquote(m[2])))
+            if src is None:
+                return web.json_response({"error": {"code": 404}}, status=404)
+            self.objects[(m[3], unquote(m[4]))] = dict(src, generation=time.time_ns())
+            return web.json_response(self._resource(m[3], unquote(m[4])))
+
+        m = re.match(r"^/storage/v1/b/([^/]+)/o$", path)
+        if m and request.method == "GET":
+            prefix = q.get("prefix", "")
+            return web.json_response({"items": [
+                self._resource(b, n) for b, n in sorted(self.objects)
+                if b == m[1] and n.startswith(prefix)]})
+
+        m = re.match(r"^/storage/v1/b/([^/]+)/o/([^/]+)$", path)
+        if m and request.method == "DELETE":
+            if self.objects.pop((m[1], unquote(m[2])), None) is None:
+                return web.json_response({"error": {"code": 404}}, status=404)
+            return web.Response(status=204)
+
+        m = re.match(r"^/(?:download/)?storage/v1/b/([^/]+)/o/([^/]+)$", path)
+        if m and request.method == "GET":
+            key = (m[1], unquote(m[2]))
+            if key not in self.objects:
+                return web.json_response({"error": {"code": 404, "message": "Not Found"}},
+                                         status=404)
+            if q.get("alt") == "media":
+                data = self.objects[key]["data"] or b""
+                m = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+                if m:                                   # ranged reads (Batch-side staging)
+                    end = int(m[2]) if m[2] else len(data) - 1
+                    return web.Response(status=206, body=data[int(m[1]):end + 1], headers={
+                        "Content-Range": f"bytes {m[1]}-{end}/{len(data)}"})
+                return web.Response(body=data)
+            return web.json_response(self._resource(*key))
+
+        m = re.match(r"^/upload/storage/v1/b/([^/]+)/o$", path)
+        if m and request.method == "POST" and q.get("uploadType") == "multipart":
+            body = await request.read()
+            boundary = request.headers["Content-Type"].split("boundary=")[1].strip('"')
+            parts = body.split(b"--" + boundary.encode())
+            meta = json.loads(parts[1].split(b"\r\n\r\n", 1)[1].rstrip(b"\r\n"))
+            media = parts[2].split(b"\r\n\r\n", 1)[1][:-2]
+            return web.json_response(self._store(m[1], meta.get("name") or q.get("name"), meta, media))
+
+        if m and request.method == "POST" and q.get("uploadType") == "resumable":
+            raw = await request.read()
+            meta = json.loads(raw) if raw else {}
+            sid = uuid.uuid4().hex
+            self.sessions[sid] = {"bucket": m[1], "name": meta.get("name") or q.get("name"),
+                                  "meta": meta, "size": 0, "data": bytearray(),
+                                  "crc": google_crc32c.Checksum()}
+            loc = f"{request.scheme}://{request.host}/upload/storage/v1/b/{m[1]}/o?uploadType=resumable&upload_id={sid}"
+            return web.Response(status=200, headers={"Location": loc})
+
+        if m and request.method == "PUT" and q.get("upload_id") in self.sessions:
+            s = self.sessions[q["upload_id"]]
+            chunk = await request.read()
+            s["size"] += len(chunk)
+            s["crc"].update(chunk)          # the client verifies the object's crc32c
+            if len(s["data"]) <= KEEP_BYTES:
+                s["data"] += chunk
+            total = request.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total != "*" and int(total) == s["size"]:
+                del self.sessions[q["upload_id"]]
+                body = bytes(s["data"]) if s["size"] <= KEEP_BYTES else s["size"]
+                return web.json_response(self._store(s["bucket"], s["name"], s["meta"], body,
+                                                     s["crc"].digest()))
+            return web.Response(status=308, headers={"Range": f"bytes=0-{s['size'] - 1}"})
+
+        return web.json_response({"error": {"code": 501, "message": f"{request.method} {path}"}},
+                                 status=501)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Fake Batch client
+# ──────────────────────────────────────────────────────────────────────────────
+class FakeBatchClient:
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.jobs: list[tuple[str, object]] = []
+        self._lock = threading.Lock()
+
+    def create_job(self, parent: str, job, job_id: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.jobs.append((job_id, job))
+
+        class _Created:
+            name = f"{parent}/jobs/{job_id}"
+        return _Created()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Runs the HTTP fixtures on their own loop so they never compete with the app
+# ──────────────────────────────────────────────────────────────────────────────
+class FixtureThread(threading.Thread):
+    def __init__(self, apps: dict[str, web.Application]):
+        super().__init__(daemon=True)
+        self.apps = apps
+        self.urls: dict[str, str] = {}
+        self._ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._start())
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _start(self):
+        for name, app in self.apps.items():
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.urls[name] = f"http://127.0.0.1:{port}"
+
+    def start_and_wait(self) -> dict[str, str]:
+        self.start()
+        self._ready.wait()
+        return self.urls
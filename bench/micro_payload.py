@@ -0,0 +1,99 @@
+"""
+Microbenchmark for the /render payload and the Blender config at scene sizes
+of 10 / 1k / 10k objects: the dict path against the fast path, checking both
+produce the same bytes.
+
+    parse   json.loads + PostData.model_validate  (what a typed FastAPI body did)
+            vs PostData.model_validate_json on the raw bytes
+    config  json.dumps(build_config(...))  vs  blender_config.stream_config(...)
+
+    python bench/micro_payload.py [--sizes 10,1000,10000] [--repeat 5]
+"""
+from __future__ import annotations
+import argparse, io, json, random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from models.scene import PostData                       # noqa: E402
+from services import blender_config                     # noqa: E402
+
+
+def payload(n: int, seed: int = 1) -> bytes:
+    """A realistic-looking request: a few dozen distinct models placed ``n`` times."""
+    rnd = random.Random(seed)
+    rot = [0.0, 90.0, 180.0, -90.0]
+    objs = []
+    for i in range(n):
+        m = i % 40
+        o = {
+            "Name": f"model-{m}", "ModelBlenderUri": f"https://cdn.example.com/models/{m}.blend",
+            "InnerPath": "Object", "ObjectName": f"Obj_{m}",
+            "PositionX": round(rnd.uniform(-20, 20), 4), "PositionY": round(rnd.uniform(-20, 20), 4),
+            "PositionZ": round(rnd.uniform(0, 3), 4),
+            "RotationX": 0, "RotationY": 0, "RotationZ": rnd.choice(rot),
+            "QuaternionX": 0, "QuaternionY": 0, "QuaternionZ": 0.7071067811865476,
+            "QuaternionW": 0.7071067811865476,
+            "Scale": 1, "ScaleX": 1, "ScaleY": 1, "ScaleZ": 1,
+            "Groups": ["furniture"], "IsFloor": False, "IsCurtain": i % 17 == 0,
+            "IsMirror": i % 29 == 0, "ShowLights": i % 11 == 0,
+        }
+        if o["ShowLights"]:
+            o.update({"LightsColor": "#ffeecc", "LightsPower": 40.0, "LightRadius": 0.05,
+                      "LightSourcesPositions": [{"X": 0.1 * k, "Y": 0.0, "Z": 1.2} for k in range(3)]})
+        objs.append(o)
+    return json.dumps({
+        "SceneObjects": objs, "RenderJobID": 1, "SpaceImageID": 1,
+        "SceneGLTFUri": "https://cdn.example.com/scene.gltf",
+        "SpaceImageUri": "https://cdn.example.com/space.jpg",
+        "ResX": 1920, "ResY": 1080, "Samples": 256,
+    }).encode()
+
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,1000,10000")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    paths = (Path("/tmp/b/out.blend"), Path("/tmp/b/scene.gltf"), Path("/tmp/b/space.jpg"))
+    print(f"{'objects':>8} {'step':<7} {'dict ms':>9} {'fast ms':>9} {'speed-up':>9}  identical")
+    ok = True
+    for n in map(int, args.sizes.split(",")):
+        raw = payload(n)
+        old = PostData.model_validate(json.loads(raw))
+        new = PostData.model_validate_json(raw)
+        same = old.model_dump_json(by_alias=True) == new.model_dump_json(by_alias=True)
+        t_old = best(lambda: PostData.model_validate(json.loads(raw)), args.repeat)
+        t_new = best(lambda: PostData.model_validate_json(raw), args.repeat)
+        print(f"{n:>8} {'parse':<7} {t_old * 1e3:>9.2f} {t_new * 1e3:>9.2f} {t_old / t_new:>8.1f}x  {same}")
+        ok &= same
+
+        model_paths = [f"/tmp/b/models/{o.name}.blend" for o in new.scene_objects]
+
+        def stream() -> str:
+            buf = io.StringIO()
+            blender_config.stream_config(buf, *paths, new, model_paths)
+            return buf.getvalue()
+
+        def dump() -> str:
+            return json.dumps(blender_config.build_config(*paths, new, model_paths))
+
+        same = stream() == dump()
+        t_old, t_new = best(dump, args.repeat), best(stream, args.repeat)
+        print(f"{n:>8} {'config':<7} {t_old * 1e3:>9.2f} {t_new * 1e3:>9.2f} {t_old / t_new:>8.1f}x  {same}")
+        ok &= same
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
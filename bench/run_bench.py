@@ -0,0 +1,366 @@
+"""
+Offline end-to-end benchmark of the /render pipeline.
+
+Starts the FastAPI app in-process against local fixtures – a synthetic
+asset server (latency / bandwidth knobs), the stub Blender in
+``bench/fake_blender.py``, a fake GCS and a fake Batch client – then drives
+``POST /render`` at the requested concurrency and waits for each job to
+reach ``submitted``.  Reports latency percentiles, throughput, per-stage
+timings and peak RSS / scratch disk per stage.
+
+Usage:
+    python bench/run_bench.py                                  # defaults
+    python bench/run_bench.py --jobs 40 --concurrency 8 --objects 30 --model-mb 50 \\
+                              --latency-ms 40 --mbps 400
+    python bench/run_bench.py --save-baseline bench/baseline.json
+    python bench/run_bench.py --baseline bench/baseline.json  # exit 1 on regression
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, pathlib, shutil, statistics, sys
+import tempfile, threading, time
+
+ROOT  = pathlib.Path(__file__).resolve().parents[1]
+BENCH = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--jobs", type=int, default=20, help="measured /render requests")
+    p.add_argument("--warmup", type=int, default=1, help="unmeasured requests first")
+    p.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    p.add_argument("--workers", type=int, default=2, help="JOB_WORKERS of the app")
+    p.add_argument("--queue-max", type=int, default=16, help="ADMISSION_QUEUE_MAX (429 beyond)")
+    p.add_argument("--objects", type=int, default=14, help="scene objects per request")
+    p.add_argument("--models", type=int, default=6, help="distinct model files")
+    p.add_argument("--model-mb", type=float, default=8, help="size of each model .blend")
+    p.add_argument("--scene-mb", type=float, default=2, help="scene glTF size")
+    p.add_argument("--latency-ms", type=float, default=20, help="asset server latency")
+    p.add_argument("--mbps", type=float, default=0, help="per-connection cap, 0 = none")
+    p.add_argument("--gcs-latency-ms", type=float, default=5)
+    p.add_argument("--batch-latency-ms", type=float, default=50)
+    p.add_argument("--pass-s", type=float, default=0.2, help="stub Blender seconds per pass")
+    p.add_argument("--pool", type=int, default=0, help="BLENDER_POOL_SIZE")
+    p.add_argument("--build-cache", action="store_true", help="enable the build cache")
+    p.add_argument("--baseline", help="compare against this baseline; exit 1 on regression")
+    p.add_argument("--save-baseline", help="write this run's summary as the new baseline")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    p.add_argument("--json", help="also write the full report here")
+    return p.parse_args(argv)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Environment – must be set before the app (and its settings) are imported
+# ──────────────────────────────────────────────────────────────────────────────
+def configure(args, work: pathlib.Path, urls: dict[str, str]):
+    stub = BENCH / "fake_blender.py"
+    (work / "tmp").mkdir()
+    tempfile.tempdir = str(work / "tmp")          # job workspaces land under the bench dir
+
+    a = urls["assets"] + "/a/"
+    os.environ.update({
+        "PROJECT_ID": "bench", "BUCKET": "bench-bucket",
+        "STORAGE_EMULATOR_HOST": urls["gcs"],
+        "BLENDER_EXE_LOCATION": str(stub),
+        "URL_BLENDER_SCENE_SCRIPT":       a + "SceneScript.py?bytes=4096",
+        "URL_BLENDER_360_SCENE_SCRIPT":   a + "SceneScript360.py?bytes=4096",
+        "URL_BLENDER_SCENE_FILE":         a + "Base.blend?bytes=1048576",
+        "URL_BLENDER_360_SCENE_FILE":     a + "Base360.blend?bytes=1048576",
+        "URL_BLENDER_MIRROR_SCRIPT":      a + "SceneMirrorScript.py?bytes=2048",
+        "URL_BLENDER_USER_MIRROR_SCRIPT": a + "UserMirrorScript.py?bytes=2048",
+        "ASSET_CACHE_DIR": str(work / "asset-cache"),
+        "TOOL_CACHE_DIR":  str(work / "tool-cache"),
+        "JOB_BACKEND": "memory",
+        "JOB_WORKERS": str(args.workers),
+        "ADMISSION_QUEUE_MAX": str(args.queue_max),
+        "BLENDER_POOL_SIZE": str(args.pool),
+        "BUILD_CACHE_ENABLED": str(args.build_cache).lower(),
+        "BATCH_COALESCE_WINDOW_S": "0",
+        # the fake GCS speaks the JSON API only – no XML multipart uploads
+        "UPLOAD_PARALLEL_THRESHOLD_MB": str(1 << 20),
+        "BENCH_PASS_S": str(args.pass_s),
+    })
+
+
+def make_payload(template: dict, args, i: int, assets: str) -> dict:
+    a = assets + "/a/"
+    mb = lambda x: int(x * 1024 * 1024)
+    p = json.loads(json.dumps(template))
+    p["RenderJobID"] = 900_000 + i
+    p["SceneGLTFUri"] = f"{a}scene{i}.glb?bytes={mb(args.scene_mb)}"
+    p["SpaceImageUri"] = f"{a}space{i}.jpg?bytes={mb(0.5)}"
+    if p.get("RenderingPreset"):
+        p["RenderingPreset"]["ScriptDownloadURL"] = f"{a}preset.py?bytes=2048"
+    objs = template["SceneObjects"]
+    p["SceneObjects"] = []
+    for k in range(args.objects):
+        o = dict(objs[k % len(objs)])
+        o["Name"] = f"{o['Name']} {k}"
+        o["ModelBlenderUri"] = f"{a}model{k % args.models}.blend?bytes={mb(args.model_mb)}"
+        p["SceneObjects"].append(o)
+    return p
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  RSS / disk sampler – attributes peaks to the stages running at the time
+# ──────────────────────────────────────────────────────────────────────────────
+def _rss_kb(pid: int) -> int:
+    try:
+        for line in open(f"/proc/{pid}/status"):
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _tree_rss_mb() -> float:
+    me, total = os.getpid(), _rss_kb(os.getpid())
+    for d in os.listdir("/proc"):
+        if d.isdigit():
+            try:
+                if int(open(f"/proc/{d}/stat").read().rsplit(")", 1)[1].split()[1]) == me:
+                    total += _rss_kb(int(d))
+            except (OSError, IndexError, ValueError):
+                pass
+    return total / 1024
+
+def _du_mb(path: pathlib.Path) -> float:
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.lstat(os.path.join(dirpath, f)).st_size
+            except OSError:
+                pass
+    return total / 1024 / 1024
+
+
+class Sampler(threading.Thread):
+    def __init__(self, jobs, scratch: pathlib.Path, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.jobs, self.scratch, self.interval = jobs, scratch, interval
+        self.peak_rss: dict[str, float] = {}
+        self.peak_disk: dict[str, float] = {}
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            rss, disk = _tree_rss_mb(), _du_mb(self.scratch)
+            stages = {r.stage or "queued" for r in self.jobs.backend.active()} | {"overall"}
+            for s in stages:
+                self.peak_rss[s]  = max(self.peak_rss.get(s, 0.0), rss)
+                self.peak_disk[s] = max(self.peak_disk.get(s, 0.0), disk)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Driver
+# ──────────────────────────────────────────────────────────────────────────────
+async def _one(session, base: str, payload: dict) -> dict:
+    t0 = time.perf_counter()
+    rejected = 0
+    while True:
+        async with session.post(f"{base}/render", json=payload) as r:
+            if r.status != 429:
+                status_url = base + r.headers["Location"]
+                break
+            rejected += 1          # admission control: backlog full
+            await asyncio.sleep(min(float(r.headers.get("Retry-After", 1)), 1.0))
+    while True:
+        await asyncio.sleep(0.02)
+        async with session.get(status_url) as r:
+            job = await r.json()
+        if job["status"] in ("submitted", "failed"):
+            job["latency_s"] = time.perf_counter() - t0
+            job["rejected"] = rejected
+            return job
+
+
+async def get_ready(base: str, wait_s: float = 300) -> dict:
+    """Waits for the service's warm-up; returns its startup timings."""
+    import aiohttp
+    deadline = time.perf_counter() + wait_s
+    async with aiohttp.ClientSession() as session:
+        while True:
+            async with session.get(f"{base}/ready") as r:
+                body = await r.json()
+            if r.status == 200 or time.perf_counter() > deadline:
+                return body
+            await asyncio.sleep(0.05)
+
+
+async def drive(base: str, payloads: list[dict], concurrency: int) -> list[dict]:
+    import aiohttp
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def run(p):
+            async with sem:
+                return await _one(session, base, p)
+        return await asyncio.gather(*(run(p) for p in payloads))
+
+
+def pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, max(0, round(q / 100 * len(s) + 0.5) - 1))]
+
+
+def summarize(results: list[dict], wall: float, sampler: Sampler, work: pathlib.Path) -> dict:
+    ok = [r for r in results if r["status"] == "submitted"]
+    lat = [r["latency_s"] for r in ok]
+    stages: dict[str, list[float]] = {}
+    for r in ok:
+        for k, v in r.get("timings", {}).items():
+            stages.setdefault(k, []).append(v)
+        # breakdown of the build stage (upload is already a stage of its own)
+        for k, v in ((r.get("result") or {}).get("timings") or {}).items():
+            if k != "upload":
+                stages.setdefault(f"build.{k}", []).append(v)
+    arts = [(r.get("result") or {}).get("artifact") or {} for r in ok]
+    return {
+        "jobs": len(results), "failed": len(results) - len(ok),
+        "errors": sorted({r.get("error") or "" for r in results if r["status"] != "submitted"}),
+        "wall_s": round(wall, 3),
+        "throughput_jobs_per_s": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency_s": {"p50": round(pct(lat, 50), 3), "p95": round(pct(lat, 95), 3),
+                      "p99": round(pct(lat, 99), 3),
+                      "mean": round(statistics.fmean(lat), 3) if lat else 0.0},
+        "stages_s": {k: {"p50": round(pct(v, 50), 3), "p95": round(pct(v, 95), 3)}
+                     for k, v in sorted(stages.items())},
+        "peak_rss_mb":  {k: round(v, 1) for k, v in sorted(sampler.peak_rss.items())},
+        "peak_disk_mb": {k: round(v, 1) for k, v in sorted(sampler.peak_disk.items())},
+        "asset_cache_mb": round(_du_mb(work / "asset-cache"), 1),
+        # handoff .blend, p50 (before = unoptimised, only with ARTIFACT_MEASURE_BASELINE)
+        "blend_mb": {k: round(pct([a[f"{k}_bytes"] / 1048576 for a in arts if a.get(f"{k}_bytes")], 50), 1)
+                     for k in ("before", "after")},
+        "rejected_429": sum(r.get("rejected", 0) for r in results),
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Baseline regression check
+# ──────────────────────────────────────────────────────────────────────────────
+# metric → (getter, higher_is_better)
+GATES = {
+    "latency_p50":  (lambda s: s["latency_s"]["p50"], False),
+    "latency_p95":  (lambda s: s["latency_s"]["p95"], False),
+    "latency_p99":  (lambda s: s["latency_s"]["p99"], False),
+    "throughput":   (lambda s: s["throughput_jobs_per_s"], True),
+    "peak_rss_mb":  (lambda s: s["peak_rss_mb"].get("overall", 0.0), False),
+    "peak_disk_mb": (lambda s: s["peak_disk_mb"].get("overall", 0.0), False),
+}
+
+def baseline_of(summary: dict) -> dict:
+    return {k: get(summary) for k, (get, _) in GATES.items()}
+
+def regressions(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    out = []
+    for k, (get, higher_better) in GATES.items():
+        if k not in baseline or not baseline[k]:
+            continue
+        cur, base = get(summary), baseline[k]
+        bad = cur < base * (1 - tolerance) if higher_better else cur > base * (1 + tolerance)
+        if bad:
+            out.append(f"{k}: {cur:g} vs baseline {base:g} (±{tolerance:.0%})")
+    return out
+
+
+def print_report(s: dict):
+    print(f"\njobs {s['jobs']}  failed {s['failed']}  wall {s['wall_s']}s  "
+          f"throughput {s['throughput_jobs_per_s']} jobs/s")
+    l = s["latency_s"]
+    print(f"latency  p50 {l['p50']}s  p95 {l['p95']}s  p99 {l['p99']}s  mean {l['mean']}s")
+    print(f"\n{'stage':<22}{'p50 s':>9}{'p95 s':>9}{'peak RSS MB':>14}{'peak disk MB':>14}")
+    for k in sorted(set(s["stages_s"]) | set(s["peak_rss_mb"])):
+        st = s["stages_s"].get(k, {})
+        print(f"{k:<22}{st.get('p50', ''):>9}{st.get('p95', ''):>9}"
+              f"{s['peak_rss_mb'].get(k, ''):>14}{s['peak_disk_mb'].get(k, ''):>14}")
+    print(f"\nasset cache {s['asset_cache_mb']} MB   429 answers {s['rejected_429']}   "
+          f".blend {s['blend_mb']['before'] or '-'} → {s['blend_mb']['after']} MB")
+    st = s.get("startup")
+    if st:
+        first = st["first_request"] or {}
+        print(f"startup  import {st['import_s']}s  ready after {st['ready_after_s']}s  "
+              f"first /render {first.get('seconds', '-')}s  first build {st['first_build_s']}s")
+    for e in s["errors"]:
+        print("error:", e.splitlines()[0] if e else "")
+
+
+async def main_async(args) -> int:
+    from bench.fixtures import AssetServer, FakeBatchClient, FakeGCS, FixtureThread
+
+    work = pathlib.Path(tempfile.mkdtemp(prefix="render-bench-"))
+    assets, gcs = AssetServer(args.latency_ms, args.mbps), FakeGCS(args.gcs_latency_ms)
+    urls = FixtureThread({"assets": assets.app(), "gcs": gcs.app()}).start_and_wait()
+    configure(args, work, urls)
+
+    import uvicorn
+    import app.main as service
+    from services import batch_submit
+    batch = FakeBatchClient(args.batch_latency_ms)
+    batch_submit._client = batch
+
+    server = uvicorn.Server(uvicorn.Config(service.app, host="127.0.0.1", port=0,
+                                           log_level="warning", lifespan="on"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    template = json.loads((ROOT / "test" / "payload.json").read_text())
+    payloads = [make_payload(template, args, i, urls["assets"])
+                for i in range(args.warmup + args.jobs)]
+    try:
+        await get_ready(base)
+        if args.warmup:
+            await drive(base, payloads[:args.warmup], args.concurrency)
+        sampler = Sampler(service.jobs, work / "tmp")
+        sampler.start()
+        t0 = time.perf_counter()
+        results = await drive(base, payloads[args.warmup:], args.concurrency)
+        wall = time.perf_counter() - t0
+        sampler.stop()
+        startup = await get_ready(base)
+    finally:
+        server.should_exit = True
+        await serve
+
+    summary = summarize(results, wall, sampler, work)
+    summary["startup"] = {k: startup[k] for k in ("import_s", "ready_after_s", "steps",
+                                                  "first_request", "first_build_s")}
+    summary["config"] = {k: v for k, v in vars(args).items()
+                         if k not in ("baseline", "save_baseline", "json")}
+    summary["fixtures"] = {"asset_requests": assets.requests,
+                           "asset_mb_sent": round(assets.bytes_sent / 1024 / 1024, 1),
+                           "gcs_mb_received": round(gcs.bytes_received / 1024 / 1024, 1),
+                           "batch_jobs": len(batch.jobs)}
+    shutil.rmtree(work, ignore_errors=True)
+
+    print_report(summary)
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(summary, indent=2))
+    if args.save_baseline:
+        pathlib.Path(args.save_baseline).write_text(
+            json.dumps({"config": summary["config"], **baseline_of(summary)}, indent=2))
+        print(f"baseline written to {args.save_baseline}")
+
+    rc = 1 if summary["failed"] else 0
+    if args.baseline:
+        base_doc = json.loads(pathlib.Path(args.baseline).read_text())
+        bad = regressions(summary, base_doc, args.tolerance)
+        for line in bad:
+            print("REGRESSION", line)
+        if not bad:
+            print("no regression against", args.baseline)
+        rc = rc or (1 if bad else 0)
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
@@ -28,10 +28,12 @@ gcloud run deploy $SERVICE_NAME `
   --region $REGION `
   --cpu 8 `
   --memory 16Gi `
-  --concurrency 1 `
+  --concurrency 8 `
   --timeout 900 `
-  --max-instances 10 `
-  --min-instances 0 `
+  --no-cpu-throttling `
+  --max-instances 1 `
+  --min-instances 1 `
+  --session-affinity `
   --allow-unauthenticated `
   --set-env-vars "PROJECT_ID=${PROJECT_ID},REGION=${REGION}" `
   --port 8080
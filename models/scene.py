@@ -101,6 +101,11 @@ class PostData(BaseModel):
 
     rendering_preset:   RenderPresetData | None = Field(alias="RenderingPreset", default=None)
 
+    # quick low-sample image before the full render; unset → service settings
+    preview:            bool | None  = Field(alias="Preview",        default=None)
+    preview_samples:    int | None   = Field(alias="PreviewSamples", default=None, ge=1)
+    preview_scale:      float | None = Field(alias="PreviewScale",   default=None, gt=0, le=1)
+
     # extra convenience for Cloud Run – not present in C# but harmless if omitted
     webhook:            str | None = Field(default=None)
 
@@ -0,0 +1,207 @@
+from __future__ import annotations
+import asyncio, logging, math, os, time
+from dataclasses import dataclass
+
+from models.scene import PostData
+from services import metrics
+from services.asset_cache import get_asset_cache
+from services.http_fetch import get_fetcher
+from settings import settings
+
+logger = logging.getLogger("admission")
+
+MB = 1024 * 1024
+
+
+@dataclass
+class JobCost:
+    """Estimated peak needs of one build on this instance."""
+    cpu:            float
+    memory_mb:      int            # Blender + loaded models (+ scratch when /tmp is RAM)
+    scratch_mb:     int            # job directory: scene assets, output .blend, uncached models
+    objects:        int
+    model_bytes:    int            # unique models, known or assumed
+    unknown_models: int = 0        # sizes neither cached nor answered by HEAD
+
+    def public(self) -> dict:
+        return {"cpu": round(self.cpu, 2), "memory_mb": self.memory_mb,
+                "scratch_mb": self.scratch_mb, "objects": self.objects,
+                "model_mb": round(self.model_bytes / MB, 1),
+                "unknown_models": self.unknown_models}
+
+
+@dataclass
+class AdmissionStats:
+    admitted:     int = 0
+    waited:       int = 0          # had to wait for running jobs to finish
+    exclusive:    int = 0          # larger than the whole budget; ran alone
+    rejected:     int = 0          # 429 – backlog full
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Per-instance admission control
+# ──────────────────────────────────────────────────────────────────────────────
+class Admission:
+    """
+    Runs builds side by side while their estimated CPU and memory fit the
+    instance budget.  Jobs that don't fit wait in the job queue; once the
+    backlog reaches ``admission_queue_max`` new renders are turned away with
+    429 and a ``Retry-After`` from recent job durations.  A job larger than
+    the whole budget is not refused (estimates are heuristics) – it runs
+    once nothing else is running.  Scratch space itself is reserved by the
+    workspace manager with the estimate computed here.
+    """
+
+    def __init__(self, cpu: float, memory_mb: int):
+        self.cpu       = cpu
+        self.memory_mb = memory_mb
+        self.stats     = AdmissionStats()
+        self.waiting   = 0
+        self._running: dict[str, tuple[JobCost, float]] = {}   # id → (cost, admitted at)
+        self._job_s    = 60.0                                    # EWMA of admitted job duration
+        self._changed: asyncio.Event | None = None
+
+    # ───────── estimates ─────────
+    async def estimate(self, data: PostData) -> JobCost:
+        cache = get_asset_cache()
+        models = {o.model_blender_uri for o in data.scene_objects}
+        urls = models | {data.scene_gltf_uri, data.space_image_uri}
+        sizes = await asyncio.gather(*(self._size(u, cache) for u in urls))
+        size = dict(zip(urls, sizes))
+
+        default = settings.admission_default_model_mb * MB
+        unknown = sum(1 for u in models if size[u] is None)
+        model_bytes = sum(size[u] if size[u] is not None else default for u in models)
+        scene_bytes = sum(size[u] or 0 for u in urls - models)
+
+        # the saved .blend holds every appended model once; cached models are hard links
+        scratch = scene_bytes + model_bytes + (0 if cache else model_bytes)
+        memory = settings.admission_blender_base_mb * MB + settings.admission_memory_factor * model_bytes
+        cpu = settings.admission_job_cpu
+        if data.is360:
+            memory *= settings.admission_360_factor
+            cpu *= settings.admission_360_factor
+        if settings.admission_tmp_in_memory:
+            memory += scratch
+        return JobCost(cpu, math.ceil(memory / MB), math.ceil(scratch / MB),
+                       len(data.scene_objects), model_bytes, unknown)
+
+    @staticmethod
+    def combine(costs: list[JobCost], sessions: int) -> JobCost:
+        """A batch built in ``sessions`` shared Blender processes: at most that many run at once."""
+        sessions = max(1, min(sessions, len(costs)))
+        return JobCost(max(c.cpu for c in costs) * sessions,
+                       max(c.memory_mb for c in costs) * sessions,
+                       sum(c.scratch_mb for c in costs),
+                       sum(c.objects for c in costs),
+                       sum(c.model_bytes for c in costs),
+                       sum(c.unknown_models for c in costs))
+
+    @staticmethod
+    async def _size(url: str, cache) -> int | None:
+        cached = cache.size_of(url) if cache else None
+        if cached is not None:
+            return cached
+        return await get_fetcher().content_length(url, settings.admission_head_timeout_s)
+
+    # ───────── admission ─────────
+    def has_room(self, queued: int) -> bool:
+        """Whether one more render may join the backlog (``queued`` jobs not yet started)."""
+        return queued + self.waiting < settings.admission_queue_max
+
+    def reject(self, queued: int, reason: str = "queue_full") -> int:
+        """Counts a 429 and returns its Retry-After: the time to work off the backlog."""
+        self.stats.rejected += 1
+        metrics.JOBS_REJECTED.inc(reason=reason)
+        ahead = queued + self.waiting + 1
+        return min(600, max(5, math.ceil(self._job_s * ahead / max(1, len(self._running)))))
+
+    async def admit(self, render_job_id: str, cost: JobCost):
+        if not self._fits(cost):
+            self.stats.waited += 1
+            self.waiting += 1
+            logger.info("render_job_id=%s waits for capacity (needs %.1f CPU / %d MB; "
+                        "%d running)", render_job_id, cost.cpu, cost.memory_mb, len(self._running))
+            try:
+                while not self._fits(cost):
+                    self._event().clear()
+                    await self._event().wait()
+            finally:
+                self.waiting -= 1
+        if cost.cpu > self.cpu or cost.memory_mb > self.memory_mb:
+            self.stats.exclusive += 1
+            logger.warning("render_job_id=%s needs %.1f CPU / %d MB, more than the instance "
+                           "budget (%.1f CPU / %d MB), and runs alone", render_job_id,
+                           cost.cpu, cost.memory_mb, self.cpu, self.memory_mb)
+        self._running[render_job_id] = (cost, time.perf_counter())
+        self.stats.admitted += 1
+        self._publish()
+
+    def release(self, render_job_id: str):
+        held = self._running.pop(render_job_id, None)
+        if held is None:
+            return
+        self._job_s = 0.8 * self._job_s + 0.2 * (time.perf_counter() - held[1])
+        self._publish()
+        self._event().set()
+
+    def snapshot(self) -> dict:
+        cpu, mem = self._in_use()
+        return {"budget": {"cpu": self.cpu, "memory_mb": self.memory_mb},
+                "in_use": {"cpu": round(cpu, 2), "memory_mb": mem},
+                "running": {k: c.public() for k, (c, _) in self._running.items()},
+                "waiting": self.waiting, "job_seconds": round(self._job_s, 1),
+                **vars(self.stats)}
+
+    # ───────── internals ─────────
+    def _in_use(self) -> tuple[float, int]:
+        return (sum(c.cpu for c, _ in self._running.values()),
+                sum(c.memory_mb for c, _ in self._running.values()))
+
+    def _fits(self, cost: JobCost) -> bool:
+        if not self._running:
+            return True
+        cpu, mem = self._in_use()
+        return cpu + cost.cpu <= self.cpu and mem + cost.memory_mb <= self.memory_mb
+
+    def _event(self) -> asyncio.Event:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _publish(self):
+        cpu, mem = self._in_use()
+        metrics.ADMISSION_IN_USE.set(cpu, resource="cpu")
+        metrics.ADMISSION_IN_USE.set(mem, resource="memory_mb")
+
+
+def memory_budget_mb() -> int:
+    """
+    ``admission_memory_mb`` less what the instance-wide caches may hold: with
+    /tmp in memory a full asset cache and the tool cache share it with builds.
+    """
+    budget = settings.admission_memory_mb
+    if settings.admission_tmp_in_memory:
+        if settings.asset_cache_enabled:
+            budget -= settings.asset_cache_max_mb
+        budget -= settings.tool_cache_reserve_mb
+    if budget < settings.admission_blender_base_mb:
+        logger.warning("Admission memory budget %d MB leaves too little room after the caches",
+                       budget)
+    return max(budget, settings.admission_blender_base_mb)
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_admission: Admission | None = None
+
+def get_admission() -> Admission | None:
+    """Shared controller, or ``None`` when ``admission_enabled`` is off."""
+    global _admission
+    if not settings.admission_enabled:
+        return None
+    if _admission is None:
+        _admission = Admission(settings.admission_cpu or float(os.cpu_count() or 1),
+                               memory_budget_mb())
+        metrics.Gauge("render_jobs_waiting_admission", "Jobs picked up but waiting for capacity",
+                      fn=lambda: _admission.waiting)
+    return _admission
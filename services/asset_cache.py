@@ -0,0 +1,209 @@
+from __future__ import annotations
+import asyncio, hashlib, json, logging, os, shutil, time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from services import metrics
+from services.http_fetch import FetchResult, get_fetcher
+from settings import settings
+
+logger = logging.getLogger("asset_cache")
+
+INDEX_FILE = "index.json"
+BLOBS_DIR  = "blobs"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Index entry / counters
+# ──────────────────────────────────────────────────────────────────────────────
+@dataclass
+class CacheEntry:
+    url:           str
+    sha256:        str
+    size:          int
+    etag:          str | None = None
+    last_modified: str | None = None
+    validated_at:  float = 0.0     # last time origin confirmed this content
+    used_at:       float = 0.0     # LRU clock
+
+
+@dataclass
+class CacheStats:
+    hits:        int = 0
+    misses:      int = 0
+    revalidated: int = 0           # conditional GET answered 304
+    evictions:   int = 0
+    bytes_saved: int = 0           # bytes we did not have to download
+    bytes_fetched: int = 0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Content-addressed on-disk cache
+# ──────────────────────────────────────────────────────────────────────────────
+class AssetCache:
+    """
+    On-disk cache of downloaded assets, keyed by URL and stored by content
+    hash (``blobs/ab/abcdef…``).  Entries are revalidated with conditional
+    GETs (ETag / Last-Modified), evicted LRU once ``max_bytes`` is exceeded
+    and hard-linked (or symlinked) into the job directory.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, revalidate_s: int):
+        self.root         = Path(root)
+        self.max_bytes    = max_bytes
+        self.revalidate_s = revalidate_s
+        self.stats        = CacheStats()
+        self._entries: dict[str, CacheEntry] = {}
+        self._locks:   dict[str, asyncio.Lock] = {}
+        (self.root / BLOBS_DIR).mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    # ── public ───────────────────────────────────────────────────────────────
+    async def fetch(self, url: str, dest: Path) -> CacheEntry:
+        """Make ``url`` available at ``dest`` – from cache when possible."""
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            entry = await self._ensure(url)
+        entry.used_at = time.time()
+        self._save_index()
+        link_file(self._blob_path(entry.sha256), dest)
+        return entry
+
+    def size_of(self, url: str) -> int | None:
+        """Size of the cached copy of ``url`` (no network), ``None`` if not cached."""
+        entry = self._entries.get(url)
+        if entry and self._blob_path(entry.sha256).exists():
+            return entry.size
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            **asdict(self.stats),
+            "entries":   len(self._entries),
+            "bytes":     self._total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+    # ── core ─────────────────────────────────────────────────────────────────
+    async def _ensure(self, url: str) -> CacheEntry:
+        entry = self._entries.get(url)
+        if entry and not self._blob_path(entry.sha256).exists():
+            self._entries.pop(url, None)
+            entry = None
+
+        if entry and time.time() - entry.validated_at < self.revalidate_s:
+            self._hit(entry)
+            return entry
+
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        tmp = self.root / f".incoming-{hashlib.sha1(url.encode()).hexdigest()}"
+        res = await get_fetcher().download(url, tmp, headers=headers)
+        if entry and res.not_modified:
+            entry.validated_at = time.time()
+            self.stats.revalidated += 1
+            self._hit(entry)
+            return entry
+        entry = self._store(url, tmp, res)
+
+        self.stats.misses += 1
+        self.stats.bytes_fetched += entry.size
+        self._evict()
+        return entry
+
+    def _store(self, url: str, tmp: Path, res: FetchResult) -> CacheEntry:
+        blob = self._blob_path(res.sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.exists():
+            tmp.unlink()              # same content already cached under another URL
+        else:
+            os.replace(tmp, blob)
+
+        now = time.time()
+        entry = CacheEntry(
+            url=url, sha256=res.sha256, size=res.size,
+            etag=res.etag, last_modified=res.last_modified,
+            validated_at=now, used_at=now,
+        )
+        self._entries[url] = entry
+        return entry
+
+    def _hit(self, entry: CacheEntry):
+        self.stats.hits += 1
+        self.stats.bytes_saved += entry.size
+        metrics.DOWNLOAD_BYTES.inc(entry.size, source="cache")
+
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            self._save_index()
+            return
+        for entry in sorted(self._entries.values(), key=lambda e: e.used_at):
+            if total <= self.max_bytes:
+                break
+            if self._locks.get(entry.url) and self._locks[entry.url].locked():
+                continue              # being refreshed right now
+            self._entries.pop(entry.url)
+            self.stats.evictions += 1
+            if not any(e.sha256 == entry.sha256 for e in self._entries.values()):
+                # hard links already handed to jobs stay valid after unlink
+                self._blob_path(entry.sha256).unlink(missing_ok=True)
+                total -= entry.size
+            logger.info("Evicted %s (%d bytes)", entry.url, entry.size)
+        self._save_index()
+
+    # ── persistence ──────────────────────────────────────────────────────────
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / BLOBS_DIR / digest[:2] / digest
+
+    def _total_bytes(self) -> int:
+        return sum({e.sha256: e.size for e in self._entries.values()}.values())
+
+    def _load_index(self):
+        p = self.root / INDEX_FILE
+        if not p.exists():
+            return
+        try:
+            raw = json.loads(p.read_text())
+            self._entries = {u: CacheEntry(**e) for u, e in raw.items()}
+        except Exception as e:
+            logger.warning("Asset cache index unreadable, starting empty: %s", e)
+            self._entries = {}
+
+    def _save_index(self):
+        p = self.root / INDEX_FILE
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps({u: asdict(e) for u, e in self._entries.items()}))
+        os.replace(tmp, p)
+
+
+def link_file(src: Path, dest: Path):
+    """Hard link, else symlink, else copy ``src`` to ``dest``."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        try:
+            os.symlink(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_cache: AssetCache | None = None
+
+def get_asset_cache() -> AssetCache | None:
+    """Shared cache for this instance, or ``None`` when disabled."""
+    global _cache
+    if not settings.asset_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = AssetCache(Path(settings.asset_cache_dir),
+                            settings.asset_cache_max_mb * 1024 * 1024,
+                            settings.asset_cache_revalidate_s)
+    return _cache
@@ -1,56 +1,313 @@
-from google.cloud import batch_v1
-from google.protobuf import duration_pb2
-import uuid, re
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+import asyncio, textwrap, threading, uuid, re
+from services import metrics
+from services.compute_profile import ComputeProfile, RenderEstimate
 from settings import settings
 import logging
 
+if TYPE_CHECKING:       # google-cloud-batch is imported on first use (cold starts)
+    from google.cloud import batch_v1
+    from models.scene import PostData
+
 logger = logging.getLogger("batch_submit")
 
-def submit(render_job_id: str, blend_uri: str, webhook: str | None) -> str:
+
+@dataclass
+class RenderTask:
+    render_job_id: str
+    blend_uri:     str
+    webhook:       str | None = None
+    samples:       int | None = None     # overrides the Cycles samples stored in the .blend
+    estimate:      RenderEstimate | None = None
+    preview:       tuple[int, int] | None = None   # (samples, resolution %) of a quick first image
+
+    @property
+    def profile(self) -> ComputeProfile:
+        return self.estimate.profile if self.estimate else LEGACY_PROFILE
+
+    @property
+    def tiles(self) -> tuple[int, int]:
+        return self.estimate.tiles if self.estimate else (1, 1)
+
+
+# what every render used before profiles existed
+LEGACY_PROFILE = ComputeProfile("legacy", "n2-standard-96", 96_000, 384 * 1024, 3600,
+                                float("inf"))
+
+
+# ─────────────────────────── long-lived Batch client ────────────────────────────
+_client: batch_v1.BatchServiceClient | None = None
+_client_lock = threading.Lock()
+
+def get_batch_client() -> batch_v1.BatchServiceClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import batch_v1
+            _client = batch_v1.BatchServiceClient()
+        return _client
+
+
+# shipped into the Batch scripts (run under Blender's Python on the VM)
+STITCHER_SRC = (Path(__file__).parent / "stitcher.py").read_text()
+STAGE_SRC    = (Path(__file__).parent / "gcs_stage.py").read_text()
+
+
+def preview_for(data: PostData) -> tuple[int, int] | None:
+    """``(samples, resolution %)`` of the progressive preview, ``None`` without one."""
+    if not (settings.preview_enabled if data.preview is None else data.preview):
+        return None
+    samples = min(data.samples, data.preview_samples or settings.preview_samples)
+    pct = max(1, min(100, round(100 * (data.preview_scale or settings.preview_scale))))
+    if samples >= data.samples and pct == 100:
+        return None                       # would be the full render again
+    return samples, pct
+
+
+def submit(render_job_id: str, blend_uri: str, webhook: str | None,
+           samples: int | None = None, estimate: RenderEstimate | None = None,
+           preview: tuple[int, int] | None = None) -> str:
     """
     Launch a render job that reads the .blend we uploaded to
     gs://<bucket>/renders/<render_job_id>/<render_job_id>.blend
+
+    ``samples`` overrides the Cycles sample count stored in the .blend, so a
+    cached build can be re-rendered at a different quality.  ``preview``
+    renders a quick image into renders/<id>/preview/ first (see ``preview_for``).
     """
-    project_id, region, bucket = (
-        settings.project_id,
-        settings.region,
-        settings.bucket,
-    )
+    task = RenderTask(render_job_id, blend_uri, webhook, samples, estimate, preview)
+    if task.tiles != (1, 1):
+        return submit_tiled(task)
+    return submit_many([task])
 
-    job_id = f"render-{render_job_id}-{uuid.uuid4().hex[:6]}"
-    parent = f"projects/{project_id}/locations/{region}"
-    out_uri = f"gs://{bucket}/renders/{render_job_id}/"
 
-    # input bucket name only (Batch needs just the bucket, not the object path)
-    m = re.match(r"^gs://([^/]+)/.+$", blend_uri)
-    scene_bucket = m.group(1)
+def _blend_uri(uri: str) -> str:
+    # staged by the task itself – only this object is read, no bucket is mounted
+    if not re.match(r"^gs://[^/]+/[\w./-]+$", uri):
+        raise ValueError(f"Unexpected .blend URI: {uri}")
+    return uri
+
+
+def _signal_sh() -> str:
+    """
+    Bash helper: ``signal <name>`` posts this render's workflow signal with
+    Blender's bundled Python (urllib) – the image has no curl and nothing
+    gets installed.
+    """
+    return f"""\
+signal() {{
+  blender -b --factory-startup --python-exit-code 1 --python-expr "import json, urllib.request as u; u.urlopen(u.Request('{settings.pipeline_manager_url}/actions/signal/$1', data=json.dumps({{'workflow_id': '$RID'}}).encode(), headers={{'Content-Type': 'application/json'}}, method='POST'), timeout=60)" >/dev/null
+}}
+"""
+
+
+def _gcs_sh() -> str:
+    """
+    Bash helper: ``gcs <args>`` runs gcs_stage.py with Blender's Python –
+    staging the input and publishing every output, so no bucket is mounted.
+    """
+    return f"""\
+cat > gcs_stage.py <<'STAGE_EOF'
+{STAGE_SRC}
+STAGE_EOF
+gcs() {{
+  blender -b --factory-startup --python-exit-code 1 --python gcs_stage.py -- "$@"
+}}
+"""
+
+
+def _stage_sh() -> str:
+    """Bash: fetch $BLEND_URI to ./scene.blend with parallel ranged reads."""
+    return f"""\
+echo "📂  Staging $BLEND_URI"
+S0=$(date +%s)
+gcs "$BLEND_URI" scene.blend {settings.batch_stage_parts} {settings.batch_stage_chunk_mb}
+STAGE_S=$(( $(date +%s) - S0 ))
+"""
+
+
+def _preview_sh() -> str:
+    """Bash: quick denoised JPEG into $OUT_URI/preview/ when $PREV_SAMPLES is set; never fatal."""
+    denoise = "True" if settings.preview_denoise else "False"
+    return f"""\
+if [ -n "$PREV_SAMPLES" ]; then
+  echo "👀  Rendering preview ($PREV_SAMPLES samples at $PREV_PCT%)"
+  P0=$(date +%s)
+  blender -b scene.blend -E CYCLES --python-expr "import bpy; s = bpy.context.scene; s.cycles.samples = $PREV_SAMPLES; s.render.resolution_percentage = max(1, s.render.resolution_percentage * $PREV_PCT // 100); s.cycles.use_denoising = {denoise}; s.render.image_settings.file_format = 'JPEG'" -o //preview/preview_ -f 1 \\
+    && gcs put preview/* "$OUT_URI/preview/" \\
+    && PREVIEW_S=$(( $(date +%s) - P0 )) && signal {settings.preview_signal} \\
+    || echo "⚠️  Preview failed – continuing with the full render"
+fi
+"""
+
+
+def submit_many(tasks: list[RenderTask]) -> str:
+    """
+    One Batch job with one task per render.  Each task picks its scene from
+    the manifest baked into the script by ``BATCH_TASK_INDEX`` and fires its
+    own webhook signal.  All tasks must share one compute profile.
+    """
+    ids = [t.render_job_id for t in tasks]
+    job_id = (f"render-{ids[0]}-{uuid.uuid4().hex[:6]}" if len(tasks) == 1 else
+              f"renders-{ids[0]}-x{len(tasks)}-{uuid.uuid4().hex[:6]}")
+
+    profile = tasks[0].profile
+    if any(t.profile != profile for t in tasks):
+        raise ValueError("Coalesced renders must share one compute profile")
+    # generous ceiling: table value, but never below twice the expected render time
+    max_run_s = max([profile.max_run_s] +
+                    [int(2 * t.estimate.expected_s) + 600 for t in tasks if t.estimate])
+
+    # manifest: task index → render job id / .blend / sample override / estimated seconds / preview
+    manifest = "\n".join(
+        f"  {i}) RID={t.render_job_id}; BLEND_URI={_blend_uri(t.blend_uri)}; "
+        f"SAMPLES={int(t.samples) if t.samples else ''}; "
+        f"EST={round(t.estimate.expected_s) if t.estimate else ''}; "
+        f"PREV_SAMPLES={t.preview[0] if t.preview else ''}; PREV_PCT={t.preview[1] if t.preview else ''} ;;"
+        for i, t in enumerate(tasks)
+    )
 
     # ── shell script executed inside the Batch VM ──────────────────────────
     script = f"""\
 set -euo pipefail
 
-# 1) copy the uploaded blend (renders/<id>/<id>.blend) to ./scene.blend
-echo "📂  Copying .blend from renders/{render_job_id}/{render_job_id}.blend"
-cp "/mnt/stateful_partition/in/renders/{render_job_id}/{render_job_id}.blend" scene.blend
-
-# 2) render a single frame (CPU)
+# 0) pick this task's scene from the manifest
+case "${{BATCH_TASK_INDEX:-0}}" in
+{manifest}
+  *) echo "no manifest entry for task $BATCH_TASK_INDEX"; exit 1 ;;
+esac
+WORK=$(mktemp -d) && cd "$WORK"
+OUT_URI=gs://{settings.bucket}/renders/$RID
+PREVIEW_S=""
+{_signal_sh()}{_gcs_sh()}
+# 1) stage the uploaded blend (renders/<id>/<id>.blend) to ./scene.blend
+{_stage_sh()}
+# 2) optional progressive preview: few samples, scaled down → renders/<id>/preview/ + its own signal
+{_preview_sh()}
+# 3) render a single frame (CPU)
 echo "🎬  Rendering frame 1"
-blender -b scene.blend -E CYCLES -f 1
+ARGS=()
+if [ -n "$SAMPLES" ]; then
+  ARGS=(--python-expr "import bpy; bpy.context.scene.cycles.samples = $SAMPLES")
+fi
+T0=$(date +%s)
+blender -b scene.blend -E CYCLES "${{ARGS[@]}}" -f 1
+T1=$(date +%s)
 
-# 3) copy outputs back to out bucket
-OUT_DIR=/mnt/stateful_partition/out/renders/{render_job_id}
-mkdir -p "$OUT_DIR"
-cp *.png "$OUT_DIR/"
+# 4) upload outputs to renders/<id>/ (+ estimated vs actual runtime for calibration)
+echo "{{\\"render_job_id\\": \\"$RID\\", \\"profile\\": \\"{profile.name}\\", \\"estimated_s\\": ${{EST:-null}}, \\"actual_s\\": $((T1 - T0)), \\"stage_s\\": $STAGE_S, \\"preview_s\\": ${{PREVIEW_S:-null}}}}" > render_timing.json
+gcs put *.png render_timing.json "$OUT_URI/"
 
-# 4) webhook (required)
-apt-get -qq update && apt-get -y install --no-install-recommends curl >/dev/null
-curl -X POST -d '{{"workflow_id": "{render_job_id}"}}' -H "Content-Type: application/json" {settings.pipeline_manager_url}/actions/signal/rendering_process_post_blender
+# 5) webhook (required)
+signal rendering_process_post_blender
 """
 
-    # ── Batch API objects ───────────────────────────────────────────────────
-    client = batch_v1.BatchServiceClient()
+    labels = ({"render_job": ids[0], "profile": profile.name} if len(ids) == 1 else
+              {"render_job": ids[0], "render_tasks": str(len(ids)), "profile": profile.name})
+    # fewer VMs than tasks → later tasks reuse an already provisioned VM
+    parallelism = min(len(tasks), settings.batch_parallelism or len(tasks))
+    return _create_job(job_id, ids, [_container(script)], profile,
+                       max_run_s, len(tasks), parallelism, labels)
+
+
+def submit_tiled(task: RenderTask) -> str:
+    """
+    Split one frame into ``cols × rows`` border-render tiles, one Batch task
+    per tile, all running at once.  After a barrier, task 0 stitches the
+    tiles into the file the unsplit render would have produced in
+    renders/<id>/ and only then fires the webhook.
+    """
+    cols, rows = task.tiles
+    count = cols * rows
+    rid = task.render_job_id
+    profile = task.profile
+    job_id = f"render-{rid}-t{count}-{uuid.uuid4().hex[:6]}"
+    max_run_s = max(profile.max_run_s,
+                    int(2 * task.estimate.expected_s) + 600 if task.estimate else 0)
+    samples = int(task.samples) if task.samples else ""
+    est = round(task.estimate.expected_s) if task.estimate else ""
+    prev_samples, prev_pct = task.preview or ("", "")
+
+    prelude = f"""\
+set -euo pipefail
+RID={rid}; BLEND_URI={_blend_uri(task.blend_uri)}; SAMPLES={samples}; EST={est}
+PREV_SAMPLES={prev_samples}; PREV_PCT={prev_pct}
+I=${{BATCH_TASK_INDEX:-0}}
+OUT_URI=gs://{settings.bucket}/renders/$RID
+TILES_URI=$OUT_URI/tiles
+WORK=$(mktemp -d) && cd "$WORK"
+cat > stitcher.py <<'STITCHER_EOF'
+{STITCHER_SRC}
+STITCHER_EOF
+{_signal_sh()}{_gcs_sh()}"""
+
+    # ── every task: render its tile ─────────────────────────────────────────
+    render_script = prelude + f"""
+# 1) stage the uploaded blend (renders/<id>/<id>.blend) to ./scene.blend
+{_stage_sh()}
+# 2) task 0 renders the optional whole-frame preview first (its own signal)
+if [ "$I" = 0 ]; then
+{textwrap.indent(_preview_sh(), "  ")}fi
+
+# 3) render tile $I of {count} ({cols}×{rows})
+echo "🎬  Rendering tile $I/{count}"
+ARGS=()
+if [ -n "$SAMPLES" ]; then
+  ARGS=(--python-expr "import bpy; bpy.context.scene.cycles.samples = $SAMPLES")
+fi
+T0=$(date +%s)
+blender -b scene.blend -E CYCLES "${{ARGS[@]}}" --python stitcher.py -f 1 -- tile "$I" {cols} {rows}
+T1=$(date +%s)
+
+# 4) publish the tile – png first, the json marks it complete
+mv "tile_${{I}}_0001.png" "tile_$I.png"
+echo "🧱  Tile $I rendered in $((T1 - T0))s (staged in ${{STAGE_S}}s)"
+gcs put "tile_$I.png" "tile_$I.json" "$TILES_URI/"
+"""
+
+    # ── task 0 after the barrier: stitch, then webhook ──────────────────────
+    stitch_script = prelude + f"""
+[ "$I" = 0 ] || exit 0
+
+# 5) wait (up to 5 min) until every tile is in the bucket, fetch them, stitch
+if ! gcs wait "$TILES_URI/" .json {count} 300; then
+  echo "tiles missing – not stitching" >&2
+  exit 1
+fi
+gcs pull "$TILES_URI/" tiles
+mkdir -p out
+T0=$(date +%s)
+blender -b --python stitcher.py -- stitch tiles out
+T1=$(date +%s)
+echo "{{\\"render_job_id\\": \\"$RID\\", \\"profile\\": \\"{profile.name}\\", \\"tiles\\": {count}, \\"estimated_s\\": ${{EST:-null}}, \\"stitch_s\\": $((T1 - T0))}}" > out/render_timing.json
+gcs put out/* "$OUT_URI/"
+gcs rm "$TILES_URI/"
+
+# 6) webhook (required)
+signal rendering_process_post_blender
+"""
 
-    run = batch_v1.Runnable(
+    from google.cloud import batch_v1
+    runnables = [
+        _container(render_script),
+        batch_v1.Runnable(barrier=batch_v1.Runnable.Barrier(name="tiles-rendered")),
+        _container(stitch_script),
+    ]
+    labels = {"render_job": rid, "profile": profile.name, "tiles": str(count)}
+    # the barrier needs every tile task running at the same time
+    return _create_job(job_id, [rid], runnables, profile,
+                       max_run_s, count, count, labels)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Batch API objects
+# ──────────────────────────────────────────────────────────────────────────────
+def _container(script: str) -> batch_v1.Runnable:
+    from google.cloud import batch_v1
+    return batch_v1.Runnable(
         container=batch_v1.Runnable.Container(
             image_uri="docker.io/linuxserver/blender:3.5.0",
             entrypoint="/bin/bash",
@@ -58,37 +315,38 @@ curl -X POST -d '{{"workflow_id": "{render_job_id}"}}' -H "Content-Type: applica
         )
     )
 
+
+def _create_job(job_id: str, ids: list[str], runnables: list[batch_v1.Runnable],
+                profile: ComputeProfile, max_run_s: int,
+                task_count: int, parallelism: int, labels: dict[str, str]) -> str:
+    from google.cloud import batch_v1
+    from google.protobuf import duration_pb2
+    project_id, region = settings.project_id, settings.region
+    parent = f"projects/{project_id}/locations/{region}"
+    client = get_batch_client()
+
     job = batch_v1.Job(
         task_groups=[
             batch_v1.TaskGroup(
                 task_spec=batch_v1.TaskSpec(
-                    runnables=[run],
-                    volumes=[
-                        # INPUT  (mount entire bucket)
-                        batch_v1.Volume(
-                            gcs=batch_v1.GCS(remote_path=scene_bucket),
-                            mount_path="/mnt/stateful_partition/in",
-                        ),
-                        # OUTPUT (same bucket, but we'll write via renders/<id>/)
-                        batch_v1.Volume(
-                            gcs=batch_v1.GCS(remote_path=bucket),
-                            mount_path="/mnt/stateful_partition/out",
-                        ),
-                    ],
+                    # no volumes: the task stages its .blend and uploads its
+                    # outputs itself (gcs_stage.py), no bucket is mounted
+                    runnables=runnables,
                     compute_resource=batch_v1.ComputeResource(
-                        cpu_milli=96_000,
-                        memory_mib=384 * 1024,
+                        cpu_milli=profile.cpu_milli,
+                        memory_mib=profile.memory_mib,
                     ),
-                    max_run_duration=duration_pb2.Duration(seconds=3600),
+                    max_run_duration=duration_pb2.Duration(seconds=max_run_s),
                 ),
-                task_count=1,
+                task_count=task_count,
+                parallelism=parallelism,
             )
         ],
         allocation_policy=batch_v1.AllocationPolicy(
             instances=[
                 batch_v1.AllocationPolicy.InstancePolicyOrTemplate(
                     policy=batch_v1.AllocationPolicy.InstancePolicy(
-                        machine_type="n2-standard-96"
+                        machine_type=profile.machine_type
                     )
                 )
             ]
@@ -97,13 +355,105 @@ curl -X POST -d '{{"workflow_id": "{render_job_id}"}}' -H "Content-Type: applica
             destination=batch_v1.LogsPolicy.Destination.CLOUD_LOGGING,
             logs_path="batch_task_logs",
         ),
-        labels={"render_job": render_job_id},
+        labels=labels,
     )
 
-    logger.info(f"Batch job object created for render_job_id=%s, job_id=%s", render_job_id, job_id)
-    created = client.create_job(parent=parent, job=job, job_id=job_id)
+    logger.info(f"Batch job object created for render_job_ids=%s, job_id=%s", ids, job_id)
+    with metrics.BATCH_SUBMIT_SECONDS.time(kind="tiled" if labels.get("tiles") else "tasks"):
+        created = client.create_job(parent=parent, job=job, job_id=job_id)
     job_name = created.name  # projects/{project}/locations/{region}/jobs/{job_id}
     logger.info(
-        "Batch job submitted for render_job_id=%s, job_name=%s", render_job_id, job_name
+        "Batch job submitted for render_job_ids=%s, job_name=%s", ids, job_name
     )
     return job_name
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Submission coalescer
+# ──────────────────────────────────────────────────────────────────────────────
+class Coalescer:
+    """
+    Collects renders for up to ``window_s`` after the first one arrives (the
+    latency deadline) or until ``max_tasks`` are waiting, then submits them as
+    one multi-task Batch job.  Renders are grouped per compute profile.  Every
+    caller gets the shared job name back.
+    """
+
+    def __init__(self, window_s: float, max_tasks: int):
+        self.window_s  = window_s
+        self.max_tasks = max_tasks
+        self._pending: dict[str, list[tuple[RenderTask, asyncio.Future]]] = {}
+        self._timers:  dict[str, asyncio.TimerHandle] = {}
+
+    async def submit(self, task: RenderTask) -> str:
+        if task.tiles != (1, 1):
+            # a split render already fills its own job
+            return await asyncio.to_thread(submit_tiled, task)
+        if self.window_s <= 0 or self.max_tasks <= 1:
+            return await asyncio.to_thread(submit_many, [task])
+
+        key = task.profile.name
+        fut = asyncio.get_running_loop().create_future()
+        group = self._pending.setdefault(key, [])
+        group.append((task, fut))
+        if len(group) >= self.max_tasks:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.window_s, self._flush, key)
+        return await fut
+
+    async def submit_group(self, tasks: list[RenderTask]) -> list[str | Exception]:
+        """
+        Renders that are ready together (``/render/batch``): submitted at once
+        without the window, ``max_tasks`` per job and profile.  A failed
+        submission only fails the renders of that job.
+        """
+        calls: list[tuple] = []          # (task indexes, submit function, its argument)
+        groups: dict[str, list[int]] = {}
+        for i, t in enumerate(tasks):
+            if t.tiles != (1, 1):
+                calls.append(([i], submit_tiled, t))
+            else:
+                groups.setdefault(t.profile.name, []).append(i)
+        size = max(1, self.max_tasks)
+        for idx in groups.values():
+            for k in range(0, len(idx), size):
+                part = idx[k:k + size]
+                calls.append((part, submit_many, [tasks[i] for i in part]))
+        names = await asyncio.gather(*(asyncio.to_thread(fn, arg) for _, fn, arg in calls),
+                                     return_exceptions=True)
+        out: list[str | Exception] = [None] * len(tasks)
+        for (idx, _, _), name in zip(calls, names):
+            for i in idx:
+                out[i] = name
+        return out
+
+    def _flush(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.get_running_loop().create_task(self._send(batch))
+
+    async def _send(self, batch):
+        try:
+            name = await asyncio.to_thread(submit_many, [t for t, _ in batch])
+            logger.info("Coalesced %d renders into %s", len(batch), name)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_result(name)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+
+_coalescer: Coalescer | None = None
+
+def get_coalescer() -> Coalescer:
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = Coalescer(settings.batch_coalesce_window_s, settings.batch_max_tasks)
+    return _coalescer
@@ -0,0 +1,161 @@
+"""
+Runs INSIDE Blender – chains several scene passes in one process:
+
+    blender <base.blend> -b -P blender_chain.py -- <manifest.json>
+    blender -b -P blender_chain.py -- --batch <batch.json>
+
+The manifest lists the passes (script + the argv it expects after ``--``),
+the final save location and where to write the per-pass report.  Saves
+requested by the pass scripts are deferred, so the .blend is written once,
+after the last pass, optionally after purging orphan data-blocks and
+with Blender's compression (``optimize`` in the manifest).  Batch mode runs several builds one after another
+(``{"items": [{"id", "open", "manifest"}]}``): each item's base scene is
+opened fresh, ``@@item <id>`` marks where its output starts, and a failed
+item only leaves its own report failed.  Only stdlib + bpy may be imported here; the warm
+worker (``blender_worker.py``) imports ``run_manifest`` from this file.
+"""
+import json, os, runpy, sys, time, traceback
+
+import bpy
+
+
+class _DeferredSaves:
+    """Stands in for ``bpy.ops.wm`` and swallows save calls made by passes."""
+
+    def __init__(self, wm):
+        self._wm = wm
+        self.requested = []
+
+    def __getattr__(self, name):
+        return getattr(self._wm, name)
+
+    def save_mainfile(self, *args, **kwargs):
+        self.requested.append(kwargs.get("filepath") or bpy.data.filepath)
+        return {"FINISHED"}
+
+    def save_as_mainfile(self, *args, **kwargs):
+        self.requested.append(kwargs.get("filepath") or bpy.data.filepath)
+        return {"FINISHED"}
+
+
+def _run_pass(p, wm_proxy):
+    argv = [sys.argv[0], "-b", "-P", p["script"], "--", *p.get("argv", [])]
+    sys.argv = argv
+    t0 = time.perf_counter()
+    try:
+        runpy.run_path(p["script"], run_name="__main__")
+        ok, err = True, None
+    except SystemExit as e:
+        ok, err = (e.code in (None, 0)), (None if e.code in (None, 0) else f"exit {e.code}")
+    except Exception:
+        ok, err = False, traceback.format_exc()
+    secs = time.perf_counter() - t0
+    print(f"@@pass {p['name']} {'ok' if ok else 'failed'} {secs:.2f}s", flush=True)
+    return {"pass": p["name"], "seconds": round(secs, 3), "ok": ok, "error": err,
+            "saves": list(wm_proxy.requested)}
+
+
+_ID_TYPES = ("objects", "meshes", "materials", "images", "textures", "node_groups",
+             "collections", "actions", "curves", "lights", "cameras", "worlds")
+
+def _id_count():
+    return sum(len(getattr(bpy.data, a)) for a in _ID_TYPES)
+
+
+def _optimize(opt, save_as):
+    """
+    Drops orphan data-blocks before the final save.  Appended model files
+    bring everything they hold; blocks only used by other orphans would be
+    written.  ``measure`` first saves an unoptimised copy for its size.
+    A failure is reported (``ok`` false) but the entry is ``optional``:
+    the unoptimised file is still saved and the build does not fail.
+    """
+    r = {"pass": "optimize", "seconds": 0.0, "ok": True, "optional": True, "error": None,
+         "stats": {"compress": bool(opt.get("compress"))}}
+    t0 = time.perf_counter()
+    try:
+        if opt.get("measure"):
+            raw = save_as + ".raw"
+            bpy.ops.wm.save_as_mainfile(filepath=raw, copy=True)
+            r["stats"]["before_bytes"] = os.path.getsize(raw)
+            r["stats"]["baseline_save_s"] = round(time.perf_counter() - t0, 3)
+            os.remove(raw)
+        before = _id_count()
+        if opt.get("purge"):
+            bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+        r["stats"].update(ids_before=before, purged=before - _id_count())
+    except Exception:
+        r["ok"], r["error"] = False, traceback.format_exc()
+    r["seconds"] = round(time.perf_counter() - t0, 3)
+    print(f"@@pass optimize {'ok' if r['ok'] else 'failed'} {r['seconds']:.2f}s", flush=True)
+    return r
+
+
+def succeeded(report):
+    """Every pass ok; optional steps (``optimize``) may fail without failing the build."""
+    return all(r["ok"] or r.get("optional") for r in report)
+
+
+def run_manifest(manifest):
+    """Run every pass of ``manifest`` on the open file; returns the report."""
+    saved_argv = list(sys.argv)
+    proxy = _DeferredSaves(bpy.ops.wm)
+    bpy.ops.wm = proxy      # module attribute shadows bpy.ops.__getattr__
+
+    report, failed = [], False
+    try:
+        for p in manifest["passes"]:
+            proxy.requested.clear()
+            r = _run_pass(p, proxy)
+            report.append(r)
+            if not r["ok"]:
+                failed = True
+                break
+    finally:
+        sys.argv = saved_argv
+        del bpy.ops.wm
+
+    opt = manifest.get("optimize") or {}
+    if not failed and opt:
+        report.append(_optimize(opt, manifest["save_as"]))
+    if not failed:
+        save = {"pass": "save", "seconds": 0.0, "ok": False, "error": None}
+        t0 = time.perf_counter()
+        try:
+            bpy.ops.wm.save_as_mainfile(filepath=manifest["save_as"],
+                                        compress=bool(opt.get("compress")))
+            save["ok"] = True
+        except Exception:
+            save["error"] = traceback.format_exc()
+        save["seconds"] = round(time.perf_counter() - t0, 3)
+        report.append(save)
+        print(f"@@pass save {'ok' if save['ok'] else 'failed'} {save['seconds']:.2f}s", flush=True)
+
+    with open(manifest["report"], "w") as f:
+        json.dump(report, f)
+    return report
+
+
+def run_batch(batch):
+    for item in batch["items"]:
+        print(f"@@item {item['id']}", flush=True)
+        try:
+            bpy.ops.wm.open_mainfile(filepath=item["open"])
+            with open(item["manifest"]) as f:
+                run_manifest(json.load(f))
+        except Exception:
+            traceback.print_exc()          # no report → the service fails this item only
+
+
+def main():
+    args = sys.argv[sys.argv.index("--") + 1:]
+    if args[0] == "--batch":
+        run_batch(json.load(open(args[1])))
+        sys.exit(0)
+    manifest = json.load(open(args[0]))
+    report = run_manifest(manifest)
+    sys.exit(0 if succeeded(report) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Blender ``config.json`` for the scene script.
+
+``write_config`` streams the file straight from the parsed ``PostData``: one
+pre-laid-out string per scene object, flushed in blocks, with no per-object
+dict.  Output is byte-identical to ``json.dumps(build_config(...))`` (the
+original dict path, kept as the reference and as the fallback for objects
+holding non-finite numbers).
+"""
+from __future__ import annotations
+import json, math
+from json.encoder import encode_basestring_ascii as _str
+from pathlib import Path
+from typing import IO
+
+from models.scene import PostData, SceneObjectData
+
+_BLOCK = 512                     # objects per write
+
+# float → repr memo.  Rotations, quaternions, scales and light settings repeat
+# across placed objects and repr() is most of the cost.  Exact for floats:
+# distinct non-zero floats never compare equal; ±0.0 do, so zero is not cached.
+_REPR: dict[float, str] = {}
+_REPR_MAX = 1 << 16
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Reference (dict) path
+# ──────────────────────────────────────────────────────────────────────────────
+def model_config_dict(o: SceneObjectData, model_path: str) -> dict:
+    return {
+        "ModelBlenderPath":      model_path,
+        "InnerPath":             o.inner_path,
+        "ObjectName":            o.object_name,
+        "PositionX":             o.position_x,  "PositionY": o.position_y,  "PositionZ": o.position_z,
+        "RotationX":             o.rotation_x,  "RotationY": o.rotation_y,  "RotationZ": o.rotation_z,
+        "QuaternionX":           o.quaternion_x,"QuaternionY":o.quaternion_y,
+        "QuaternionZ":           o.quaternion_z,"QuaternionW":o.quaternion_w,
+        "Scale":                 o.scale,       "ScaleX": o.scale_x, "ScaleY": o.scale_y, "ScaleZ": o.scale_z,
+        "IsCurtain": o.is_curtain, "IsFloor": o.is_floor, "ShowLights": o.show_lights,
+        "LightsColor": o.lights_color, "LightsPower": o.lights_power,
+        "LightRadius": o.light_radius,
+        "LightSourcesPositions": [
+            {"X": v.x, "Y": v.y, "Z": v.z}
+            for v in (o.light_sources_positions or [])
+        ],
+        "IsMirror": o.is_mirror
+    }
+
+
+def _head_tail(data: PostData, blend_out: Path, scene_path: Path,
+               image_path: Path) -> tuple[dict, dict]:
+    """Top-level keys before / after ``SceneModels`` (order matters for the bytes)."""
+    head = {
+        "SceneGLTFPath": str(scene_path),
+        "Samples": data.samples,
+        "OutputFormat": data.output_format,
+        "ResX": data.res_x, "ResY": data.res_y,
+        "SceneImagePath": str(image_path),
+    }
+    tail = {
+        "SceneScale": data.scene_scale,
+        "SceneObjectName": data.scene_object_name,
+        "CameraObjectName": data.camera_object_name,
+        "FrameObjectName": "ApplyDesignGroup",
+        "SceneMatName": "Scene_Material",
+        "SceneSaveLocation": str(blend_out),
+        "AreaLightObjectName": "Area Light Source",
+        "PointLightObjectName": "Point Light Source",
+        "AmbientLightObjectName": "Ambient Light",
+        "AreaLightMatName": "Plane_Emission_Mat",
+        "MirrorInScene": data.mirror_in_scene
+    }
+    return head, tail
+
+
+def build_config(blend_out: Path, scene_path: Path, image_path: Path,
+                 data: PostData, model_paths: list[str]) -> dict:
+    head, tail = _head_tail(data, blend_out, scene_path, image_path)
+    models = [model_config_dict(o, model_paths[i]) for i, o in enumerate(data.scene_objects)]
+    return {**head, "SceneModels": models, **tail}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Streaming path
+# ──────────────────────────────────────────────────────────────────────────────
+def _opt_str(v: str | None) -> str:
+    return "null" if v is None else _str(v)
+
+def _num(x: float) -> str:
+    r = _REPR.get(x)
+    if r is None or not x or x.__class__ is not float:
+        r = repr(x)
+        if x and x.__class__ is float and len(_REPR) < _REPR_MAX:
+            _REPR[x] = r
+    return r
+
+def _opt_num(v: float | None) -> str:
+    return "null" if v is None else _num(v)
+
+def _bool(v: bool) -> str:
+    return "true" if v else "false"
+
+
+def _model_json(o: SceneObjectData, model_path: str) -> str:
+    # json.dumps writes floats with float.__repr__ – identical unless NaN / ±inf
+    if not math.isfinite(o.position_x + o.position_y + o.position_z + o.rotation_x +
+                         o.rotation_y + o.rotation_z + o.quaternion_x + o.quaternion_y +
+                         o.quaternion_z + o.quaternion_w + o.scale + o.scale_x +
+                         o.scale_y + o.scale_z + (o.lights_power or 0.0) +
+                         (o.light_radius or 0.0)) or \
+            any(not math.isfinite(v.x + v.y + v.z) for v in o.light_sources_positions or ()):
+        return json.dumps(model_config_dict(o, model_path))
+
+    n, lights = _num, o.light_sources_positions
+    lights_json = ("[" + ", ".join(f'{{"X": {n(v.x)}, "Y": {n(v.y)}, "Z": {n(v.z)}}}'
+                                   for v in lights) + "]") if lights else "[]"
+    return (
+        f'{{"ModelBlenderPath": {_str(model_path)}, "InnerPath": {_opt_str(o.inner_path)}, '
+        f'"ObjectName": {_opt_str(o.object_name)}, '
+        f'"PositionX": {n(o.position_x)}, "PositionY": {n(o.position_y)}, "PositionZ": {n(o.position_z)}, '
+        f'"RotationX": {n(o.rotation_x)}, "RotationY": {n(o.rotation_y)}, "RotationZ": {n(o.rotation_z)}, '
+        f'"QuaternionX": {n(o.quaternion_x)}, "QuaternionY": {n(o.quaternion_y)}, '
+        f'"QuaternionZ": {n(o.quaternion_z)}, "QuaternionW": {n(o.quaternion_w)}, '
+        f'"Scale": {n(o.scale)}, "ScaleX": {n(o.scale_x)}, "ScaleY": {n(o.scale_y)}, "ScaleZ": {n(o.scale_z)}, '
+        f'"IsCurtain": {_bool(o.is_curtain)}, "IsFloor": {_bool(o.is_floor)}, '
+        f'"ShowLights": {_bool(o.show_lights)}, '
+        f'"LightsColor": {_opt_str(o.lights_color)}, "LightsPower": {_opt_num(o.lights_power)}, '
+        f'"LightRadius": {_opt_num(o.light_radius)}, '
+        f'"LightSourcesPositions": {lights_json}, "IsMirror": {_bool(o.is_mirror)}}}'
+    )
+
+
+def stream_config(f: IO[str], blend_out: Path, scene_path: Path, image_path: Path,
+                  data: PostData, model_paths: list[str]):
+    head, tail = _head_tail(data, blend_out, scene_path, image_path)
+    f.write(json.dumps(head)[:-1] + ', "SceneModels": [')
+    objs = data.scene_objects
+    for start in range(0, len(objs), _BLOCK):
+        block = ", ".join(_model_json(o, model_paths[i])
+                          for i, o in enumerate(objs[start:start + _BLOCK], start))
+        f.write(block if start == 0 else ", " + block)
+    f.write("], " + json.dumps(tail)[1:])
+
+
+def write_config(cfg_dir: Path, blend_out: Path, scene_path: Path, image_path: Path,
+                 data: PostData, model_paths: list[str]) -> Path:
+    cfg_dir.mkdir(parents=True, exist_ok=True)
+    cfg_path = cfg_dir / "config.json"
+    with open(cfg_path, "w", buffering=1 << 16) as f:
+        stream_config(f, blend_out, scene_path, image_path, data, model_paths)
+    return cfg_path
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import collections, logging, re, time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from settings import settings
+
+logger = logging.getLogger("blender_log")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Progress events parsed from Blender output
+# ──────────────────────────────────────────────────────────────────────────────
+@dataclass
+class ProgressEvent:
+    t:       float             # seconds since the log was opened
+    kind:    str               # "load" | "append" | "save" | "pass" | "frame" | "sample"
+    detail:  str
+    frame:   int | None = None
+    done:    int | None = None  # samples (or tiles) finished …
+    total:   int | None = None  # … out of
+
+
+_PATTERNS: list[tuple[str, re.Pattern]] = [
+    ("load",   re.compile(r'^Read (?:blend|new prefs): "?(?P<detail>[^"]+)"?')),
+    ("load",   re.compile(r"^(?:Import(?:ing)?|Loading|Load(?:ed)?)\b[: ]+(?P<detail>.+)", re.I)),
+    ("append", re.compile(r"\bAppend(?:ed|ing)?\b[: ]*(?P<detail>.*)", re.I)),
+    ("save",   re.compile(r'(?:Info: )?Saved "?(?P<detail>[^"]+)"?')),
+    ("pass",   re.compile(r"^@@pass (?P<detail>.+)")),
+]
+# Cycles: "Fra:1 Mem:… | Time:00:03.21 | … | Sample 12/128"  (older: "Rendered 3/16 Tiles")
+_FRAME  = re.compile(r"^Fra:(?P<frame>\d+)\b")
+_SAMPLE = re.compile(r"\b(?:Sample|Path Tracing Sample|Rendered) (?P<done>\d+)/(?P<total>\d+)")
+
+
+class ProgressParser:
+    """Turns Blender stdout lines into ``ProgressEvent``s (``None`` for noise)."""
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self._last_frame: int | None = None
+
+    def feed(self, line: str) -> ProgressEvent | None:
+        line = line.strip()
+        if not line:
+            return None
+        t = round(time.monotonic() - self.t0, 3)
+
+        m = _FRAME.match(line)
+        if m:
+            frame = int(m["frame"])
+            s = _SAMPLE.search(line)
+            if s:
+                return ProgressEvent(t, "sample", line.rsplit("|", 1)[-1].strip(), frame,
+                                     int(s["done"]), int(s["total"]))
+            if frame != self._last_frame:
+                self._last_frame = frame
+                return ProgressEvent(t, "frame", f"frame {frame}", frame)
+            return None
+
+        for kind, pat in _PATTERNS:
+            m = pat.search(line)
+            if m:
+                return ProgressEvent(t, kind, m["detail"].strip()[:200])
+        return None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Buffered log sink
+# ──────────────────────────────────────────────────────────────────────────────
+class BlenderLog:
+    """
+    Sink for one job's Blender output.  Lines go to ``path`` through one open
+    handle, flushed every ``blender_log_flush_s`` (and on close) instead of a
+    reopen per line.  Memory is bounded: the last ``blender_log_tail_kb`` of
+    output are kept for error reports, plus the recent progress events.
+    """
+
+    MAX_EVENTS = 200
+
+    def __init__(self, job_id: str, path: Path | None):
+        self.job_id = job_id
+        self.path = path
+        self.lines = 0
+        self.bytes = 0
+        self.events: collections.deque[ProgressEvent] = collections.deque(maxlen=self.MAX_EVENTS)
+        self.latest: dict[str, ProgressEvent] = {}     # most recent event per kind
+        self.closed = False
+        self._parser = ProgressParser()
+        self._tail: collections.deque[str] = collections.deque()
+        self._tail_bytes = 0
+        self._tail_max = settings.blender_log_tail_kb * 1024
+        self._fh = path.open("a", buffering=1 << 16) if path else None
+        self._flushed = time.monotonic()
+
+    def write(self, text: str):
+        if self.closed:
+            return
+        for line in text.splitlines(keepends=True):
+            self._line(line if line.endswith("\n") else line + "\n")
+        now = time.monotonic()
+        if self._fh and now - self._flushed >= settings.blender_log_flush_s:
+            self._fh.flush()
+            self._flushed = now
+
+    def _line(self, line: str):
+        self.lines += 1
+        self.bytes += len(line)
+        if self._fh:
+            self._fh.write(line)
+        self._tail.append(line)
+        self._tail_bytes += len(line)
+        while self._tail_bytes > self._tail_max and len(self._tail) > 1:
+            self._tail_bytes -= len(self._tail.popleft())
+
+        ev = self._parser.feed(line)
+        if ev:
+            self.events.append(ev)
+            self.latest[ev.kind] = ev
+            if ev.kind != "sample":       # sample lines would flood the service log
+                logger.info("[%s] %s: %s", self.job_id, ev.kind, ev.detail)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%s] %s", self.job_id, line.rstrip())
+
+    def tail(self) -> str:
+        return "".join(self._tail)
+
+    def error_report(self, msg: str) -> str:
+        """``msg`` plus where to find the full log and the tail of the output."""
+        return (msg + "\nLog file: " + (str(self.path) if self.path else "<none>") +
+                "\n── last output ──\n" + self.tail())
+
+    def progress(self, last: int = 20) -> dict:
+        return {
+            "lines":  self.lines,
+            "bytes":  self.bytes,
+            "closed": self.closed,
+            "latest": {k: asdict(e) for k, e in self.latest.items()},
+            "events": [asdict(e) for e in list(self.events)[-last:]],
+        }
+
+    def close(self):
+        if not self.closed and self._fh:
+            self._fh.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ─────────────────────────── per-job registry ────────────────────────────
+_MAX_KEPT = 256                     # finished logs kept for status queries
+_logs: "collections.OrderedDict[str, BlenderLog]" = collections.OrderedDict()
+
+def open_log(job_id: str, path: Path | None) -> BlenderLog:
+    old = _logs.pop(job_id, None)
+    if old:
+        old.close()
+    log = _logs[job_id] = BlenderLog(job_id, path)
+    while len(_logs) > _MAX_KEPT:
+        _logs.popitem(last=False)[1].close()
+    return log
+
+def progress(job_id: str) -> dict | None:
+    log = _logs.get(job_id)
+    return log.progress() if log else None
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import asyncio, json, logging, time, uuid
+from pathlib import Path
+
+from services.blender_log import BlenderLog
+from settings import settings
+
+logger = logging.getLogger("blender_pool")
+
+WORKER_SCRIPT = Path(__file__).with_name("blender_worker.py")
+RESULT_PREFIX = "@@result "
+
+
+class WorkerCrashed(RuntimeError):
+    """The Blender worker exited while a job was running on it."""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  One pre-started background Blender process
+# ──────────────────────────────────────────────────────────────────────────────
+class BlenderWorker:
+    def __init__(self, n: int):
+        self.n       = n
+        self.proc: asyncio.subprocess.Process | None = None
+        self.jobs    = 0
+        self.base_rss_kb = 0
+        self.broken  = False
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            settings.blender_exe_location, "-b", "-P", str(WORKER_SCRIPT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=1 << 20,
+        )
+        t0 = time.perf_counter()
+        try:
+            while True:
+                raw = await asyncio.wait_for(self.proc.stdout.readline(),
+                                             settings.blender_pool_start_timeout_s)
+                if not raw:
+                    raise WorkerCrashed(f"worker {self.n} exited during startup")
+                if raw.startswith(b"@@ready"):
+                    break
+        except BaseException:
+            # timed out, crashed or cancelled: don't leave the process behind
+            await self.kill()
+            raise
+        self.jobs = 0
+        self.base_rss_kb = self.rss_kb()
+        logger.info("Blender worker %d ready (pid %d) in %.1fs",
+                    self.n, self.proc.pid, time.perf_counter() - t0)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    def rss_kb(self) -> int:
+        try:
+            for line in Path(f"/proc/{self.proc.pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        except (OSError, ValueError, AttributeError):
+            pass
+        return 0
+
+    def worn_out(self) -> bool:
+        if self.jobs >= settings.blender_pool_max_jobs:
+            return True
+        growth_mb = (self.rss_kb() - self.base_rss_kb) / 1024
+        return growth_mb > settings.blender_pool_max_rss_growth_mb
+
+    async def kill(self):
+        if self.proc is None:
+            return
+        if self.proc.returncode is None:
+            try:
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+        await self.proc.wait()
+
+    async def stop(self):
+        if not self.alive:
+            return
+        self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), 10)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+            await self.proc.wait()
+
+    async def run(self, base: str, manifest: Path, log: BlenderLog | None) -> bool:
+        """Send one chained build; stream its output into ``log``."""
+        cmd = {"id": uuid.uuid4().hex, "open": str(base), "manifest": str(manifest)}
+        self.proc.stdin.write((json.dumps(cmd) + "\n").encode())
+        await self.proc.stdin.drain()
+        self.jobs += 1
+
+        log = log or BlenderLog(f"worker-{self.n}", None)
+        while True:
+            raw = await self.proc.stdout.readline()
+            if not raw:
+                raise WorkerCrashed(f"worker {self.n} exited with {self.proc.returncode}")
+            line = raw.decode("utf-8", errors="replace")
+            if line.startswith(RESULT_PREFIX):
+                res = json.loads(line[len(RESULT_PREFIX):])
+                if res.get("error"):
+                    log.write(res["error"])
+                return bool(res["ok"])
+            log.write(line)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Pool
+# ──────────────────────────────────────────────────────────────────────────────
+class BlenderPool:
+    """
+    ``size`` warm workers.  A job borrows one, runs, and hands it back; the
+    worker is recycled after ``blender_pool_max_jobs`` jobs or when its RSS
+    grew past ``blender_pool_max_rss_growth_mb``, and replaced if it crashed.
+    """
+
+    def __init__(self, size: int):
+        self.size  = size
+        self._idle: asyncio.Queue[BlenderWorker] = asyncio.Queue()
+        self._busy: set[BlenderWorker] = set()
+        self._started = False
+        self._stopped = False
+
+    async def start(self):
+        if self._started:
+            return
+        self._started = True
+        spawned = await asyncio.gather(*(self._spawn(i) for i in range(self.size)),
+                                       return_exceptions=True)
+        for i, w in enumerate(spawned):
+            if isinstance(w, BaseException):
+                logger.error("Blender worker %d failed to start: %s", i, w)
+                w = BlenderWorker(i)   # dead placeholder; respawned on first borrow
+            self._idle.put_nowait(w)
+
+    async def stop(self):
+        self._stopped = True
+        while not self._idle.empty():
+            await self._idle.get_nowait().stop()
+        # builds still running at shutdown: their results are lost anyway
+        for w in list(self._busy):
+            w.broken = True
+            await w.kill()
+
+    async def _spawn(self, n: int) -> BlenderWorker:
+        w = BlenderWorker(n)
+        await w.start()
+        return w
+
+    async def run(self, base: str, manifest: Path, log: BlenderLog | None,
+                  timeout_s: float | None = None) -> bool:
+        if not self._started:
+            await self.start()
+        w = await self._idle.get()
+        self._busy.add(w)
+        try:
+            if not w.alive:
+                self._busy.discard(w)
+                w = await self._spawn(w.n)
+                self._busy.add(w)
+            timeout = timeout_s if timeout_s is not None else settings.blender_timeout_s
+            return await asyncio.wait_for(w.run(base, manifest, log), timeout or None)
+        except BaseException:
+            # state unknown (crash, timeout, cancellation) → never reuse it
+            w.broken = True
+            if w.alive:
+                w.proc.kill()
+            raise
+        finally:
+            self._busy.discard(w)
+            asyncio.get_running_loop().create_task(self._give_back(w))
+
+    async def _give_back(self, w: BlenderWorker):
+        if self._stopped:
+            await w.kill()
+            return
+        try:
+            if w.broken or not w.alive or w.worn_out():
+                logger.info("Recycling Blender worker %d after %d jobs", w.n, w.jobs)
+                await w.stop()
+                w = await self._spawn(w.n)
+        except Exception as e:
+            logger.error("Failed to restart Blender worker %d: %s", w.n, e)
+            w = BlenderWorker(w.n)     # dead placeholder; respawned on next borrow
+        self._idle.put_nowait(w)
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_pool: BlenderPool | None = None
+
+def get_blender_pool() -> BlenderPool | None:
+    """Warm pool, or ``None`` when ``blender_pool_size`` is 0."""
+    global _pool
+    if settings.blender_pool_size <= 0:
+        return None
+    if _pool is None:
+        _pool = BlenderPool(settings.blender_pool_size)
+    return _pool
@@ -0,0 +1,49 @@
+"""
+Runs INSIDE Blender – a long-lived worker for the warm pool:
+
+    blender -b -P blender_worker.py
+
+Reads one JSON command per line on stdin::
+
+    {"id": "...", "open": "<base.blend>", "manifest": "<chain.json>"}
+
+opens the base scene, runs the chained passes (see ``blender_chain.py``),
+resets to an empty file and answers with ``@@result {...}`` on stdout.
+Everything printed in between belongs to that job's log.
+"""
+import json, os, sys, traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+from blender_chain import run_manifest, succeeded
+
+
+def _handle(cmd):
+    try:
+        bpy.ops.wm.open_mainfile(filepath=cmd["open"])
+        with open(cmd["manifest"]) as f:
+            report = run_manifest(json.load(f))
+        return succeeded(report), None
+    except Exception:
+        return False, traceback.format_exc()
+    finally:
+        # drop the job's data-blocks so the next job starts clean
+        try:
+            bpy.ops.wm.read_homefile(use_empty=True)
+        except Exception:
+            traceback.print_exc()
+
+
+def serve():
+    print("@@ready", flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        cmd = json.loads(line)
+        ok, error = _handle(cmd)
+        print("@@result " + json.dumps({"id": cmd["id"], "ok": ok, "error": error}),
+              flush=True)
+
+
+serve()
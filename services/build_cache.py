@@ -0,0 +1,119 @@
+from __future__ import annotations
+import asyncio, hashlib, json, logging, time
+from dataclasses import dataclass
+
+from models.scene import PostData
+from services.uploader import get_uploader
+from settings import settings
+
+logger = logging.getLogger("build_cache")
+
+# bump when the build pipeline changes in a way that alters the .blend
+PIPELINE_VERSION = "1"
+
+# PostData fields that do not change the built .blend:
+#   ids / callbacks, and Samples / preview – applied by the Batch render command instead
+EXCLUDED_FIELDS = {"render_job_id", "webhook", "samples",
+                   "preview", "preview_samples", "preview_scale"}
+
+
+@dataclass
+class BuildCacheStats:
+    hits:          int = 0
+    misses:        int = 0
+    saved_seconds: float = 0.0
+
+
+stats = BuildCacheStats()
+
+
+def fingerprint(data: PostData, content_hashes: dict[str, str | None],
+                tool_version: str) -> str | None:
+    """
+    Canonical SHA-256 over everything that shapes the built .blend: the
+    relevant PostData fields with every asset URL replaced by the hash of the
+    bytes we downloaded, plus the Blender tool versions.  ``None`` when an
+    input has no stable identity (missing hash, local tool fallback).
+    """
+    if tool_version == "local-fallback":
+        return None
+
+    def content(url: str | None):
+        if url is None:
+            return None
+        h = content_hashes.get(url)
+        if h is None:
+            raise KeyError(url)
+        return h
+
+    doc = data.model_dump(by_alias=True, exclude=EXCLUDED_FIELDS)
+    try:
+        doc["SceneGLTFUri"]  = content(data.scene_gltf_uri)
+        doc["SpaceImageUri"] = content(data.space_image_uri)
+        for o in doc["SceneObjects"]:
+            o["ModelBlenderUri"] = content(o["ModelBlenderUri"])
+        preset = doc.get("RenderingPreset")
+        if preset and preset.get("IsExtension"):
+            preset["ScriptDownloadURL"] = content_hashes.get(preset["ScriptDownloadURL"])
+    except KeyError as e:
+        logger.info("No build fingerprint – asset %s has no content hash", e)
+        return None
+
+    artifact = {"purge": settings.artifact_purge_orphans, "compress": settings.artifact_compress}
+    canon = json.dumps({"pipeline": PIPELINE_VERSION, "tools": tool_version, "data": doc,
+                        "artifact": artifact}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canon.encode()).hexdigest()
+
+
+def _entry_name(fp: str) -> str:
+    return f"{settings.build_cache_prefix}{fp}.json"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  GCS-backed index  (build-cache/<fingerprint>.json → previously built .blend)
+# ──────────────────────────────────────────────────────────────────────────────
+async def lookup(fp: str) -> dict | None:
+    """Index entry for ``fp``.  The cache is only an optimisation: any error is a miss."""
+    try:
+        return await asyncio.to_thread(_lookup_blocking, fp)
+    except Exception as e:
+        logger.warning("Build cache lookup of %s failed, building instead: %s", fp, e)
+        return None
+
+def _lookup_blocking(fp: str) -> dict | None:
+    bucket = get_uploader().client().bucket(settings.bucket)
+    entry = bucket.get_blob(_entry_name(fp))
+    if entry is None:
+        return None
+    doc = json.loads(entry.download_as_bytes())
+    blend = bucket.get_blob(doc["object"])
+    if blend is None:
+        return None                    # .blend deleted since – rebuild
+    doc.setdefault("bytes", blend.size or 0)     # entries recorded before sizes were kept
+    return doc
+
+async def record(fp: str, object_name: str, build_seconds: float, blend_bytes: int = 0):
+    """Index a freshly uploaded build; failing to do so never fails the render."""
+    try:
+        await asyncio.to_thread(_record_blocking, fp, object_name, build_seconds, blend_bytes)
+    except Exception as e:
+        logger.warning("Build cache record of %s failed: %s", fp, e)
+
+def _record_blocking(fp: str, object_name: str, build_seconds: float, blend_bytes: int):
+    bucket = get_uploader().client().bucket(settings.bucket)
+    bucket.blob(_entry_name(fp)).upload_from_string(
+        json.dumps({"object": object_name, "build_seconds": build_seconds,
+                    "bytes": blend_bytes, "created": time.time()}),
+        content_type="application/json")
+
+async def reuse(doc: dict, object_name: str) -> str:
+    """
+    Server-side copy of the cached .blend to ``object_name``; returns its gs:// URI.
+    Raises when the copy fails (source deleted since the lookup, …) – the caller builds.
+    """
+    def _copy():
+        bucket = get_uploader().client().bucket(settings.bucket)
+        if doc["object"] != object_name:
+            bucket.copy_blob(bucket.blob(doc["object"]), bucket, object_name)
+        return f"gs://{settings.bucket}/{object_name}"
+    return await asyncio.to_thread(_copy)
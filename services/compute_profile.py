@@ -0,0 +1,125 @@
+from __future__ import annotations
+import logging, math
+from dataclasses import dataclass
+
+from models.scene import PostData
+from services.stitcher import grid
+from settings import settings
+
+logger = logging.getLogger("compute_profile")
+
+REFERENCE_CPU_MILLI = 96_000       # the estimate is expressed on an n2-standard-96
+
+
+@dataclass(frozen=True)
+class ComputeProfile:
+    name:           str
+    machine_type:   str
+    cpu_milli:      int
+    memory_mib:     int
+    max_run_s:      int
+    max_estimate_s: float          # largest reference estimate this profile takes
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ComputeProfile":
+        return cls(**d)
+
+
+@dataclass
+class RenderEstimate:
+    reference_s: float             # expected render seconds on the reference machine (per task)
+    profile:     ComputeProfile
+    tiles:       tuple[int, int] = (1, 1)    # cols × rows of border-render tiles
+    memory_mib:  int = 0                     # estimated peak memory of one task
+
+    @property
+    def tile_count(self) -> int:
+        return self.tiles[0] * self.tiles[1]
+
+    @property
+    def expected_s(self) -> float:
+        """Expected render seconds of one task on the selected profile."""
+        return self.reference_s * REFERENCE_CPU_MILLI / self.profile.cpu_milli
+
+    def public(self) -> dict:
+        return {"profile": self.profile.name, "machine_type": self.profile.machine_type,
+                "reference_s": round(self.reference_s, 1),
+                "expected_s": round(self.expected_s, 1),
+                "memory_mib": self.memory_mib,
+                "tiles": self.tile_count}
+
+
+def estimate_seconds(data: PostData, blend_bytes: int = 0) -> float:
+    """
+    Rough Cycles cost model: pixels × samples, scaled by scene features.
+    ``compute_cost_s_per_mpx_sample`` is the calibration knob – compare the
+    ``render_timing.json`` files Batch writes next to each render against it.
+    """
+    mpx     = data.res_x * data.res_y / 1e6
+    objects = len(data.scene_objects)
+    lights  = sum(len(o.light_sources_positions or []) + (1 if o.show_lights else 0)
+                  for o in data.scene_objects)
+    mirrors = data.mirror_in_scene or any(o.is_mirror for o in data.scene_objects)
+
+    cost = mpx * data.samples * settings.compute_cost_s_per_mpx_sample
+    cost *= 1 + 0.005 * objects
+    cost *= 1 + 0.02 * lights
+    if mirrors:
+        cost *= 1.25
+    if data.is360:
+        cost *= 1.5
+    # scene load + BVH build grow with the .blend
+    cost += blend_bytes / 1024 / 1024 * settings.compute_cost_s_per_blend_mb
+    return cost
+
+
+def estimate_memory_mib(data: PostData, blend_bytes: int = 0) -> int:
+    """
+    Peak memory of one render task: a floor for Blender, the loaded scene
+    (grows with the .blend – expanded when it is saved compressed) and the
+    film / denoise buffers.  Every tile of a split render loads the whole scene.
+    """
+    blend_mb = blend_bytes / 1024 / 1024
+    if settings.artifact_compress:
+        blend_mb *= settings.compute_memory_compressed_factor
+    mpx = data.res_x * data.res_y / 1e6
+    return math.ceil(settings.compute_memory_base_mib
+                     + blend_mb * settings.compute_memory_mib_per_blend_mb
+                     + mpx * settings.compute_memory_mib_per_mpx)
+
+
+def plan_tiles(reference_s: float) -> tuple[int, int]:
+    """
+    Tile grid for split rendering – none unless ``tile_mode`` is "auto" and
+    the frame is expensive (the estimate already scales with resolution and
+    samples).  Aims for ``tile_target_s`` of work per tile.
+    """
+    if settings.tile_mode != "auto" or reference_s <= settings.tile_min_estimate_s:
+        return 1, 1
+    n = min(settings.tile_max, max(2, math.ceil(reference_s / settings.tile_target_s)))
+    cols, rows = grid(n)
+    while cols * rows > settings.tile_max:      # grid() rounds up – stay within the cap
+        rows -= 1
+    return cols, rows
+
+
+def select_profile(data: PostData, blend_bytes: int = 0) -> RenderEstimate:
+    profiles = [ComputeProfile.from_dict(p) for p in settings.compute_profiles]
+    profiles.sort(key=lambda p: p.max_estimate_s)
+    ref = estimate_seconds(data, blend_bytes)
+    tiles = plan_tiles(ref)
+    if tiles != (1, 1):
+        # every tile loads the whole scene but renders only its share of pixels
+        load = blend_bytes / 1024 / 1024 * settings.compute_cost_s_per_blend_mb
+        ref = (ref - load) / (tiles[0] * tiles[1]) + load
+    # the larger of what the time estimate and the memory need ask for
+    by_time = next((i for i, p in enumerate(profiles) if ref <= p.max_estimate_s),
+                   len(profiles) - 1)
+    memory = estimate_memory_mib(data, blend_bytes)
+    by_memory = next((i for i, p in enumerate(profiles) if memory <= p.memory_mib),
+                     len(profiles) - 1)
+    chosen = profiles[max(by_time, by_memory)]
+    est = RenderEstimate(ref, chosen, tiles, memory)
+    logger.info("Render estimate %.0fs (reference, %d tile(s)), ~%d MiB → profile %s (%s, ~%.0fs)",
+                ref, est.tile_count, memory, chosen.name, chosen.machine_type, est.expected_s)
+    return est
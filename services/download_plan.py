@@ -0,0 +1,116 @@
+from __future__ import annotations
+import asyncio, logging, time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from models.scene import PostData
+from services.asset_cache import get_asset_cache
+from services.http_fetch import get_fetcher
+from services import metrics
+from settings import settings
+
+logger = logging.getLogger("download_plan")
+
+
+@dataclass
+class PlannedAsset:
+    key:       str             # "scene_gltf", "space_image", "model:<uri>", "extension"
+    url:       str
+    dest:      Path
+    cached:    bool = False    # go through the shared model asset cache
+    optional:  bool = False    # failure leaves the asset missing instead of failing the job
+    sha256:    str | None = None
+    seconds:   float = 0.0
+    ok:        bool = False
+    error:     str | None = None
+
+    def timing(self) -> dict:
+        return {"asset": self.key, "seconds": round(self.seconds, 3),
+                "ok": self.ok, "error": self.error}
+
+
+@dataclass
+class DownloadPlan:
+    """Every remote asset one ``PostData`` needs; models are de-duplicated by URL."""
+    assets:      dict[str, PlannedAsset] = field(default_factory=dict)
+    model_paths: list[str]               = field(default_factory=list)
+    seconds:     float                   = 0.0     # wall time of ``run``
+
+    def add(self, asset: PlannedAsset) -> PlannedAsset:
+        return self.assets.setdefault(asset.key, asset)
+
+    def path(self, key: str) -> Path | None:
+        a = self.assets.get(key)
+        return a.dest if a and a.ok else None
+
+    def content_hashes(self) -> dict[str, str | None]:
+        """URL → SHA-256 of what was actually downloaded."""
+        return {a.url: a.sha256 for a in self.assets.values()}
+
+    async def run(self) -> list[dict]:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_run_one(a) for a in self.assets.values()))
+        self.seconds = time.perf_counter() - t0
+        for a in self.assets.values():
+            metrics.DOWNLOAD_SECONDS.observe(a.seconds, asset=a.key.split(":", 1)[0])
+        failed = [a for a in self.assets.values() if not a.ok and not a.optional]
+        logger.info("Downloaded %d assets in %.2fs (slowest %s)",
+                    len(self.assets), time.perf_counter() - t0,
+                    max(self.assets.values(), key=lambda a: a.seconds).key
+                    if self.assets else "-")
+        if failed:
+            raise RuntimeError("Download failed: " +
+                               ", ".join(f"{a.key} ({a.error})" for a in failed))
+        return [a.timing() for a in self.assets.values()]
+
+
+def plan_downloads(data: PostData, scene_dir: Path, models_dir: Path,
+                   render_job_id: str, shared: bool = False) -> DownloadPlan:
+    """``shared``: part of a batch whose items share the room → cache scene and image too."""
+    plan = DownloadPlan()
+    plan.add(PlannedAsset("scene_gltf", data.scene_gltf_uri,
+                          scene_dir / f"scene{render_job_id}.gltf", cached=shared))
+    plan.add(PlannedAsset("space_image", data.space_image_uri,
+                          scene_dir / f"scene{render_job_id}{Path(data.space_image_uri).suffix}",
+                          cached=shared))
+
+    # a product placed several times is downloaded once; all copies share the file
+    for o in data.scene_objects:
+        a = plan.add(PlannedAsset(f"model:{o.model_blender_uri}", o.model_blender_uri,
+                                  models_dir / f"{o.name}.blend", cached=True))
+        plan.model_paths.append(str(a.dest))
+
+    preset = data.rendering_preset
+    if preset and preset.is_extension and preset.script_download_url:
+        plan.add(PlannedAsset("extension", preset.script_download_url,
+                              scene_dir / "ApplyDesignExtensionSceneScript.py",
+                              optional=True))
+    return plan
+
+
+# ─────────────────────────── global download budget ────────────────────────────
+_budget: asyncio.Semaphore | None = None
+
+def _slots() -> asyncio.Semaphore:
+    # shared by every job on the instance, not per request
+    global _budget
+    if _budget is None:
+        _budget = asyncio.Semaphore(settings.download_concurrency)
+    return _budget
+
+async def _run_one(a: PlannedAsset):
+    async with _slots():
+        t0 = time.perf_counter()
+        try:
+            cache = get_asset_cache() if a.cached else None
+            if cache:
+                a.sha256 = (await cache.fetch(a.url, a.dest)).sha256
+            else:
+                a.sha256 = (await get_fetcher().download(a.url, a.dest)).sha256
+            a.ok = True
+        except Exception as e:
+            a.error = repr(e)
+            log = logger.warning if a.optional else logger.error
+            log("Download of %s failed: %s", a.key, e)
+        finally:
+            a.seconds = time.perf_counter() - t0
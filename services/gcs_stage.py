@@ -0,0 +1,233 @@
+"""
+GCS transfers on the Batch VM: stages the input .blend to local disk and
+publishes the task's outputs.
+
+Shipped verbatim into the Batch script and run with Blender's Python, so
+the render container needs no gcsfuse mount of the bucket and no extra
+packages:
+
+    blender -b --factory-startup --python-exit-code 1 --python gcs_stage.py -- \\
+        gs://<bucket>/<object> <dest> [parts] [chunk_mb]
+    … -- put <file>... gs://<bucket>/<prefix>/      upload files under the prefix
+    … -- wait gs://<bucket>/<prefix>/ <suffix> <count> <timeout_s>
+    … -- pull gs://<bucket>/<prefix>/ <dest_dir>    download every object below it
+    … -- rm gs://<bucket>/<prefix>/                 delete every object below it
+
+The object's size comes from the JSON API; the body is fetched as
+``parts`` concurrent ranged GETs (at least ``chunk_mb`` each) written into
+a preallocated file, each range retried on its own.  Uploads are single
+multipart requests, retried whole.  ``wait`` exits 1 unless ``count``
+objects ending in ``suffix`` exist before the timeout.  Credentials come
+from the VM metadata server; with ``STORAGE_EMULATOR_HOST`` set (local
+checks against the benchmark's fake GCS) no token is used:
+
+    python services/gcs_stage.py gs://<bucket>/<object> <dest>
+
+Only stdlib.
+"""
+from __future__ import annotations
+import json, mimetypes, os, sys, time, urllib.request, uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode
+
+METADATA_TOKEN = ("http://metadata.google.internal/computeMetadata/v1/instance/"
+                  "service-accounts/default/token")
+RETRIES = 4
+
+
+def _token() -> str | None:
+    if os.environ.get("STORAGE_EMULATOR_HOST"):
+        return None
+    req = urllib.request.Request(METADATA_TOKEN, headers={"Metadata-Flavor": "Google"})
+    with urllib.request.urlopen(req, timeout=10) as r:
+        return json.load(r)["access_token"]
+
+
+def _split(uri: str) -> tuple[str, str]:
+    bucket, _, name = uri[len("gs://"):].partition("/")
+    return bucket, name
+
+
+def _base() -> str:
+    return (os.environ.get("STORAGE_EMULATOR_HOST") or "https://storage.googleapis.com").rstrip("/")
+
+
+def _object_url(uri: str) -> str:
+    bucket, name = _split(uri)
+    return f"{_base()}/storage/v1/b/{bucket}/o/{quote(name, safe='')}"
+
+
+def _get(url: str, token: str | None, headers: dict | None = None, timeout: float = 60,
+         data: bytes | None = None, method: str | None = None):
+    h = dict(headers or {})
+    if token:
+        h["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=data, headers=h, method=method)
+    return urllib.request.urlopen(req, timeout=timeout)
+
+
+def _retry(what: str, fn):
+    for attempt in range(RETRIES):
+        try:
+            return fn()
+        except OSError as e:
+            if attempt == RETRIES - 1:
+                raise
+            print(f"{what} failed ({e}), retrying", flush=True)
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def _fetch_range(url: str, token: str | None, fd: int, start: int, end: int):
+    for attempt in range(RETRIES):
+        try:
+            pos = start
+            with _get(url, token, {"Range": f"bytes={start}-{end}"}) as r:
+                if r.status != 206 and start:
+                    raise OSError(f"range {start}-{end} not honoured (HTTP {r.status})")
+                while pos <= end:
+                    block = r.read(min(1 << 20, end + 1 - pos))
+                    if not block:
+                        break
+                    os.pwrite(fd, block, pos)
+                    pos += len(block)
+            if pos != end + 1:
+                raise OSError(f"short read {pos - start}/{end + 1 - start} at {start}")
+            return
+        except OSError as e:
+            if attempt == RETRIES - 1:
+                raise
+            print(f"range {start}-{end} failed ({e}), retrying", flush=True)
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def stage(uri: str, dest: str, parts: int = 16, chunk_mb: int = 16) -> dict:
+    t0 = time.perf_counter()
+    token, url = _token(), _object_url(uri)
+    with _get(url, token) as r:
+        size = int(json.load(r)["size"])
+    media = url + "?alt=media"
+    chunk = max(chunk_mb << 20, -(-size // max(1, parts)))
+    ranges = [(s, min(size, s + chunk) - 1) for s in range(0, size, chunk)]
+
+    fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        if len(ranges) == 1:
+            _fetch_range(media, token, fd, *ranges[0])
+        elif ranges:
+            with ThreadPoolExecutor(len(ranges)) as pool:
+                for f in [pool.submit(_fetch_range, media, token, fd, s, e) for s, e in ranges]:
+                    f.result()
+    finally:
+        os.close(fd)
+    secs = time.perf_counter() - t0
+    print(f"staged {uri} → {dest}: {size / 1048576:.1f} MiB in {secs:.2f}s "
+          f"({len(ranges)} ranges)", flush=True)
+    return {"bytes": size, "seconds": round(secs, 3), "ranges": len(ranges)}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Publishing outputs
+# ──────────────────────────────────────────────────────────────────────────────
+def put(paths: list[str], prefix: str) -> int:
+    """Upload ``paths`` as ``<prefix><file name>``, in order; returns the bytes sent."""
+    token = _token()
+    bucket, folder = _split(prefix)
+    url = f"{_base()}/upload/storage/v1/b/{bucket}/o?uploadType=multipart"
+    sent = 0
+    for path in paths:
+        ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        meta = json.dumps({"name": folder + os.path.basename(path), "contentType": ctype})
+        with open(path, "rb") as f:
+            media = f.read()
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{meta}\r\n--{boundary}\r\nContent-Type: {ctype}\r\n\r\n").encode() \
+            + media + f"\r\n--{boundary}--\r\n".encode()
+        headers = {"Content-Type": f"multipart/related; boundary={boundary}"}
+        _retry(f"upload of {path}",
+               lambda: _get(url, token, headers, timeout=300, data=body, method="POST").close())
+        sent += len(media)
+        print(f"uploaded {path} → gs://{bucket}/{folder}{os.path.basename(path)}", flush=True)
+    return sent
+
+
+def _list(prefix: str, token: str | None) -> list[str]:
+    bucket, folder = _split(prefix)
+    names, page = [], None
+    while True:
+        q = {"prefix": folder, "fields": "items(name),nextPageToken"}
+        if page:
+            q["pageToken"] = page
+        with _retry("listing", lambda: _get(f"{_base()}/storage/v1/b/{bucket}/o?{urlencode(q)}",
+                                            token)) as r:
+            doc = json.load(r)
+        names += [o["name"] for o in doc.get("items", [])]
+        page = doc.get("nextPageToken")
+        if not page:
+            return names
+
+
+def wait(prefix: str, suffix: str, count: int, timeout_s: float, poll_s: float = 5) -> bool:
+    """Until ``count`` objects below ``prefix`` end in ``suffix``; ``False`` on timeout."""
+    token, deadline = _token(), time.monotonic() + timeout_s
+    while True:
+        found = sum(n.endswith(suffix) for n in _list(prefix, token))
+        if found >= count:
+            return True
+        if time.monotonic() >= deadline:
+            print(f"only {found} of {count} '{suffix}' objects below {prefix}", flush=True)
+            return False
+        time.sleep(poll_s)
+
+
+def pull(prefix: str, dest_dir: str) -> int:
+    """Download every object below ``prefix`` into ``dest_dir`` (flat); returns the count."""
+    token = _token()
+    bucket, folder = _split(prefix)
+    os.makedirs(dest_dir, exist_ok=True)
+    names = _list(prefix, token)
+    for name in names:
+        dest = os.path.join(dest_dir, name[len(folder):].replace("/", "_"))
+        url = _object_url(f"gs://{bucket}/{name}") + "?alt=media"
+
+        def fetch():
+            with _get(url, token, timeout=300) as r, open(dest, "wb") as f:
+                while block := r.read(1 << 20):
+                    f.write(block)
+        _retry(f"download of {name}", fetch)
+    return len(names)
+
+
+def rm(prefix: str) -> int:
+    """Delete every object below ``prefix``; returns the count."""
+    token = _token()
+    bucket, _ = _split(prefix)
+    names = _list(prefix, token)
+    for name in names:
+        _retry(f"delete of {name}", lambda: _get(_object_url(f"gs://{bucket}/{name}"), token,
+                                                 method="DELETE").close())
+    return len(names)
+
+
+def main(argv: list[str]):
+    args = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+    cmd, rest = args[0], args[1:]
+    if cmd == "put":
+        put(rest[:-1], rest[-1])
+    elif cmd == "wait":
+        if not wait(rest[0], rest[1], int(rest[2]), float(rest[3])):
+            sys.exit(1)
+    elif cmd == "pull":
+        pull(rest[0], rest[1])
+    elif cmd == "rm":
+        rm(rest[0])
+    else:
+        uri, dest = args[0], args[1]
+        parts = int(args[2]) if len(args) > 2 else 16
+        chunk_mb = int(args[3]) if len(args) > 3 else 16
+        stage(uri, dest, parts, chunk_mb)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import asyncio, hashlib, logging, os, time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from services import metrics
+from settings import settings
+
+if TYPE_CHECKING:       # aiohttp is imported with the first session (cold starts)
+    import aiohttp
+
+logger = logging.getLogger("http_fetch")
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class IntegrityError(RuntimeError):
+    """Downloaded body does not match Content-Length or the expected hash."""
+
+
+@dataclass
+class FetchResult:
+    url:           str
+    status:        int
+    size:          int = 0
+    sha256:        str | None = None
+    etag:          str | None = None
+    last_modified: str | None = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Shared streaming fetcher
+# ──────────────────────────────────────────────────────────────────────────────
+class Fetcher:
+    """
+    One keep-alive ``aiohttp`` session for the whole process.  Bodies are
+    streamed to ``<dest>.part`` in fixed-size chunks (memory stays flat),
+    transient failures are retried with exponential backoff and resumed with
+    a ``Range`` request, and the result is checked against Content-Length and
+    an optional expected SHA-256 before being moved into place.
+    """
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._bandwidth = _Bandwidth(settings.download_max_mbps)
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.http_max_connections,
+                    limit_per_host=settings.http_max_connections_per_host,
+                    keepalive_timeout=settings.http_keepalive_s,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.http_timeout_s,
+                    sock_connect=settings.http_connect_timeout_s,
+                    sock_read=settings.http_read_timeout_s,
+                ),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ── public ───────────────────────────────────────────────────────────────
+    async def download(self, url: str, dest: Path, *,
+                       headers: dict | None = None,
+                       expected_sha256: str | None = None) -> FetchResult:
+        """
+        Stream ``url`` to ``dest``.  Conditional ``headers`` are passed through;
+        a 304 answer leaves ``dest`` untouched and is returned as-is.
+        """
+        import aiohttp
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        part = dest.with_name(dest.name + ".part")
+        part.unlink(missing_ok=True)
+
+        attempts = settings.http_retries + 1
+        validator = None                     # ETag / Last-Modified for If-Range
+        for attempt in range(1, attempts + 1):
+            try:
+                res = await self._attempt(url, part, headers or {}, validator)
+                if res.not_modified:
+                    return res
+                if expected_sha256 and res.sha256 != expected_sha256:
+                    part.unlink(missing_ok=True)
+                    raise IntegrityError(
+                        f"{url}: sha256 {res.sha256} != expected {expected_sha256}")
+                os.replace(part, dest)
+                return res
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError, _Retry) as e:
+                if attempt == attempts:
+                    part.unlink(missing_ok=True)
+                    if isinstance(e, _Retry):
+                        raise e.cause
+                    raise
+                validator = getattr(e, "validator", None) or validator
+                delay = settings.http_backoff_s * 2 ** (attempt - 1)
+                logger.warning("GET %s failed (%s), retry %d/%d in %.1fs",
+                               url, e, attempt, attempts - 1, delay)
+                await asyncio.sleep(delay)
+
+    async def content_length(self, url: str, timeout_s: float) -> int | None:
+        """Size of ``url`` from a HEAD request, or ``None`` when it can't be told."""
+        import aiohttp
+        try:
+            async with self.session().head(url, allow_redirects=True,
+                                           timeout=aiohttp.ClientTimeout(total=timeout_s)) as r:
+                if r.status >= 400 or r.headers.get("Content-Encoding"):
+                    return None
+                return r.content_length
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug("HEAD %s failed: %r", url, e)
+            return None
+
+    # ── internals ────────────────────────────────────────────────────────────
+    async def _attempt(self, url: str, part: Path, headers: dict,
+                       validator: str | None) -> FetchResult:
+        import aiohttp
+        have = part.stat().st_size if part.exists() else 0
+        req = dict(headers)
+        if have and validator:
+            req["Range"]    = f"bytes={have}-"
+            req["If-Range"] = validator
+
+        async with self.session().get(url, headers=req) as r:
+            if r.status == 304:
+                return FetchResult(url, 304, etag=r.headers.get("ETag"),
+                                   last_modified=r.headers.get("Last-Modified"))
+            if r.status in RETRY_STATUS:
+                raise _Retry(aiohttp.ClientResponseError(
+                    r.request_info, r.history, status=r.status, message=r.reason or ""))
+            r.raise_for_status()
+
+            etag, last_mod = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            resumed = r.status == 206
+            h = hashlib.sha256()
+            if resumed:
+                _hash_file(part, h)
+            else:
+                have = 0
+            # decoded bodies cannot be compared with the on-the-wire length
+            expected = None if r.headers.get("Content-Encoding") else r.content_length
+            mode = "ab" if resumed else "wb"
+            size = have
+            try:
+                with open(part, mode) as f:
+                    async for chunk in r.content.iter_chunked(settings.http_chunk_kb * 1024):
+                        await self._bandwidth.take(len(chunk))
+                        h.update(chunk)
+                        size += len(chunk)
+                        f.write(chunk)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError) as e:
+                # keep the partial body; next attempt resumes from here
+                raise _Retry(e, validator=_strong(etag) or last_mod)
+
+            if expected is not None and size - have != expected:
+                raise _Retry(IntegrityError(
+                    f"{url}: got {size - have} bytes, Content-Length {expected}"),
+                    validator=_strong(etag) or last_mod)
+            if resumed:
+                logger.info("Resumed %s from byte %d", url, have)
+            metrics.DOWNLOAD_BYTES.inc(size - have, source="network")
+            return FetchResult(url, r.status, size, h.hexdigest(), etag, last_mod)
+
+
+class _Bandwidth:
+    """Token bucket shared by all downloads; ``mbps <= 0`` disables it."""
+
+    def __init__(self, mbps: float):
+        self.rate   = mbps * 1024 * 1024 / 8      # bytes / s
+        self.tokens = self.rate
+        self.stamp  = time.monotonic()
+
+    async def take(self, n: int):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp  = now
+        self.tokens -= n
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class _Retry(Exception):
+    def __init__(self, cause: Exception, validator: str | None = None):
+        super().__init__(str(cause))
+        self.cause, self.validator = cause, validator
+
+
+def _strong(etag: str | None) -> str | None:
+    # If-Range only accepts strong validators
+    return etag if etag and not etag.startswith("W/") else None
+
+
+def _hash_file(path: Path, h):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_fetcher: Fetcher | None = None
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = Fetcher()
+    return _fetcher
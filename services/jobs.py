@@ -0,0 +1,326 @@
+from __future__ import annotations
+import asyncio, json, logging, sqlite3, threading, time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable
+
+from services import metrics
+from settings import settings
+
+logger = logging.getLogger("jobs")
+
+# job states
+QUEUED, RUNNING, SUBMITTED, FAILED = "queued", "running", "submitted", "failed"
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (SUBMITTED, FAILED)
+
+
+@dataclass
+class JobRecord:
+    render_job_id: str
+    payload:       str                     # PostData JSON (by alias) – needed to resume, dropped when finished
+    status:        str = QUEUED
+    stage:         str | None = None
+    stages:        dict = field(default_factory=dict)   # stage → {status, started, finished}
+    result:        dict | None = None
+    error:         str | None = None
+    created_at:    float = field(default_factory=time.time)
+    updated_at:    float = field(default_factory=time.time)
+
+    def timings(self) -> dict:
+        """Seconds per stage, plus the time spent waiting in the queue."""
+        out = {name: st["seconds"] for name, st in self.stages.items()
+               if st.get("seconds") is not None}
+        started = [st["started"] for st in self.stages.values()]
+        if started:
+            out["queue_wait"] = round(min(started) - self.created_at, 3)
+        return out
+
+    def public(self) -> dict:
+        d = asdict(self)
+        d.pop("payload")
+        d["timings"] = self.timings()
+        return d
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Backends
+# ──────────────────────────────────────────────────────────────────────────────
+class JobBackend(ABC):
+    """Storage for job records.  Implementations must make ``create`` atomic."""
+
+    @abstractmethod
+    def create(self, rec: JobRecord) -> tuple[JobRecord, bool]:
+        """Store ``rec`` unless a non-failed job with that id exists → (record, created)."""
+
+    @abstractmethod
+    def get(self, render_job_id: str) -> JobRecord | None:
+        ...
+
+    @abstractmethod
+    def save(self, rec: JobRecord):
+        ...
+
+    @abstractmethod
+    def active(self) -> list[JobRecord]:
+        ...
+
+
+class MemoryBackend(JobBackend):
+    """
+    Process-local store.  Finished jobs are kept for ``retention_s`` (so
+    status polls and duplicate posts still see them), at most ``max_finished``
+    of them; the oldest are dropped first.
+    """
+
+    def __init__(self, retention_s: float = 86400, max_finished: int = 10000):
+        self._jobs: dict[str, JobRecord] = {}
+        self._finished: OrderedDict[str, float] = OrderedDict()   # id → finished at, oldest first
+        self.retention_s, self.max_finished = retention_s, max_finished
+
+    def create(self, rec):
+        self._evict()
+        cur = self._jobs.get(rec.render_job_id)
+        if cur and cur.status != FAILED:
+            return cur, False
+        self._finished.pop(rec.render_job_id, None)
+        self._jobs[rec.render_job_id] = rec
+        return rec, True
+
+    def get(self, render_job_id):
+        return self._jobs.get(render_job_id)
+
+    def save(self, rec):
+        rec.updated_at = time.time()
+        self._jobs[rec.render_job_id] = rec
+        if rec.status in FINISHED:
+            self._finished.pop(rec.render_job_id, None)
+            self._finished[rec.render_job_id] = rec.updated_at
+            self._evict()
+
+    def _evict(self):
+        cutoff = time.time() - self.retention_s
+        while self._finished:
+            render_job_id, finished = next(iter(self._finished.items()))
+            if finished >= cutoff and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[render_job_id]
+            self._jobs.pop(render_job_id, None)
+
+    def active(self):
+        return [r for r in self._jobs.values() if r.status in ACTIVE]
+
+
+class SqliteBackend(JobBackend):
+    """Single-file store; survives restarts so queued jobs are picked up again."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                         " id TEXT PRIMARY KEY, status TEXT NOT NULL, doc TEXT NOT NULL)")
+
+    def create(self, rec):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT doc FROM jobs WHERE id = ?",
+                                       (rec.render_job_id,)).fetchone()
+                if row:
+                    cur = JobRecord(**json.loads(row[0]))
+                    if cur.status != FAILED:
+                        self._db.execute("COMMIT")
+                        return cur, False
+                self._db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                                 (rec.render_job_id, rec.status, json.dumps(asdict(rec))))
+                self._db.execute("COMMIT")
+                return rec, True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def get(self, render_job_id):
+        with self._lock:
+            row = self._db.execute("SELECT doc FROM jobs WHERE id = ?",
+                                   (render_job_id,)).fetchone()
+        return JobRecord(**json.loads(row[0])) if row else None
+
+    def save(self, rec):
+        rec.updated_at = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                             (rec.render_job_id, rec.status, json.dumps(asdict(rec))))
+
+    def active(self):
+        with self._lock:
+            rows = self._db.execute("SELECT doc FROM jobs WHERE status IN (?, ?)",
+                                    ACTIVE).fetchall()
+        return [JobRecord(**json.loads(r[0])) for r in rows]
+
+
+def make_backend() -> JobBackend:
+    if settings.job_backend == "sqlite":
+        return SqliteBackend(settings.job_db_path)
+    return MemoryBackend(settings.job_retention_s, settings.job_max_finished)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Queue + in-process workers
+# ──────────────────────────────────────────────────────────────────────────────
+class Job:
+    """Handle passed to the runner so it can report stage progress."""
+
+    def __init__(self, queue: JobQueue, rec: JobRecord):
+        self._q, self.rec = queue, rec
+
+    def stage(self, name: str) -> "_Stage":
+        return _Stage(self, name)
+
+
+class _Stage:
+    def __init__(self, job: Job, name: str):
+        self.job, self.name = job, name
+
+    def __enter__(self):
+        rec = self.job.rec
+        rec.stage = self.name
+        rec.stages[self.name] = {"status": RUNNING, "started": time.time(), "finished": None,
+                                 "seconds": None}
+        self.job._q.backend.save(rec)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._t0
+        metrics.STAGE_SECONDS.observe(seconds, stage=self.name)
+        st = self.job.rec.stages[self.name]
+        st["status"]   = FAILED if exc_type else "done"
+        st["finished"] = time.time()
+        st["seconds"]  = round(seconds, 3)
+        self.job._q.backend.save(self.job.rec)
+        return False
+
+
+Runner = Callable[[JobRecord, Job], Awaitable[dict]]
+# jobs queued together: one result (or the exception that failed it) per record
+GroupRunner = Callable[[list[JobRecord], list[Job]], Awaitable[list[dict | Exception]]]
+
+
+class JobQueue:
+    def __init__(self, backend: JobBackend, runner: Runner, workers: int,
+                 group_runner: GroupRunner | None = None):
+        self.backend  = backend
+        self.runner   = runner
+        self.group_runner = group_runner
+        self.workers  = workers
+        self._pending: asyncio.Queue[str | list[str]] = asyncio.Queue()   # id, or ids of a group
+        self._queued  = 0
+        self._tasks:   list[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        for rec in self.backend.active():
+            # left behind by a previous process – run it again from the start
+            # (members of an interrupted group are resumed one by one)
+            rec.status, rec.stage = QUEUED, None
+            self.backend.save(rec)
+            self._put(rec.render_job_id)
+        self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+
+    def enqueue(self, render_job_id: str, payload: str) -> tuple[JobRecord, bool]:
+        rec, created = self.backend.create(JobRecord(render_job_id, payload))
+        if created:
+            self._put(render_job_id)
+            logger.info("Queued render_job_id=%s (depth %d)", render_job_id, self.depth)
+        return rec, created
+
+    def enqueue_batch(self, items: list[tuple[str, str]]) -> list[tuple[JobRecord, bool]]:
+        """Queue ``(render_job_id, payload)`` pairs to run together on one worker."""
+        out = [self.backend.create(JobRecord(rid, payload)) for rid, payload in items]
+        created = [rec.render_job_id for rec, c in out if c]
+        if created and self.group_runner:
+            self._put(created)
+            logger.info("Queued %d renders as a group (depth %d)", len(created), self.depth)
+        else:
+            for render_job_id in created:
+                self._put(render_job_id)
+        return out
+
+    def get(self, render_job_id: str) -> JobRecord | None:
+        return self.backend.get(render_job_id)
+
+    @property
+    def depth(self) -> int:
+        """Renders waiting for a worker (group members counted one by one)."""
+        return self._queued
+
+    def _put(self, entry: str | list[str]):
+        self._queued += len(entry) if isinstance(entry, list) else 1
+        self._pending.put_nowait(entry)
+
+    async def _work(self, n: int):
+        while True:
+            render_job_id = await self._pending.get()
+            if isinstance(render_job_id, list):
+                self._queued -= len(render_job_id)
+                await self._work_group(render_job_id)
+                continue
+            self._queued -= 1
+            rec = self.backend.get(render_job_id)
+            if rec is None or rec.status != QUEUED:
+                continue
+            rec.status = RUNNING
+            self.backend.save(rec)
+            metrics.JOBS_IN_FLIGHT.inc()
+            try:
+                rec.result = await self.runner(rec, Job(self, rec))
+                rec.status = SUBMITTED
+            except asyncio.CancelledError:
+                rec.status, rec.error = QUEUED, "worker stopped"
+                self.backend.save(rec)
+                raise
+            except Exception as e:
+                logger.error("Job render_job_id=%s failed: %s", render_job_id, e)
+                rec.status, rec.error = FAILED, str(e)
+            finally:
+                metrics.JOBS_IN_FLIGHT.dec()
+            metrics.JOBS_TOTAL.inc(status=rec.status)
+            rec.payload = ""           # only needed to resume; a re-post brings its own
+            self.backend.save(rec)
+
+    async def _work_group(self, ids: list[str]):
+        recs = [r for r in map(self.backend.get, ids) if r is not None and r.status == QUEUED]
+        if not recs:
+            return
+        for rec in recs:
+            rec.status = RUNNING
+            self.backend.save(rec)
+        metrics.JOBS_IN_FLIGHT.inc(len(recs))
+        try:
+            results = await self.group_runner(recs, [Job(self, r) for r in recs])
+        except asyncio.CancelledError:
+            for rec in recs:
+                rec.status, rec.error = QUEUED, "worker stopped"
+                self.backend.save(rec)
+            raise
+        except Exception as e:
+            results = [e] * len(recs)
+        finally:
+            metrics.JOBS_IN_FLIGHT.dec(len(recs))
+        for rec, result in zip(recs, results):
+            if isinstance(result, Exception):
+                # one failed member doesn't touch the others
+                logger.error("Job render_job_id=%s failed: %s", rec.render_job_id, result)
+                rec.status, rec.error = FAILED, str(result)
+            else:
+                rec.result, rec.status = result, SUBMITTED
+            metrics.JOBS_TOTAL.inc(status=rec.status)
+            rec.payload = ""
+            self.backend.save(rec)
@@ -0,0 +1,169 @@
+"""
+In-process metrics with Prometheus text exposition (``GET /metrics``).
+
+Deliberately tiny – no client library: counters, gauges (optionally read
+from a callback at scrape time) and fixed-bucket histograms keyed by label
+values.  Recording is a dict lookup plus an add under a lock, so spans can
+wrap every stage of the hot path.
+"""
+from __future__ import annotations
+import bisect, threading, time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+_registry: list["_Metric"] = []
+
+# seconds; spans from a cache hit (ms) to a long Blender build (tens of minutes)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def _fmt(self, key: tuple, extra: dict | None = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                          *self.samples()])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, v in sorted(self._values.items()):
+            yield f"{self.name}{self._fmt(key)} {v:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 fn: Callable[[], float] | None = None):
+        super().__init__(name, help, labels)
+        self._fn = fn           # read at scrape time – nothing to update on the hot path
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._fn is not None:
+            yield f"{self.name} {self._fn():g}"
+        else:
+            yield from super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}      # key → [bucket counts…, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Span: observes the wall time of the block (also when it raises)."""
+        span = Span()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - span.t0
+            self.observe(span.seconds, **labels)
+
+    def samples(self):
+        for key, s in sorted(self._series.items()):
+            acc = 0
+            for le, n in zip(self.buckets, s):
+                acc += n
+                yield f"{self.name}_bucket{self._fmt(key, {'le': f'{le:g}'})} {acc}"
+            yield f"{self.name}_bucket{self._fmt(key, {'le': '+Inf'})} {s[-1]}"
+            yield f"{self.name}_sum{self._fmt(key)} {s[-2]:g}"
+            yield f"{self.name}_count{self._fmt(key)} {s[-1]}"
+
+
+class Span:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.seconds = 0.0
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Service metrics
+# ──────────────────────────────────────────────────────────────────────────────
+STAGE_SECONDS = Histogram(
+    "render_stage_seconds", "Wall time of /render job stages", ("stage",))
+DOWNLOAD_SECONDS = Histogram(
+    "render_download_seconds", "Wall time per planned asset download", ("asset",))
+BLENDER_PASS_SECONDS = Histogram(
+    "render_blender_pass_seconds", "Wall time per Blender pass", ("name",))
+UPLOAD_SECONDS = Histogram(
+    "render_upload_seconds", "Wall time of .blend uploads", ("mode",))
+BATCH_SUBMIT_SECONDS = Histogram(
+    "render_batch_submit_seconds", "Batch create_job call latency", ("kind",))
+
+DOWNLOAD_BYTES = Counter(
+    "render_download_bytes_total", "Asset bytes by source (network or local cache)", ("source",))
+BLEND_BYTES = Counter(
+    "render_blend_bytes_total", "Built .blend bytes (saved; unoptimised when measured)", ("stage",))
+UPLOAD_BYTES = Counter(
+    "render_upload_bytes_total", "Bytes uploaded to GCS (skipped uploads count nothing)")
+JOBS_TOTAL = Counter(
+    "render_jobs_total", "Finished /render jobs by outcome", ("status",))
+JOBS_REJECTED = Counter(
+    "render_jobs_rejected_total", "/render requests turned away (429) by admission control", ("reason",))
+ADMISSION_IN_USE = Gauge(
+    "render_admission_in_use", "Estimated resources held by admitted jobs", ("resource",))
+
+JOBS_IN_FLIGHT = Gauge(
+    "render_jobs_in_flight", "Jobs currently being processed")
+JOBS_IN_FLIGHT.set(0)
@@ -1,10 +1,17 @@
 from __future__ import annotations
-import asyncio, aiohttp, tempfile, subprocess, json, logging, shutil, os
+import asyncio, json, logging, time, uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple
-import shlex, threading, sys
-
-from models.scene import PostData, SceneObjectData
+from typing import Tuple
+import shlex
+
+from models.scene import PostData
+from services import blender_config, blender_log, build_cache, metrics
+from services.blender_log import BlenderLog
+from services.blender_pool import get_blender_pool
+from services.download_plan import plan_downloads
+from services.tool_cache import get_tool_cache
+from services.workspace import get_workspaces, logs_dir
 from settings import settings
 
 logger = logging.getLogger("scene_builder")
@@ -16,97 +23,207 @@ TEMP_BFILE_DIR        = "tmp/bfile/"
 TEMP_BFILE_TEMPLATE   = "tmp/bfile/scene{0}.blend"
 TEMP_CFG_DIR          = "tmp/blenderconfig/"
 LARGE_BLENDER_FILE_MB = 650        # kept for parity (not used here)
+CHAIN_SCRIPT          = Path(__file__).with_name("blender_chain.py")
 
 # ─────────────────────────── public API ────────────────────────────
-async def build_scene(data: PostData, render_job_id: str) -> Path:
+@dataclass
+class BuildResult:
+    blend:        Path
+    tool_version: str          # content hashes of the Blender tools used
+    downloads:    list[dict] = field(default_factory=list)   # per-asset timing
+    passes:       list[dict] = field(default_factory=list)   # per-Blender-pass timing
+    fingerprint:  str | None = None      # build cache key
+    reused:       dict | None = None     # build cache entry; ``blend`` is None then
+    seconds:      float = 0.0
+    download_seconds: float = 0.0        # wall time of all asset downloads
+    artifact:     dict | None = None     # .blend optimisation: sizes, purged blocks, timings
+
+@dataclass
+class _Prepared:
+    """A build with its inputs on disk, ready for Blender."""
+    render_job_id: str
+    data:          PostData
+    blend_out:     Path
+    cfg_path:      Path
+    cfg_dir:       Path
+    default_scene: str
+    passes:        list
+    log_file:      Path
+    tool_version:  str
+    downloads:     list[dict]
+    fingerprint:   str | None
+    download_seconds: float
+    t_start:       float
+
+async def build_scene(data: PostData, render_job_id: str, use_cache: bool = True) -> BuildResult:
     """
     Faithful port of RunBlenderScripts.Run() up to—but not including—the
     cloud-render submission.  Returns the prepared *.blend path.
+    ``use_cache=False`` builds even when the build cache has the scene.
+    """
+    prep = await _prepare(data, render_job_id, use_cache=use_cache)
+    if isinstance(prep, BuildResult):
+        return prep
+    return await _build(prep)
+
+async def build_scenes(items: list[tuple[PostData, str]]) -> list[BuildResult | Exception]:
     """
+    Build several scenes together (``/render/batch``).  Assets shared by the
+    items – scene, space image, models, tools – are downloaded once; Blender
+    runs in ``render_batch_sessions`` shared processes (or on the warm pool),
+    each building its items one after another.  One item failing does not
+    stop the others; its slot in the result holds the exception.
+    """
+    prepared = await asyncio.gather(*(_prepare(d, rid, shared=True) for d, rid in items),
+                                    return_exceptions=True)
+    todo = [p for p in prepared if isinstance(p, _Prepared)]
+    built: dict[str, BuildResult | Exception] = {}
+    sessions = max(1, min(settings.render_batch_sessions, len(todo)))
+
+    if todo and settings.blender_single_session and not get_blender_pool():
+        for part in await asyncio.gather(*(_run_session(todo[i::sessions])
+                                           for i in range(sessions))):
+            built.update(part)
+    else:
+        # the warm pool already shares its sessions; legacy mode has none to share
+        limit = asyncio.Semaphore(sessions)
+        async def one(prep: _Prepared):
+            async with limit:
+                try:
+                    built[prep.render_job_id] = await _build(prep)
+                except Exception as e:
+                    built[prep.render_job_id] = e
+        await asyncio.gather(*(one(p) for p in todo))
+
+    return [built[p.render_job_id] if isinstance(p, _Prepared) else p for p in prepared]
+
+async def _prepare(data: PostData, render_job_id: str, shared: bool = False,
+                   use_cache: bool = True) -> _Prepared | BuildResult:
+    """Downloads, tools and config; a ``BuildResult`` when the build cache already has it."""
     logger.info(f"Starting build_scene for render_job_id=%s", render_job_id)
+    t_start = time.perf_counter()
     # 1) working root mirrors C# →  /tmp/<render_job_id>/
-    root = Path(tempfile.gettempdir()) / str(render_job_id)
+    root = get_workspaces().job_root(render_job_id)
     _mkdirs(root)
 
     blend_out = root / TEMP_BFILE_TEMPLATE.format(render_job_id)
 
-    # 2) core downloads ---------------------------------------------------------
-    scene_gltf  = await _dl_scene_gltf(root / TEMP_SCENE_DIR,
-                                       data.scene_gltf_uri, render_job_id)
-    scene_image = await _dl_scene_image(root / TEMP_SCENE_DIR,
-                                        data.space_image_uri, render_job_id)
-    model_paths = await _dl_all_models(root / TEMP_MODELS_DIR, data.scene_objects)
+    # 2) core downloads – everything at once, identical model URIs fetched once ----
+    #    (across a whole batch when ``shared``: scene and space image go through the cache too)
+    plan = plan_downloads(data, root / TEMP_SCENE_DIR, root / TEMP_MODELS_DIR,
+                          render_job_id, shared=shared)
+    downloads, tools = await asyncio.gather(
+        plan.run(), _dl_blender_tools(root / TEMP_SCENE_DIR, data.is360))
+    scene_gltf, scene_image = plan.path("scene_gltf"), plan.path("space_image")
+    model_paths = plan.model_paths
     logger.info(f"Downloaded scene assets for render_job_id=%s", render_job_id)
 
     (scene_script, default_scene, mirror_script, user_mirror_script,
-     tools_error) = await _dl_blender_tools(root / TEMP_SCENE_DIR, data.is360)
-
-    cfg_path = _write_blender_cfg(root / TEMP_CFG_DIR, blend_out,
-                                  scene_gltf, scene_image,
-                                  data, model_paths)
+     tools_error, tool_version) = tools
+    logger.info("render_job_id=%s uses Blender tools %s", render_job_id, tool_version)
+
+    # identical inputs already built & uploaded → skip Blender entirely
+    fp = None
+    if settings.build_cache_enabled:
+        fp = build_cache.fingerprint(data, plan.content_hashes(), tool_version)
+        hit = await build_cache.lookup(fp) if fp and use_cache else None
+        if hit:
+            logger.info("Build cache hit for render_job_id=%s → %s", render_job_id, hit["object"])
+            return BuildResult(None, tool_version, downloads, fingerprint=fp, reused=hit,
+                               seconds=time.perf_counter() - t_start,
+                               download_seconds=plan.seconds)
+
+    # streamed straight from the model; large scenes stay off the event loop
+    cfg_path = await asyncio.to_thread(blender_config.write_config, root / TEMP_CFG_DIR,
+                                       blend_out, scene_gltf, scene_image, data, model_paths)
 
     # Prepare persistent log file outside /tmp so it survives container errors
-    logs_root = Path("/logs")
-    try:
-        logs_root.mkdir(parents=True, exist_ok=True)
-    except PermissionError:
-        # Fallback to project-relative logs directory if /logs is not writable
-        logs_root = Path.cwd() / "logs"
-        logs_root.mkdir(parents=True, exist_ok=True)
-
-    log_file = logs_root / f"{render_job_id}.log"
+    log_file = logs_dir() / f"{render_job_id}.log"
     if log_file.exists():
         log_file.unlink()      # start fresh for this build
+    log_file.write_text(f"# blender tools: {tool_version}\n")
 
     # 3) Blender command pipeline ----------------------------------------------
     blender = Path(settings.blender_exe_location)
     if not blender.exists():
         raise FileNotFoundError(f"Blender not found at {blender}")
 
-    _run(
-        f"/local/scripts/defualt.blend -b -P /local/scripts/ApplyDesignSceneScript.py -- -i {cfg_path}"
-        if tools_error else
-        f"{default_scene} -b -P {scene_script} -- -i {cfg_path}",
-        log_file,
-    )
-
-    # Ensure the main .blend file was produced; bail early with clear message
-    if not blend_out.exists():
-        msg = (
-            f"Expected blend file not found after initial Blender run: {blend_out}\n"
-            f"is360={data.is360}, cfg={cfg_path}"
-        )
-        logger.error(msg)
-        raise RuntimeError(msg)
+    if tools_error:
+        default_scene = "/local/scripts/defualt.blend"
+        scene_script  = "/local/scripts/ApplyDesignSceneScript.py"
 
+    passes = [("scene", scene_script, ["-i", str(cfg_path)])]
     if data.mirror_in_scene:
-        _run(f"{blend_out} -b -P {mirror_script}", log_file)
-
+        passes.append(("mirror", mirror_script, []))
     if data.rendering_preset and data.rendering_preset.is_extension:
-        ext = await _dl_extension(root / TEMP_SCENE_DIR,
-                                  data.rendering_preset.script_download_url)
+        ext = plan.path("extension")
         if ext:
-            _run(f"{blend_out} -b -P {ext}", log_file)
-
+            passes.append(("extension", str(ext), []))
     has_object_mirrors = any(o.is_mirror for o in data.scene_objects)
     if has_object_mirrors and not data.mirror_in_scene and not data.is360:
-        _run(f"{blend_out} -b -P {user_mirror_script}", log_file)
+        passes.append(("user_mirror", user_mirror_script, []))
+
+    return _Prepared(render_job_id, data, blend_out, cfg_path, root / TEMP_CFG_DIR,
+                     default_scene, passes, log_file, tool_version, downloads, fp,
+                     plan.seconds, t_start)
+
+async def _build(prep: _Prepared) -> BuildResult:
+    # buffered sink; progress stays queryable via blender_log.progress(render_job_id)
+    with blender_log.open_log(prep.render_job_id, prep.log_file) as log:
+        if settings.blender_single_session:
+            timings = await _run_chain(prep.default_scene, prep.passes, prep.blend_out,
+                                       prep.cfg_dir, log)
+        else:
+            timings = await _run_passes(prep.default_scene, prep.passes, prep.blend_out, log)
+    return _finish(prep, timings)
 
-    logger.info(f"Finished build_scene for render_job_id=%s, blend_out=%s", render_job_id, blend_out)
-    return blend_out
+def _finish(prep: _Prepared, timings: list[dict]) -> BuildResult:
+    # Ensure the main .blend file was produced; bail early with clear message
+    if not prep.blend_out.exists():
+        msg = (
+            f"Expected blend file not found after Blender run: {prep.blend_out}\n"
+            f"is360={prep.data.is360}, cfg={prep.cfg_path}"
+        )
+        logger.error(msg)
+        raise RuntimeError(msg)
+
+    logger.info(f"Finished build_scene for render_job_id=%s, blend_out=%s",
+                prep.render_job_id, prep.blend_out)
+    for t in timings:
+        metrics.BLENDER_PASS_SECONDS.observe(t["seconds"], name=t["pass"])
+    return BuildResult(prep.blend_out, prep.tool_version, prep.downloads,
+                       [{k: v for k, v in t.items() if k != "stats"} for t in timings],
+                       fingerprint=prep.fingerprint,
+                       seconds=time.perf_counter() - prep.t_start,
+                       download_seconds=prep.download_seconds,
+                       artifact=_artifact(prep, timings))
+
+def _artifact(prep: _Prepared, timings: list[dict]) -> dict:
+    """Size of the handoff .blend, and what the optimisation did (chain builds only)."""
+    opt = next((t for t in timings if t["pass"] == "optimize"), None)
+    stats = dict(opt.get("stats") or {}) if opt else {}
+    after = prep.blend_out.stat().st_size
+    before = stats.pop("before_bytes", None)
+    metrics.BLEND_BYTES.inc(after, stage="saved")
+    if before:
+        metrics.BLEND_BYTES.inc(before, stage="unoptimised")
+        logger.info("render_job_id=%s .blend %.1f → %.1f MiB after optimisation",
+                    prep.render_job_id, before / 1048576, after / 1048576)
+    return {"before_bytes": before, "after_bytes": after,
+            "optimized": opt["ok"] if opt else None,
+            "optimize_s": opt["seconds"] if opt else None,
+            "save_s": next((t["seconds"] for t in timings if t["pass"] == "save"), None),
+            **stats}
 
 def cleanup_temp_files(render_job_id: str):
     """
     Clean up all temporary files and directories for a given render job.
-    This should be called after the job is submitted to batch.
+    This should be called after the job is submitted to batch.  The directory
+    is renamed aside and deleted by the workspace janitor in the background.
     """
     try:
-        root = Path(tempfile.gettempdir()) / str(render_job_id)
-        if root.exists():
-            shutil.rmtree(root)
-            logger.info(f"Cleaned up temporary directory for render_job_id=%s: %s", render_job_id, root)
-        else:
-            logger.info(f"No temporary directory found for render_job_id=%s: %s", render_job_id, root)
+        get_workspaces().release(render_job_id)
+        logger.info(f"Released temporary directory for render_job_id=%s", render_job_id)
     except Exception as e:
         logger.error(f"Failed to cleanup temp files for render_job_id=%s: %s", render_job_id, e)
         raise
@@ -116,148 +233,168 @@ def _mkdirs(root: Path):
     for sub in (TEMP_SCENE_DIR, TEMP_MODELS_DIR, TEMP_BFILE_DIR, TEMP_CFG_DIR):
         (root / sub).mkdir(parents=True, exist_ok=True)
 
-async def _fetch(url: str, dest: Path, text: bool = False):
-    async with aiohttp.ClientSession() as s, s.get(url) as r:
-        r.raise_for_status()
-        data = await (r.text() if text else r.read())
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        mode = "w" if text else "wb"
-        with open(dest, mode) as f:
-            f.write(data)
-
-async def _dl_scene_gltf(dir_: Path, uri: str, render_job_id: str) -> Path:
-    p = dir_ / f"scene{render_job_id}.gltf"
-    await _fetch(uri, p)
-    return p
-
-async def _dl_scene_image(dir_: Path, uri: str, render_job_id: str) -> Path:
-    p = dir_ / f"scene{render_job_id}{Path(uri).suffix}"
-    await _fetch(uri, p)
-    return p
-
-async def _dl_all_models(dir_: Path, objs: List[SceneObjectData]) -> List[str]:
-    tasks, dests = [], []
-    for o in objs:
-        d = dir_ / f"{o.name}.blend"
-        tasks.append(_fetch(o.model_blender_uri, d))
-        dests.append(str(d))
-    await asyncio.gather(*tasks)
-    return dests
-
-async def _dl_blender_tools(dir_: Path, is360: bool) -> Tuple[str,str,str,str,bool]:
+async def _dl_blender_tools(dir_: Path, is360: bool) -> Tuple[str,str,str,str,bool,str]:
+    """Tools come from the pre-warmed process cache – no network unless it is still cold."""
     try:
-        scene_script_url = (settings.url_blender_360_scene_script
-                            if is360 else settings.url_blender_scene_script)
-        scene_file_url   = (settings.url_blender_360_scene_file
-                            if is360 else settings.url_blender_scene_file)
-
-        scene_script  = dir_ / "ApplyDesignSceneScript.py"
-        mirror_script = dir_ / "ApplyDesignSceneMirrorScript.py"
-        user_mirror   = dir_ / "ApplyDesignUserMirrorScript.py"
-        default_scene = dir_ / "Default.blend"
-
-        await asyncio.gather(
-            _fetch(scene_script_url,          scene_script,  text=True),
-            _fetch(settings.url_blender_mirror_script,       mirror_script, text=True),
-            _fetch(settings.url_blender_user_mirror_script,  user_mirror,   text=True),
-            _fetch(scene_file_url,            default_scene)
-        )
-        return (*map(str, (scene_script,
-                   default_scene,
-                   mirror_script,
-                   user_mirror)), False)
+        tools = get_tool_cache()
+        if not tools.ready(is360):
+            await tools.refresh()
+        paths, version = tools.materialise(dir_, is360)
+        return (*map(str, (paths["scene_script"],
+                   paths["scene_file"],
+                   paths["mirror_script"],
+                   paths["user_mirror_script"])), False, version)
     except Exception as e:
-        logger.error("Blender-tool download failed → fallback: %s", e, exc_info=True)
-        return ("", "", "", "", True)
-
-async def _dl_extension(dir_: Path, url: str | None) -> str | None:
-    if not url:
-        return None
-    dest = dir_ / "ApplyDesignExtensionSceneScript.py"
+        logger.error("Blender-tool cache unavailable → fallback: %s", e, exc_info=True)
+        return ("", "", "", "", True, "local-fallback")
+
+async def _run_passes(default_scene: str, passes: list, blend_out: Path,
+                      log: BlenderLog) -> list[dict]:
+    """Legacy mode: one Blender launch per pass, each reloading ``blend_out``."""
+    timings = []
+    for i, (name, script, argv) in enumerate(passes):
+        src = default_scene if i == 0 else blend_out
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            await _run(f"{src} -b -P {script}" + (" -- " + shlex.join(argv) if argv else ""),
+                       log)
+            ok = True
+        finally:
+            timings.append({"pass": name, "seconds": round(time.perf_counter() - t0, 3),
+                            "ok": ok})
+        if i == 0 and not blend_out.exists():
+            break       # caller reports the missing file
+    return timings
+
+async def _run_chain(default_scene: str, passes: list, blend_out: Path,
+                     cfg_dir: Path, log: BlenderLog) -> list[dict]:
+    """All passes inside one Blender process; the .blend is saved once at the end."""
+    manifest, report = _write_manifest(passes, blend_out, cfg_dir)
+    pool = get_blender_pool()
+    timeout_s = settings.blender_timeout_s * len(passes)     # the limit is per pass
+    try:
+        if pool:
+            if not await pool.run(default_scene, manifest, log, timeout_s):
+                raise RuntimeError(log.error_report("Blender worker build failed"))
+        else:
+            await _run(f"{default_scene} -b -P {CHAIN_SCRIPT} -- {manifest}", log,
+                       timeout_s=timeout_s)
+    finally:
+        timings = _read_report(report, log)
+    return timings
+
+async def _run_session(chunk: list[_Prepared]) -> dict[str, BuildResult | Exception]:
+    """Several builds in one Blender process (``blender_chain.py --batch``), one after another."""
+    items = []
+    for prep in chunk:
+        manifest, _ = _write_manifest(prep.passes, prep.blend_out, prep.cfg_dir)
+        items.append({"id": prep.render_job_id, "open": prep.default_scene,
+                      "manifest": str(manifest)})
+    batch_file = chunk[0].cfg_dir / f"batch-{uuid.uuid4().hex[:8]}.json"
+    batch_file.write_text(json.dumps({"items": items}))
+
+    logs = {p.render_job_id: blender_log.open_log(p.render_job_id, p.log_file) for p in chunk}
+    session_error = None
     try:
-        await _fetch(url, dest, text=True)
-        return str(dest)
-    except Exception:
-        return None
-
-def _write_blender_cfg(cfg_dir: Path, blend_out: Path,
-                       scene_path: Path, image_path: Path,
-                       data: PostData, model_paths: List[str]) -> Path:
-    cfg_dir.mkdir(parents=True, exist_ok=True)
-    models = []
-    for i, o in enumerate(data.scene_objects):
-        models.append({
-            "ModelBlenderPath":      model_paths[i],
-            "InnerPath":             o.inner_path,
-            "ObjectName":            o.object_name,
-            "PositionX":             o.position_x,  "PositionY": o.position_y,  "PositionZ": o.position_z,
-            "RotationX":             o.rotation_x,  "RotationY": o.rotation_y,  "RotationZ": o.rotation_z,
-            "QuaternionX":           o.quaternion_x,"QuaternionY":o.quaternion_y,
-            "QuaternionZ":           o.quaternion_z,"QuaternionW":o.quaternion_w,
-            "Scale":                 o.scale,       "ScaleX": o.scale_x, "ScaleY": o.scale_y, "ScaleZ": o.scale_z,
-            "IsCurtain": o.is_curtain, "IsFloor": o.is_floor, "ShowLights": o.show_lights,
-            "LightsColor": o.lights_color, "LightsPower": o.lights_power,
-            "LightRadius": o.light_radius,
-            "LightSourcesPositions": [
-                {"X": v.x, "Y": v.y, "Z": v.z}
-                for v in (o.light_sources_positions or [])
-            ],
-            "IsMirror": o.is_mirror
-        })
-
-    cfg = {
-        "SceneGLTFPath": str(scene_path),
-        "Samples": data.samples,
-        "OutputFormat": data.output_format,
-        "ResX": data.res_x, "ResY": data.res_y,
-        "SceneImagePath": str(image_path),
-        "SceneModels": models,
-        "SceneScale": data.scene_scale,
-        "SceneObjectName": data.scene_object_name,
-        "CameraObjectName": data.camera_object_name,
-        "FrameObjectName": "ApplyDesignGroup",
-        "SceneMatName": "Scene_Material",
-        "SceneSaveLocation": str(blend_out),
-        "AreaLightObjectName": "Area Light Source",
-        "PointLightObjectName": "Point Light Source",
-        "AmbientLightObjectName": "Ambient Light",
-        "AreaLightMatName": "Plane_Emission_Mat",
-        "MirrorInScene": data.mirror_in_scene
-    }
-    cfg_path = cfg_dir / "config.json"
-    cfg_path.write_text(json.dumps(cfg))
-    return cfg_path
-
-def _run(cmd: str, log_file: Path | None = None):
-    """Run Blender command, stream stdout/stderr to logger in real-time."""
+        await _run(f"-b -P {CHAIN_SCRIPT} -- --batch {batch_file}", _SessionLog(logs),
+                   timeout_s=settings.blender_timeout_s * sum(len(p.passes) for p in chunk))
+    except Exception as e:
+        session_error = e          # items that have no complete report fail below
+
+    out: dict[str, BuildResult | Exception] = {}
+    for prep in chunk:
+        log = logs[prep.render_job_id]
+        try:
+            timings = _read_report(prep.cfg_dir / "chain-report.json", log)
+            if not timings or not all(t["ok"] or t.get("optional") for t in timings):
+                raise RuntimeError(log.error_report(
+                    f"Blender build failed{f' ({session_error})' if session_error else ''}"))
+            out[prep.render_job_id] = _finish(prep, timings)
+        except Exception as e:
+            out[prep.render_job_id] = e
+        finally:
+            log.close()
+    return out
+
+def _write_manifest(passes: list, blend_out: Path, cfg_dir: Path) -> tuple[Path, Path]:
+    manifest = cfg_dir / "chain.json"
+    report   = cfg_dir / "chain-report.json"
+    report.unlink(missing_ok=True)
+    manifest.write_text(json.dumps({
+        "passes":  [{"name": n, "script": s, "argv": a} for n, s, a in passes],
+        "save_as": str(blend_out),
+        "report":  str(report),
+        "optimize": {"purge":    settings.artifact_purge_orphans,
+                     "compress": settings.artifact_compress,
+                     "measure":  settings.artifact_measure_baseline},
+    }))
+    return manifest, report
+
+def _read_report(report: Path, log: BlenderLog) -> list[dict]:
+    timings = json.loads(report.read_text()) if report.exists() else []
+    for t in timings:
+        line = f"[pass] {t['pass']}: {'ok' if t['ok'] else 'FAILED'} in {t['seconds']}s"
+        logger.info(line)
+        log.write(line)
+        if t.get("error"):
+            log.write(t["error"])
+    return [{k: t[k] for k in ("pass", "seconds", "ok", "optional", "stats") if k in t}
+            for t in timings]
+
+class _SessionLog:
+    """Splits a shared session's output into the logs of the builds it runs."""
+
+    def __init__(self, logs: dict[str, BlenderLog]):
+        self.logs = logs
+        self.current = next(iter(logs.values()))
+
+    def write(self, text: str):
+        if text.startswith("@@item "):
+            self.current = self.logs.get(text.split()[1], self.current)
+        self.current.write(text)
+
+    def error_report(self, msg: str) -> str:
+        return self.current.error_report(msg)
+
+async def _run(cmd: str, log: BlenderLog | None = None, timeout_s: float | None = None):
+    """Run Blender command, streaming stdout/stderr into the job's log sink."""
     args = [settings.blender_exe_location] + shlex.split(cmd)
     logger.info("▶  %s", " ".join(args))
+    log = log or BlenderLog("-", None)
 
-    proc = subprocess.Popen(
-        args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
+    # asyncio subprocess: the event loop (and /health) keeps running meanwhile
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
     )
 
-    output_accum = []
-
-    # Stream output line-by-line so we see progress as it happens
-    for line in proc.stdout:
-        logger.info(line.rstrip())
-        output_accum.append(line)
-        if log_file:
-            with log_file.open("a") as lf:
-                lf.write(line)
-
-    proc.wait()
+    async def _pump():
+        # Stream output line-by-line so progress events appear as they happen;
+        # read in blocks, so no line is too long for the stream reader's buffer
+        pending = b""
+        while block := await proc.stdout.read(1 << 16):
+            *lines, pending = (pending + block).split(b"\n")
+            for raw in lines:
+                log.write(raw.decode("utf-8", errors="replace") + "\n")
+        if pending:
+            log.write(pending.decode("utf-8", errors="replace"))
+        await proc.wait()
+
+    timeout_s = timeout_s if timeout_s is not None else settings.blender_timeout_s
+    try:
+        await asyncio.wait_for(_pump(), timeout=timeout_s or None)
+    except BaseException as e:
+        # timeout, cancellation or a failing log sink: never leave Blender behind
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise RuntimeError(log.error_report(f"Blender timed out after {timeout_s}s"))
+        raise
 
     if proc.returncode != 0:
         err_msg = f"Blender exited {proc.returncode}"
         logger.error(err_msg)
-        if log_file and not log_file.exists():
-            # write captured output in case nothing streamed yet
-            log_file.write_text("".join(output_accum))
-        raise RuntimeError(err_msg + "\nLog file: " + (str(log_file) if log_file else "<none>") )
+        raise RuntimeError(log.error_report(err_msg))
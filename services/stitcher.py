@@ -0,0 +1,248 @@
+"""
+Tile set-up and stitching for split (border-render) Batch jobs.
+
+Shipped verbatim into the Batch script and run with Blender's Python:
+
+    blender -b scene.blend --python stitcher.py -f 1 -- tile <index> <cols> <rows>
+    blender -b --python stitcher.py -- stitch <tiles_dir> <out_dir>
+
+``tile`` sets a cropped border for one grid cell and writes ``tile_<i>.json``
+(its placement in the full frame plus the file name and format the unsplit
+render would have written).  ``stitch`` assembles every ``tile_<i>.png`` in
+``tiles_dir`` into that file in ``out_dir``.  Inside Blender the numpy path
+is used and any Blender output format can be written (tiles of float or
+16-bit outputs are rendered as 16-bit PNG); without Blender a pure-stdlib
+path does the same for 8-bit PNG, which is what local checks on synthetic
+tiles use:
+
+    python services/stitcher.py stitch <tiles_dir> <out_dir>
+
+Only stdlib (+ bpy/numpy when present).
+"""
+from __future__ import annotations
+import glob, json, os, struct, sys, zlib
+
+PNG_SIG = b"\x89PNG\r\n\x1a\n"
+FLOAT_FORMATS = {"OPEN_EXR", "OPEN_EXR_MULTILAYER", "HDR"}
+
+
+def high_bit(meta: dict) -> bool:
+    """Whether the unsplit render's output holds more than 8 bits per channel."""
+    return meta.get("format") in FLOAT_FORMATS or meta.get("depth", "8") not in ("", "8")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Grid geometry (shared by the submitter and the tile set-up)
+# ──────────────────────────────────────────────────────────────────────────────
+def grid(n: int) -> tuple[int, int]:
+    """Near-square cols × rows with at least ``n`` cells."""
+    cols = 1
+    while cols * cols < n:
+        cols += 1
+    rows = -(-n // cols)
+    return cols, rows
+
+
+def border(index: int, cols: int, rows: int) -> tuple[float, float, float, float]:
+    """Blender border (min_x, max_x, min_y, max_y) of a cell; row 0 is the top."""
+    c, r = index % cols, index // cols
+    return c / cols, (c + 1) / cols, 1 - (r + 1) / rows, 1 - r / rows
+
+
+def placement(index: int, cols: int, rows: int, width: int, height: int) -> dict:
+    """Pixel rectangle of a cell, top-left origin – same truncation as Blender."""
+    min_x, max_x, min_y, max_y = border(index, cols, rows)
+    x0, x1 = int(min_x * width), int(max_x * width)
+    y0, y1 = int(min_y * height), int(max_y * height)      # bottom-up
+    return {"index": index, "x": x0, "y": height - y1, "w": x1 - x0, "h": y1 - y0,
+            "width": width, "height": height}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Minimal PNG codec (8-bit RGB/RGBA, non-interlaced)
+# ──────────────────────────────────────────────────────────────────────────────
+def read_png(path: str) -> tuple[int, int, int, list[bytes]]:
+    """Returns (width, height, channels, rows) with unfiltered scanlines."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != PNG_SIG:
+        raise ValueError(f"{path}: not a PNG")
+    pos, idat, w = 8, [], None
+    while pos < len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if ctype == b"IHDR":
+            w, h, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            if depth != 8 or color not in (2, 6) or interlace:
+                raise ValueError(f"{path}: only 8-bit RGB/RGBA non-interlaced PNG supported")
+            ch = 3 if color == 2 else 4
+        elif ctype == b"IDAT":
+            idat.append(body)
+        elif ctype == b"IEND":
+            break
+    raw = zlib.decompress(b"".join(idat))
+    stride = w * ch
+    rows, prev = [], bytearray(stride)
+    for y in range(h):
+        ftype = raw[y * (stride + 1)]
+        line = bytearray(raw[y * (stride + 1) + 1:(y + 1) * (stride + 1)])
+        _unfilter(ftype, line, prev, ch)
+        rows.append(bytes(line))
+        prev = line
+    return w, h, ch, rows
+
+
+def _unfilter(ftype: int, line: bytearray, prev: bytearray, bpp: int):
+    n = len(line)
+    if ftype == 0:
+        return
+    if ftype == 1:
+        for i in range(bpp, n):
+            line[i] = (line[i] + line[i - bpp]) & 0xFF
+    elif ftype == 2:
+        for i in range(n):
+            line[i] = (line[i] + prev[i]) & 0xFF
+    elif ftype == 3:
+        for i in range(n):
+            left = line[i - bpp] if i >= bpp else 0
+            line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif ftype == 4:
+        for i in range(n):
+            a = line[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            pred = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+            line[i] = (line[i] + pred) & 0xFF
+    else:
+        raise ValueError(f"bad PNG filter type {ftype}")
+
+
+def write_png(path: str, width: int, height: int, channels: int, rows: list[bytes]):
+    def chunk(ctype: bytes, body: bytes) -> bytes:
+        return (struct.pack(">I", len(body)) + ctype + body +
+                struct.pack(">I", zlib.crc32(ctype + body) & 0xFFFFFFFF))
+    color = 2 if channels == 3 else 6
+    raw = b"".join(b"\x00" + r for r in rows)
+    with open(path, "wb") as f:
+        f.write(PNG_SIG)
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Stitching
+# ──────────────────────────────────────────────────────────────────────────────
+def _tiles(tiles_dir: str) -> list[tuple[dict, str]]:
+    out = []
+    for meta_path in sorted(glob.glob(os.path.join(tiles_dir, "tile_*.json"))):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        out.append((meta, os.path.join(tiles_dir, f"tile_{meta['index']}.png")))
+    if not out:
+        raise FileNotFoundError(f"no tiles in {tiles_dir}")
+    return out
+
+
+def stitch_png(tiles_dir: str, out_path: str):
+    """Pure-stdlib stitch of 8-bit PNG tiles into one PNG."""
+    tiles = _tiles(tiles_dir)
+    width, height = tiles[0][0]["width"], tiles[0][0]["height"]
+    channels = None
+    canvas: list[bytearray] | None = None
+    for meta, path in tiles:
+        w, h, ch, rows = read_png(path)
+        if canvas is None:
+            channels = ch
+            canvas = [bytearray(width * ch) for _ in range(height)]
+        if ch != channels:
+            raise ValueError(f"{path}: {ch} channels, expected {channels}")
+        x0, y0 = meta["x"] * ch, meta["y"]
+        for dy in range(min(h, height - y0)):
+            row = rows[dy][:(width * ch - x0)]
+            canvas[y0 + dy][x0:x0 + len(row)] = row
+    write_png(out_path, width, height, channels, [bytes(r) for r in canvas])
+
+
+def stitch_blender(tiles_dir: str, out_path: str, file_format: str):
+    """Inside Blender: numpy compositing, saved in any Blender output format."""
+    import bpy, numpy as np
+
+    tiles = _tiles(tiles_dir)
+    width, height = tiles[0][0]["width"], tiles[0][0]["height"]
+    canvas = np.zeros((height, width, 4), dtype=np.float32)
+    for meta, path in tiles:
+        img = bpy.data.images.load(path)
+        w, h = img.size
+        px = np.empty(w * h * 4, dtype=np.float32)
+        img.pixels.foreach_get(px)
+        px = px.reshape(h, w, 4)[::-1]                   # Blender rows are bottom-up
+        y0, x0 = meta["y"], meta["x"]
+        hh, ww = min(h, height - y0), min(w, width - x0)
+        canvas[y0:y0 + hh, x0:x0 + ww] = px[:hh, :ww]
+        bpy.data.images.remove(img)
+
+    # a byte image would quantise float / 16-bit outputs to 8 bits
+    out = bpy.data.images.new("stitched", width, height, alpha=True,
+                              float_buffer=high_bit(tiles[0][0]))
+    out.pixels.foreach_set(canvas[::-1].ravel())
+    out.filepath_raw = out_path
+    out.file_format = file_format
+    out.save()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Tile set-up (inside Blender, before ``-f``)
+# ──────────────────────────────────────────────────────────────────────────────
+def setup_tile(index: int, cols: int, rows: int):
+    import bpy
+
+    scene = bpy.context.scene
+    r = scene.render
+    output = os.path.basename(r.frame_path(frame=1))
+    file_format, depth = r.image_settings.file_format, r.image_settings.color_depth
+    r.use_border, r.use_crop_to_border = True, True
+    r.border_min_x, r.border_max_x, r.border_min_y, r.border_max_y = border(index, cols, rows)
+    r.image_settings.file_format = "PNG"
+    r.image_settings.color_mode  = "RGBA"
+    r.image_settings.color_depth = "16" if high_bit({"format": file_format, "depth": depth}) else "8"
+    r.filepath = f"//tile_{index}_"
+    width  = int(r.resolution_x * r.resolution_percentage / 100)
+    height = int(r.resolution_y * r.resolution_percentage / 100)
+    meta = placement(index, cols, rows, width, height)
+    meta.update(output=output, format=file_format, depth=depth)
+    with open(f"tile_{index}.json", "w") as f:
+        json.dump(meta, f)
+
+
+def stitch(tiles_dir: str, out_dir: str) -> str:
+    """Assemble the tiles into the frame the unsplit render would have written."""
+    meta = _tiles(tiles_dir)[0][0]
+    fmt = meta.get("format", "PNG")
+    out_path = os.path.join(out_dir, meta.get("output", "stitched.png"))
+    try:
+        import bpy  # noqa: F401
+    except ImportError:
+        if fmt != "PNG" or high_bit(meta):
+            raise SystemExit(f"{fmt} output needs Blender – only 8-bit PNG without it")
+        stitch_png(tiles_dir, out_path)
+    else:
+        stitch_blender(tiles_dir, out_path, fmt)
+    return out_path
+
+
+def main(argv: list[str]):
+    args = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+    if args[0] == "tile":
+        setup_tile(int(args[1]), int(args[2]), int(args[3]))
+    elif args[0] == "stitch":
+        print(f"🧩  Stitched {stitch(args[1], args[2])}")
+    else:
+        raise SystemExit(f"unknown command {args[0]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import asyncio, logging, os, time
+from dataclasses import dataclass
+from pathlib import Path
+
+from services.asset_cache import link_file
+from services.http_fetch import get_fetcher
+from settings import settings
+
+logger = logging.getLogger("tool_cache")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Tool asset catalogue  (cache name → settings URL attribute, job file name)
+# ──────────────────────────────────────────────────────────────────────────────
+TOOLS = {
+    "scene_script":       ("url_blender_scene_script",       "ApplyDesignSceneScript.py"),
+    "scene_script_360":   ("url_blender_360_scene_script",   "ApplyDesignSceneScript.py"),
+    "scene_file":         ("url_blender_scene_file",         "Default.blend"),
+    "scene_file_360":     ("url_blender_360_scene_file",     "Default.blend"),
+    "mirror_script":      ("url_blender_mirror_script",      "ApplyDesignSceneMirrorScript.py"),
+    "user_mirror_script": ("url_blender_user_mirror_script", "ApplyDesignUserMirrorScript.py"),
+}
+
+def tool_set(is360: bool) -> dict[str, str]:
+    """Role → cache name of the tools one build needs."""
+    return {
+        "scene_script":       "scene_script_360" if is360 else "scene_script",
+        "scene_file":         "scene_file_360"   if is360 else "scene_file",
+        "mirror_script":      "mirror_script",
+        "user_mirror_script": "user_mirror_script",
+    }
+
+
+@dataclass
+class ToolAsset:
+    name:          str
+    url:           str
+    path:          Path
+    sha256:        str
+    etag:          str | None = None
+    last_modified: str | None = None
+    fetched_at:    float = 0.0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Process-wide, background-refreshed cache
+# ──────────────────────────────────────────────────────────────────────────────
+class ToolCache:
+    """
+    Holds the Blender tool scripts and base scenes on local disk.  Filled at
+    startup, refreshed every ``ttl_s`` with conditional GETs; a failed refresh
+    keeps serving the copy we already have.  Each content version lives in its
+    own file, so a refresh never changes files under a running job.
+    """
+
+    def __init__(self, root: Path, ttl_s: int, timeout_s: int):
+        self.root      = Path(root)
+        self.ttl_s     = ttl_s
+        self.timeout_s = timeout_s
+        self._assets:     dict[str, ToolAsset] = {}
+        self._superseded: list[Path] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._filled = asyncio.Event()       # first refresh round finished
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            finally:
+                self._filled.set()
+            await asyncio.sleep(self.ttl_s)
+
+    async def wait_filled(self):
+        """Returns once the first refresh round is over (whatever its outcome)."""
+        await self._filled.wait()
+
+    # ── refresh ──────────────────────────────────────────────────────────────
+    async def refresh(self):
+        async with self._lock:
+            # files replaced one cycle ago can no longer be in use by a job start
+            for p in self._superseded:
+                p.unlink(missing_ok=True)
+            self._superseded = []
+
+            results = await asyncio.gather(
+                *(asyncio.wait_for(self._refresh_one(n), self.timeout_s) for n in TOOLS),
+                return_exceptions=True)
+            for name, res in zip(TOOLS, results):
+                if isinstance(res, Exception):
+                    state = "serving stale copy" if name in self._assets else "no copy available"
+                    logger.warning("Tool refresh failed for %s (%s): %r", name, state, res)
+
+    async def _refresh_one(self, name: str):
+        url = getattr(settings, TOOLS[name][0])
+        cur = self._assets.get(name)
+        if cur and cur.url != url:
+            cur = None
+        headers = {}
+        if cur and cur.etag:
+            headers["If-None-Match"] = cur.etag
+        if cur and cur.last_modified:
+            headers["If-Modified-Since"] = cur.last_modified
+
+        tmp = self.root / f".incoming-{name}"
+        res = await get_fetcher().download(url, tmp, headers=headers)
+        if cur and (res.not_modified or cur.sha256 == res.sha256):
+            tmp.unlink(missing_ok=True)
+            cur.fetched_at = time.time()
+            if not res.not_modified:
+                cur.etag, cur.last_modified = res.etag, res.last_modified
+            return
+
+        path = self.root / f"{name}-{res.sha256[:12]}{Path(TOOLS[name][1]).suffix}"
+        os.replace(tmp, path)
+        if cur:
+            self._superseded.append(cur.path)
+        self._assets[name] = ToolAsset(name, url, path, res.sha256,
+                                       res.etag, res.last_modified, time.time())
+        logger.info("Tool %s updated → %s", name, res.sha256[:12])
+
+    # ── job access (no network) ──────────────────────────────────────────────
+    def ready(self, is360: bool | None = None) -> bool:
+        names = TOOLS if is360 is None else tool_set(is360).values()
+        return all(n in self._assets for n in names)
+
+    def materialise(self, dir_: Path, is360: bool) -> tuple[dict[str, Path], str]:
+        """
+        Link the tools for one build into ``dir_``.  Returns role → path and
+        the tool version string (short content hashes) recorded for the job.
+        """
+        paths, parts = {}, []
+        for role, name in tool_set(is360).items():
+            a = self._assets.get(name)
+            if a is None:
+                raise RuntimeError(f"Blender tool {name} not cached")
+            dest = dir_ / TOOLS[name][1]
+            link_file(a.path, dest)
+            paths[role] = dest
+            parts.append(f"{role}={a.sha256[:12]}")
+        return paths, ";".join(parts)
+
+    def versions(self) -> dict:
+        return {n: {"sha256": a.sha256, "etag": a.etag, "fetched_at": a.fetched_at}
+                for n, a in self._assets.items()}
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_tools: ToolCache | None = None
+
+def get_tool_cache() -> ToolCache:
+    global _tools
+    if _tools is None:
+        _tools = ToolCache(Path(settings.tool_cache_dir),
+                           settings.tool_cache_ttl_s,
+                           settings.tool_cache_timeout_s)
+    return _tools
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import asyncio, hashlib, logging, threading, time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from services import metrics
+from settings import settings
+
+if TYPE_CHECKING:       # google-cloud-storage is imported on first use (cold starts)
+    from google.cloud import storage
+
+logger = logging.getLogger("uploader")
+
+HASH_KEY = "sha256"        # custom metadata holding our content hash
+
+
+@dataclass
+class UploadResult:
+    uri:     str
+    bytes:   int
+    seconds: float
+    mode:    str           # "skipped" | "copied" | "single" | "parallel"
+
+    @property
+    def mbps(self) -> float:
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    def public(self) -> dict:
+        return {"uri": self.uri, "bytes": self.bytes, "seconds": round(self.seconds, 3),
+                "mode": self.mode, "mb_per_s": round(self.mbps, 1)}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Reusable GCS uploader
+# ──────────────────────────────────────────────────────────────────────────────
+class Uploader:
+    """
+    Uploads build artefacts to ``settings.bucket``.  Files above
+    ``upload_parallel_threshold_mb`` go up as an XML multipart upload with
+    ``upload_workers`` chunks in flight (each chunk retried on its own);
+    smaller ones use a single resumable upload.  If the destination object
+    already carries the same SHA-256 in its metadata nothing is sent; if
+    another object has that content (found through the empty index object
+    ``upload_dedup_prefix + <sha256>``, whose metadata names it) it is copied
+    server-side instead of uploaded.
+
+    Point ``STORAGE_EMULATOR_HOST`` at a fake-GCS server to measure it locally
+    (set the threshold high if the fake lacks multipart support).
+    """
+
+    def __init__(self):
+        self._client: storage.Client | None = None
+        self._lock = threading.Lock()
+
+    def client(self) -> storage.Client:
+        with self._lock:
+            if self._client is None:
+                from google.cloud import storage
+                self._client = storage.Client(project=settings.project_id)
+            return self._client
+
+    async def upload(self, path: Path, object_name: str,
+                     metadata: dict | None = None) -> UploadResult:
+        # hashing and the google-cloud-storage calls block → worker thread
+        return await asyncio.to_thread(self._upload_blocking, Path(path),
+                                       object_name, metadata or {})
+
+    def _upload_blocking(self, path: Path, object_name: str,
+                         metadata: dict) -> UploadResult:
+        t0 = time.perf_counter()
+        size = path.stat().st_size
+        digest = _sha256(path)
+        bucket = self.client().bucket(settings.bucket)
+        uri = f"gs://{settings.bucket}/{object_name}"
+
+        existing = bucket.get_blob(object_name)
+        if existing is not None and (existing.metadata or {}).get(HASH_KEY) == digest:
+            res = UploadResult(uri, size, time.perf_counter() - t0, "skipped")
+            metrics.UPLOAD_SECONDS.observe(res.seconds, mode="skipped")
+            logger.info("Upload of %s skipped – identical content already at %s", path, uri)
+            return res
+
+        index = settings.upload_dedup_prefix and settings.upload_dedup_prefix + digest
+        source = _indexed_source(bucket, index, digest) if index else None
+        if source is not None:
+            bucket.copy_blob(source, bucket, object_name)
+            res = UploadResult(uri, size, time.perf_counter() - t0, "copied")
+            metrics.UPLOAD_SECONDS.observe(res.seconds, mode="copied")
+            logger.info("Upload of %s replaced by a copy of identical %s", path, source.name)
+            return res
+
+        blob = bucket.blob(object_name)
+        blob.metadata = {**metadata, HASH_KEY: digest}
+        if size >= settings.upload_parallel_threshold_mb * 1024 * 1024:
+            from google.cloud.storage import transfer_manager
+            transfer_manager.upload_chunks_concurrently(
+                str(path), blob,
+                chunk_size=settings.upload_chunk_mb * 1024 * 1024,
+                max_workers=settings.upload_workers,
+                worker_type=transfer_manager.THREAD,
+            )
+            mode = "parallel"
+        else:
+            blob.chunk_size = settings.upload_chunk_mb * 1024 * 1024   # resumable session
+            blob.upload_from_filename(str(path))
+            mode = "single"
+
+        if index:
+            entry = bucket.blob(index)
+            entry.metadata = {"object": object_name}
+            entry.upload_from_string(b"")
+        res = UploadResult(uri, size, time.perf_counter() - t0, mode)
+        metrics.UPLOAD_SECONDS.observe(res.seconds, mode=mode)
+        metrics.UPLOAD_BYTES.inc(size)
+        logger.info("Uploaded %s → %s (%s, %.1f MB in %.1fs, %.1f MB/s)",
+                    path, uri, mode, size / 1024 / 1024, res.seconds, res.mbps)
+        return res
+
+
+def _indexed_source(bucket, index: str, digest: str):
+    """Object the content index entry points at, if it still holds that content."""
+    entry = bucket.get_blob(index)
+    name = ((entry.metadata or {}) if entry else {}).get("object")
+    source = bucket.get_blob(name) if name else None
+    if source is None or (source.metadata or {}).get(HASH_KEY) != digest:
+        return None                    # deleted or overwritten since
+    return source
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_uploader: Uploader | None = None
+
+def get_uploader() -> Uploader:
+    global _uploader
+    if _uploader is None:
+        _uploader = Uploader()
+    return _uploader
@@ -0,0 +1,158 @@
+from __future__ import annotations
+import asyncio, importlib, logging, time
+from dataclasses import dataclass
+
+from settings import settings
+
+logger = logging.getLogger("warmup")
+
+# imported lazily by the services; warm-up pays for them before the first job
+HEAVY_MODULES = ("google.cloud.storage", "google.cloud.batch_v1", "aiohttp")
+
+
+@dataclass
+class StepResult:
+    seconds: float
+    ok:      bool = True
+    error:   str | None = None
+
+
+class Warmup:
+    """
+    Optional startup warm-up, tracked for ``/ready``: imports the heavy client
+    libraries off the event loop, waits for the first tool-cache fill, builds
+    the GCS / Batch / HTTP clients and launches Blender once in the background
+    (or waits for the worker pool) so its binary and libraries are in the page
+    cache.  Failed steps are recorded and do not block readiness; a step still
+    running after ``warmup_timeout_s`` is abandoned.
+    """
+
+    def __init__(self):
+        self.started  = time.perf_counter()
+        self.import_s = 0.0                   # app module import
+        self.steps: dict[str, StepResult] = {}
+        self.first_request: dict | None = None
+        self.first_build_s: float | None = None
+        self._done = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._ready_after: float | None = None
+
+    def imported(self, t0: float):
+        """Called by the app once its imports are done; ``t0`` is when they began."""
+        self.started, self.import_s = t0, time.perf_counter() - t0
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def start(self, pool_started: asyncio.Task | None = None):
+        if not settings.warmup_enabled:
+            self._finish()
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(pool_started))
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def wait(self):
+        await self._done.wait()
+
+    # ───────── measurements ─────────
+    def note_first_request(self, path: str, seconds: float):
+        if self.first_request is None:
+            self.first_request = {"path": path, "seconds": round(seconds, 4),
+                                  "after_start_s": round(time.perf_counter() - self.started, 3),
+                                  "warm": self.ready}
+            logger.info("First request %s took %.1f ms (%.1fs after start, warm=%s)", path,
+                        seconds * 1e3, self.first_request["after_start_s"], self.ready)
+
+    def note_build(self, seconds: float):
+        if self.first_build_s is None:
+            self.first_build_s = round(seconds, 3)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "enabled": settings.warmup_enabled,
+            "import_s": round(self.import_s, 3),
+            "ready_after_s": self._ready_after,
+            "steps": {k: {"seconds": round(v.seconds, 3), "ok": v.ok, "error": v.error}
+                      for k, v in self.steps.items()},
+            "first_request": self.first_request,
+            "first_build_s": self.first_build_s,
+        }
+
+    # ───────── steps ─────────
+    async def _run(self, pool_started: asyncio.Task | None):
+        steps = [self._step(f"import:{m}", asyncio.to_thread(importlib.import_module, m))
+                 for m in HEAVY_MODULES]
+        steps += [
+            self._step("tools", _tools()),
+            self._step("clients", _clients()),
+            self._step("blender", asyncio.shield(pool_started) if pool_started else _blender_launch()),
+        ]
+        try:
+            await asyncio.wait_for(asyncio.gather(*steps), settings.warmup_timeout_s)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up still running after %ss – marking ready anyway",
+                           settings.warmup_timeout_s)
+        finally:
+            self._finish()
+
+    async def _step(self, name: str, aw):
+        t0 = time.perf_counter()
+        try:
+            await aw
+            self.steps[name] = StepResult(time.perf_counter() - t0)
+        except Exception as e:
+            self.steps[name] = StepResult(time.perf_counter() - t0, False, repr(e))
+            logger.warning("Warm-up step %s failed: %r", name, e)
+
+    def _finish(self):
+        if not self._done.is_set():
+            self._ready_after = round(time.perf_counter() - self.started, 3)
+            self._done.set()
+            logger.info("Ready %.2fs after start (%s)", self._ready_after,
+                        ", ".join(f"{k} {v.seconds:.2f}s" for k, v in self.steps.items()) or "no warm-up")
+
+
+async def _tools():
+    from services.tool_cache import get_tool_cache
+    await get_tool_cache().wait_filled()
+
+
+async def _clients():
+    from services.batch_submit import get_batch_client
+    from services.http_fetch import get_fetcher
+    from services.uploader import get_uploader
+    await asyncio.to_thread(importlib.import_module, "aiohttp")    # not on the event loop
+    get_fetcher().session()
+    await asyncio.gather(asyncio.to_thread(get_uploader().client),
+                         asyncio.to_thread(get_batch_client))
+
+
+async def _blender_launch():
+    """Start and quit Blender once; the next launch finds it in the page cache."""
+    proc = await asyncio.create_subprocess_exec(
+        settings.blender_exe_location, "-b", "--factory-startup",
+        "--python-expr", "import bpy",
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        rc = await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    if rc != 0:
+        raise RuntimeError(f"blender exited with {rc}")
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_warmup: Warmup | None = None
+
+def get_warmup() -> Warmup:
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
@@ -0,0 +1,256 @@
+from __future__ import annotations
+import asyncio, logging, os, shutil, tempfile, time
+from dataclasses import dataclass
+from pathlib import Path
+
+from services import metrics
+from settings import settings
+
+logger = logging.getLogger("workspace")
+
+TRASH_PREFIX = ".trash-"
+JOB_MARKER   = "tmp"               # every job root holds <root>/tmp/{models,scene,…}
+
+
+class ScratchFull(RuntimeError):
+    """The job cannot get scratch space within the budget (or never could)."""
+
+
+@dataclass
+class ScratchStats:
+    reserved_bytes:   int = 0      # held by running jobs
+    deleting_bytes:   int = 0      # released, janitor not done yet
+    waits:            int = 0      # jobs that had to wait for space
+    refused:          int = 0
+    orphans_removed:  int = 0
+    logs_removed:     int = 0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Per-job scratch directories under tempfile.gettempdir()
+# ──────────────────────────────────────────────────────────────────────────────
+class Workspaces:
+    """
+    Owns ``/tmp/<render_job_id>`` job directories.  On Cloud Run ``/tmp`` is
+    memory-backed, so every byte there is instance RAM: jobs reserve an
+    estimate against ``scratch_budget_mb`` before building (waiting for room,
+    or refused outright when they could never fit), the reservation is
+    replaced by the measured size once the build is done, and released
+    directories are renamed aside and deleted by a background janitor.
+    Hard-linked asset-cache files are shared, not counted against the job.
+    """
+
+    def __init__(self, root: Path, budget_bytes: int, default_bytes: int, wait_s: float):
+        self.root          = Path(root)
+        self.budget        = budget_bytes            # 0 = unlimited
+        self.default_bytes = default_bytes
+        self.wait_s        = wait_s
+        self.stats         = ScratchStats()
+        self._reserved: dict[str, int] = {}
+        self._per_object   = 0.0                     # EWMA of measured bytes per scene object
+        self._changed: asyncio.Event | None = None
+        self._trash: asyncio.Queue | None = None
+        self._janitor: asyncio.Task | None = None
+
+    def job_root(self, render_job_id: str) -> Path:
+        return self.root / str(render_job_id)
+
+    # ───────── lifecycle ─────────
+    def start(self):
+        """Sweep what crashed runs left behind, then start the janitor."""
+        self._changed = asyncio.Event()
+        self._trash = asyncio.Queue()
+        for path in self._orphans():
+            self._trash.put_nowait((self._move_aside(path), 0))
+            self.stats.orphans_removed += 1
+        if self.stats.orphans_removed:
+            logger.info("Removing %d orphaned job directories", self.stats.orphans_removed)
+        self._janitor = asyncio.create_task(self._run_janitor())
+
+    async def stop(self):
+        if self._janitor:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+            self._janitor = None
+
+    # ───────── accounting ─────────
+    @property
+    def in_use(self) -> int:
+        return self.stats.reserved_bytes + self.stats.deleting_bytes
+
+    def estimate(self, objects: int) -> int:
+        return max(self.default_bytes, int(self._per_object * objects))
+
+    async def acquire(self, render_job_id: str, objects: int = 0,
+                      estimate: int | None = None) -> int:
+        """Reserve scratch space for a job; waits up to ``wait_s`` for room."""
+        need = estimate if estimate is not None else self.estimate(objects)
+        self._set(render_job_id, 0)
+        if not self.budget:
+            self._set(render_job_id, need)
+            return need
+        if need > self.budget:
+            self.stats.refused += 1
+            raise ScratchFull(f"render_job_id={render_job_id} needs ~{need >> 20} MiB scratch, "
+                              f"budget is {self.budget >> 20} MiB")
+        if self.in_use + need > self.budget:
+            self.stats.waits += 1
+            logger.info("render_job_id=%s waits for scratch space (%d MiB in use, needs %d MiB)",
+                        render_job_id, self.in_use >> 20, need >> 20)
+            try:
+                await asyncio.wait_for(self._room_for(need), self.wait_s or None)
+            except asyncio.TimeoutError:
+                self.stats.refused += 1
+                raise ScratchFull(f"render_job_id={render_job_id}: no {need >> 20} MiB of scratch "
+                                  f"free within {self.wait_s:.0f}s") from None
+        self._set(render_job_id, need)
+        return need
+
+    async def measure(self, render_job_id: str, objects: int = 0) -> int:
+        """Replace the job's reservation with what its directory actually holds."""
+        used = await asyncio.to_thread(private_bytes, self.job_root(render_job_id))
+        if render_job_id in self._reserved:
+            self._set(render_job_id, used)
+        if objects:
+            sample = used / objects
+            self._per_object = sample if not self._per_object else 0.8 * self._per_object + 0.2 * sample
+        return used
+
+    def release(self, render_job_id: str):
+        """Hand the job directory to the janitor; returns immediately."""
+        held = self._reserved.pop(render_job_id, 0)
+        self.stats.reserved_bytes -= held
+        root = self.job_root(render_job_id)
+        if not root.exists():
+            self._notify()
+            return
+        if self._trash is None:                       # janitor not running (scripts, tests)
+            shutil.rmtree(root, ignore_errors=True)
+            self._notify()
+            return
+        self.stats.deleting_bytes += held
+        self._trash.put_nowait((self._move_aside(root), held))
+        self._notify()
+
+    def snapshot(self) -> dict:
+        return {"budget_bytes": self.budget, "in_use_bytes": self.in_use,
+                "jobs": dict(self._reserved), "per_object_bytes": int(self._per_object),
+                **vars(self.stats)}
+
+    # ───────── internals ─────────
+    def _set(self, render_job_id: str, n: int):
+        self.stats.reserved_bytes += n - self._reserved.get(render_job_id, 0)
+        self._reserved[render_job_id] = n
+        self._notify()
+
+    def _notify(self):
+        if self._changed:
+            self._changed.set()
+
+    async def _room_for(self, need: int):
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        while self.in_use + need > self.budget:
+            self._changed.clear()
+            await self._changed.wait()
+
+    def _move_aside(self, path: Path) -> Path:
+        # a rename is instant; a re-posted job can recreate its root right away
+        dest = self.root / f"{TRASH_PREFIX}{path.name}-{time.time_ns()}"
+        try:
+            path.rename(dest)
+            return dest
+        except OSError:
+            return path
+
+    def _orphans(self) -> list[Path]:
+        skip = {Path(settings.asset_cache_dir).resolve(), Path(settings.tool_cache_dir).resolve()}
+        found = []
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return found
+        for e in entries:
+            if not e.is_dir(follow_symlinks=False) or Path(e.path).resolve() in skip:
+                continue
+            if e.name.startswith(TRASH_PREFIX) or \
+                    (e.name.isdigit() and os.path.isdir(os.path.join(e.path, JOB_MARKER))):
+                found.append(Path(e.path))
+        return found
+
+    async def _run_janitor(self):
+        removed = await asyncio.to_thread(sweep_logs, logs_dir(), settings.log_retention_h)
+        self.stats.logs_removed += removed
+        while True:
+            try:
+                path, held = await asyncio.wait_for(self._trash.get(), 3600)
+            except asyncio.TimeoutError:
+                self.stats.logs_removed += await asyncio.to_thread(
+                    sweep_logs, logs_dir(), settings.log_retention_h)
+                continue
+            try:
+                await asyncio.to_thread(shutil.rmtree, path, True)
+            finally:
+                self.stats.deleting_bytes -= held
+                self._notify()
+
+
+# ─────────────────────────── helpers ────────────────────────────
+def private_bytes(root: Path) -> int:
+    """Bytes under ``root`` owned by it alone (hard links into the asset cache are shared)."""
+    total = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if st.st_nlink <= 1:
+                total += st.st_size
+    return total
+
+
+def logs_dir() -> Path:
+    """Persistent job logs: ``/logs``, or ``./logs`` when that is not writable."""
+    root = Path("/logs")
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+    except PermissionError:
+        root = Path.cwd() / "logs"
+        root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def sweep_logs(root: Path, retention_h: float) -> int:
+    """Delete ``<render_job_id>.log`` files not written to for ``retention_h`` hours."""
+    if retention_h <= 0:
+        return 0
+    cutoff, removed = time.time() - retention_h * 3600, 0
+    for p in root.glob("*.log"):
+        try:
+            if p.stem.isdigit() and p.stat().st_mtime < cutoff:
+                p.unlink()
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info("Removed %d job logs older than %sh from %s", removed, retention_h, root)
+    return removed
+
+
+# ─────────────────────────── process-wide instance ────────────────────────────
+_workspaces: Workspaces | None = None
+
+def get_workspaces() -> Workspaces:
+    global _workspaces
+    if _workspaces is None:
+        _workspaces = Workspaces(Path(tempfile.gettempdir()),
+                                 settings.scratch_budget_mb * 1024 * 1024,
+                                 settings.scratch_job_estimate_mb * 1024 * 1024,
+                                 settings.scratch_wait_s)
+        metrics.Gauge("scratch_bytes_in_use", "Scratch (/tmp) bytes reserved or awaiting deletion",
+                      fn=lambda: _workspaces.in_use)
+    return _workspaces
@@ -5,6 +5,7 @@ class Settings(BaseSettings):
     project_id: str = "applydesign"
     region: str = "us-central1"
     bucket: str = "applydesign-results"
+    pipeline_manager_url: str = "https://adpipelinemanager-staging.azurewebsites.net"
 
     # ───────── Blender asset URLs (from App-Config / env) ─────────
     url_blender_scene_script:           str = "https://applydesign.blob.core.windows.net/blender-function-tools/Blender35/SceneScript.py"
@@ -14,7 +15,126 @@ class Settings(BaseSettings):
     url_blender_mirror_script:          str = "https://applydesign.blob.core.windows.net/blender-function-tools/Blender35/SceneMirrorScript.py"
     url_blender_user_mirror_script:     str = "https://applydesign.blob.core.windows.net/blender-function-tools/Blender35/UserMirrorScript.py"
     blender_exe_location:               str = "/usr/local/bin/blender"
-    pipeline_manager_url:               str = "https://adpipelinemanager-staging.azurewebsites.net"
+    blender_timeout_s:                  int = 1800    # per Blender pass (a chained run gets this × its passes), 0 = no limit
+    blender_single_session:             bool = True   # chain all passes in one Blender process
+    blender_log_tail_kb:                int = 8       # output kept in memory for error reports
+    blender_log_flush_s:                float = 1.0   # job log file flush interval
+
+    # ───────── Warm Blender worker pool (needs blender_single_session) ─────────
+    blender_pool_size:                  int = 0       # 0 = cold-start Blender per build
+    blender_pool_max_jobs:              int = 20      # recycle a worker after this many builds
+    blender_pool_max_rss_growth_mb:     int = 2048    # … or once it grew this much since start
+    blender_pool_start_timeout_s:       int = 120
+
+    # ───────── Startup warm-up (GET /ready turns 200 once done) ─────────
+    warmup_enabled:                     bool = True   # imports, clients, tools, one Blender launch
+    warmup_timeout_s:                   int = 180     # ready regardless after this long
+
+    # ───────── Handoff .blend (saved once at the end of the chain) ─────────
+    artifact_purge_orphans:             bool = True   # drop unused data-blocks brought in by appends
+    artifact_compress:                  bool = False  # Blender's zstd file compression
+    artifact_measure_baseline:          bool = False  # also save an unoptimised copy to report its size
+
+    # ───────── GCS upload of built .blend files ─────────
+    upload_parallel_threshold_mb:       int = 64      # multipart upload at or above this size
+    upload_chunk_mb:                    int = 32
+    upload_workers:                     int = 8
+    upload_dedup_prefix:                str = "blobs/"  # content-hash index for server-side copies, "" = off
+
+    # ───────── Build result cache (reuse identical, already-uploaded scenes) ─────────
+    build_cache_enabled:                bool = True
+    build_cache_prefix:                 str = "build-cache/"
+
+    # ───────── Batch submission ─────────
+    batch_coalesce_window_s:            float = 0.0   # max wait for other renders to share a job, 0 = off (adds latency)
+    batch_max_tasks:                    int = 8       # renders per Batch job
+    batch_parallelism:                  int = 0       # VMs per job (0 = one per task; fewer runs tasks in waves)
+    batch_stage_parts:                  int = 16      # concurrent ranged reads staging the .blend on the VM
+    batch_stage_chunk_mb:               int = 16      # … of at least this size each
+
+    # ───────── Progressive preview (quick first image before the full render) ─────────
+    preview_enabled:                    bool = False  # default for requests without "Preview"
+    preview_samples:                    int = 16
+    preview_scale:                      float = 0.5   # of the render resolution, per axis
+    preview_denoise:                    bool = True
+    preview_signal:                     str = "rendering_process_preview"
+
+    # ───────── Batch compute profiles (picked per render from a cost estimate) ─────────
+    compute_cost_s_per_mpx_sample:      float = 0.15  # reference (n2-standard-96) seconds per Mpx × sample
+    compute_cost_s_per_blend_mb:        float = 0.05
+    compute_memory_base_mib:            int = 8192    # per task: Blender, BVH, headroom
+    compute_memory_mib_per_blend_mb:    float = 16.0  # loaded scene per MB of (uncompressed) .blend
+    compute_memory_mib_per_mpx:         float = 256.0 # film, passes and denoise buffers
+    compute_memory_compressed_factor:   float = 3.0   # .blend expansion when ARTIFACT_COMPRESS is on
+    compute_profiles:                   list[dict] = [
+        {"name": "small",  "machine_type": "n2-standard-16", "cpu_milli": 16_000,
+         "memory_mib": 64 * 1024,  "max_run_s": 3600, "max_estimate_s": 60},
+        {"name": "medium", "machine_type": "n2-standard-32", "cpu_milli": 32_000,
+         "memory_mib": 128 * 1024, "max_run_s": 3600, "max_estimate_s": 300},
+        {"name": "large",  "machine_type": "n2-standard-64", "cpu_milli": 64_000,
+         "memory_mib": 256 * 1024, "max_run_s": 3600, "max_estimate_s": 900},
+        {"name": "xl",     "machine_type": "n2-standard-96", "cpu_milli": 96_000,
+         "memory_mib": 384 * 1024, "max_run_s": 3600, "max_estimate_s": float("inf")},
+    ]
+
+    # ───────── Split rendering (border-render tiles, one Batch task each) ─────────
+    tile_mode:                          str = "off"   # "off" | "auto"
+    tile_min_estimate_s:                float = 900   # split renders whose reference estimate exceeds this
+    tile_target_s:                      float = 300   # reference seconds of work per tile
+    tile_max:                           int = 16
+
+    # ───────── /render job queue ─────────
+    job_backend:                        str = "memory"   # "memory" | "sqlite"
+    job_db_path:                        str = "/tmp/render-jobs.sqlite"
+    job_retention_s:                    int = 86400      # memory backend: keep finished jobs this long
+    job_max_finished:                   int = 10000      # memory backend: and at most this many
+    job_workers:                        int = 4          # builds running concurrently at most (admission decides)
+    render_batch_max_items:             int = 50         # renders per /render/batch request
+    render_batch_sessions:              int = 2          # Blender processes shared by one batch
+
+    # ───────── Admission control (per-instance resource budget) ─────────
+    admission_enabled:                  bool = True
+    admission_cpu:                      float = 0     # 0 = os.cpu_count()
+    admission_memory_mb:                int = 14336   # instance memory for builds and the /tmp caches
+    admission_tmp_in_memory:            bool = True   # Cloud Run: /tmp counts against memory
+    admission_queue_max:                int = 16      # jobs waiting to start; beyond → 429
+    admission_job_cpu:                  float = 2.0   # per build
+    admission_blender_base_mb:          int = 1024    # Blender with the base scene loaded
+    admission_memory_factor:            float = 3.0   # RAM per byte of model .blend loaded
+    admission_360_factor:               float = 1.5   # CPU / memory multiplier for 360 scenes
+    admission_default_model_mb:         int = 50      # size assumed when HEAD tells nothing
+    admission_head_timeout_s:           float = 5.0
+
+    # ───────── Shared HTTP fetcher ─────────
+    http_max_connections:               int = 64
+    http_max_connections_per_host:      int = 8
+    http_keepalive_s:                   int = 60
+    http_timeout_s:                     int = 900     # whole request, large .blend files included
+    http_connect_timeout_s:             int = 15
+    http_read_timeout_s:                int = 60      # stall detector between chunks
+    http_retries:                       int = 3
+    http_backoff_s:                     float = 0.5
+    http_chunk_kb:                      int = 1024
+    download_concurrency:               int = 16      # concurrent downloads across all jobs
+    download_max_mbps:                  float = 0     # instance-wide bandwidth cap, 0 = unlimited
+
+    # ───────── Model asset cache (shared by all jobs on the instance) ─────────
+    asset_cache_enabled:                bool = True
+    asset_cache_dir:                    str = "/tmp/asset-cache"
+    asset_cache_max_mb:                 int = 4096
+    asset_cache_revalidate_s:           int = 300     # trust a cached entry this long without a conditional GET
+
+    # ───────── Blender tool cache (scripts + base scenes) ─────────
+    tool_cache_dir:                     str = "/tmp/tool-cache"
+    tool_cache_ttl_s:                   int = 600     # background refresh period
+    tool_cache_timeout_s:               int = 60      # per refresh round; slower origins keep the stale copy
+    tool_cache_reserve_mb:              int = 512     # held back from the admission budget for these files
+
+    # ───────── Job scratch space (/tmp is instance memory on Cloud Run) ─────────
+    scratch_budget_mb:                  int = 6144    # all job directories together, 0 = unlimited
+    scratch_job_estimate_mb:            int = 1024    # reservation until per-object sizes are learned
+    scratch_wait_s:                     int = 600     # wait this long for space, then fail the job
+    log_retention_h:                    float = 24    # /logs/<id>.log older than this are removed, 0 = keep
 
     class Config:
         env_file = ".env"
@@ -6,16 +6,26 @@ Usage:
 
     python test/send_request.py http://127.0.0.1:9000
 """
-import sys, json, pprint, requests, pathlib
+import sys, json, pprint, requests, pathlib, time
 
 endpoint = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8080/render"
 payload  = json.loads(pathlib.Path(__file__).with_name("payload.json").read_text())
 
 print(f"POST → {endpoint}")
-resp = requests.post(endpoint, json=payload, timeout=60000)
+resp = requests.post(endpoint, json=payload, timeout=60)
 
 print("Status:", resp.status_code)
 try:
     pprint.pp(resp.json(), width=120)
 except ValueError:
     print(resp.text)
+    sys.exit(1)
+
+# poll the queued job until it is submitted to Batch (or failed)
+status_url = requests.compat.urljoin(endpoint, resp.headers.get("Location", ""))
+while resp.status_code == 202 or resp.json().get("status") in ("queued", "running"):
+    time.sleep(5)
+    resp = requests.get(status_url, timeout=60)
+    job = resp.json()
+    print(f"  {job.get('status')}  stage={job.get('stage')}")
+pprint.pp(resp.json(), width=120)
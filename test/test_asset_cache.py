@@ -0,0 +1,136 @@
+"""
+Asset cache against a local origin:  python -m pytest test/test_asset_cache.py
+"""
+import asyncio, hashlib, os, time
+
+from aiohttp import web
+
+from services.asset_cache import AssetCache, link_file
+from services.http_fetch import get_fetcher
+
+
+class Origin:
+    """Serves mutable bodies with an ETag, answering If-None-Match like a blob store."""
+
+    def __init__(self):
+        self.files: dict[str, tuple[bytes, str]] = {}
+        self.gets = 0
+        self.not_modified = 0
+
+    def put(self, name: str, body: bytes):
+        self.files[name] = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.gets += 1
+        body, etag = self.files[request.match_info["name"]]
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, headers={"ETag": etag})
+
+
+def _run(scenario):
+    """Start the origin, run ``scenario(origin, base_url)``, shut everything down."""
+    async def main():
+        origin = Origin()
+        app = web.Application()
+        app.router.add_get("/a/{name}", origin.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(origin, f"http://127.0.0.1:{port}/a/")
+        finally:
+            await get_fetcher().close()
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_miss_then_hit(tmp_path):
+    async def scenario(origin, base):
+        origin.put("m.blend", b"x" * 1000)
+        cache = AssetCache(tmp_path / "cache", 1 << 20, revalidate_s=3600)
+        await cache.fetch(base + "m.blend", tmp_path / "job1" / "m.blend")
+        await cache.fetch(base + "m.blend", tmp_path / "job2" / "m.blend")
+        return cache, origin, base
+
+    cache, origin, base = _run(scenario)
+    assert (cache.stats.misses, cache.stats.hits, origin.gets) == (1, 1, 1)
+    assert (tmp_path / "job2" / "m.blend").read_bytes() == b"x" * 1000
+    assert cache.size_of(base + "m.blend") == 1000
+
+
+def test_revalidation_304_keeps_the_cached_copy(tmp_path):
+    async def scenario(origin, base):
+        origin.put("m.blend", b"a" * 500)
+        cache = AssetCache(tmp_path / "cache", 1 << 20, revalidate_s=0)
+        first = await cache.fetch(base + "m.blend", tmp_path / "j1" / "m.blend")
+        second = await cache.fetch(base + "m.blend", tmp_path / "j2" / "m.blend")
+        return cache, origin, first, second
+
+    cache, origin, first, second = _run(scenario)
+    assert origin.gets == 2 and origin.not_modified == 1
+    assert (cache.stats.misses, cache.stats.revalidated, cache.stats.hits) == (1, 1, 1)
+    assert second.sha256 == first.sha256
+    assert (tmp_path / "j2" / "m.blend").read_bytes() == b"a" * 500
+
+
+def test_changed_etag_downloads_the_new_content(tmp_path):
+    async def scenario(origin, base):
+        origin.put("m.blend", b"old" * 100)
+        cache = AssetCache(tmp_path / "cache", 1 << 20, revalidate_s=0)
+        first = await cache.fetch(base + "m.blend", tmp_path / "j1" / "m.blend")
+        origin.put("m.blend", b"new" * 100)
+        second = await cache.fetch(base + "m.blend", tmp_path / "j2" / "m.blend")
+        return cache, origin, first, second
+
+    cache, origin, first, second = _run(scenario)
+    assert origin.not_modified == 0
+    assert (cache.stats.misses, cache.stats.revalidated) == (2, 0)
+    assert second.sha256 != first.sha256
+    assert (tmp_path / "j1" / "m.blend").read_bytes() == b"old" * 100   # job's link untouched
+    assert (tmp_path / "j2" / "m.blend").read_bytes() == b"new" * 100
+
+
+def test_lru_eviction_past_max_bytes(tmp_path):
+    async def scenario(origin, base):
+        for name in ("a", "b", "c"):
+            origin.put(name, name.encode() * 1000)
+        cache = AssetCache(tmp_path / "cache", 2500, revalidate_s=3600)
+        for name in ("a", "b", "a", "c"):             # "a" used again → "b" is oldest
+            await cache.fetch(base + name, tmp_path / "job" / name)
+            time.sleep(0.01)
+        return cache, base
+
+    cache, base = _run(scenario)
+    assert cache.stats.evictions == 1
+    assert cache.size_of(base + "b") is None
+    assert cache.size_of(base + "a") == 1000 and cache.size_of(base + "c") == 1000
+    assert cache.snapshot()["bytes"] <= 2500
+    assert (tmp_path / "job" / "b").read_bytes() == b"b" * 1000    # hard link survives
+
+
+def test_link_file_shares_the_inode(tmp_path):
+    src = tmp_path / "blob"
+    src.write_bytes(b"model")
+    dest = tmp_path / "job" / "models" / "m.blend"
+    link_file(src, dest)
+    link_file(src, dest)                               # replaces an existing file
+    assert os.stat(dest).st_ino == os.stat(src).st_ino
+    assert os.stat(src).st_nlink == 2
+
+
+def test_cached_blob_is_linked_into_jobs(tmp_path):
+    async def scenario(origin, base):
+        origin.put("m.blend", b"z" * 64)
+        cache = AssetCache(tmp_path / "cache", 1 << 20, revalidate_s=3600)
+        entry = await cache.fetch(base + "m.blend", tmp_path / "j1" / "m.blend")
+        await cache.fetch(base + "m.blend", tmp_path / "j2" / "m.blend")
+        return cache._blob_path(entry.sha256)
+
+    blob = _run(scenario)
+    inodes = {os.stat(p).st_ino for p in (blob, tmp_path / "j1" / "m.blend",
+                                          tmp_path / "j2" / "m.blend")}
+    assert len(inodes) == 1
@@ -0,0 +1,91 @@
+"""
+Streamed config.json against the reference dict path:  python -m pytest test/test_blender_config.py
+"""
+import io, json, math
+from pathlib import Path
+
+import pytest
+
+from models.scene import PostData
+from services import blender_config
+
+PATHS = (Path("/tmp/b/out.blend"), Path("/tmp/b/scene.gltf"), Path("/tmp/b/space.jpg"))
+
+
+def _obj(i: int, **over) -> dict:
+    o = {
+        "Name": f"model-{i % 7}", "ModelBlenderUri": f"https://cdn.example.com/m/{i % 7}.blend",
+        "InnerPath": "Object", "ObjectName": f"Obj_{i}",
+        "PositionX": i * 0.1, "PositionY": -i / 3, "PositionZ": 0.0,
+        "RotationX": 0, "RotationY": 0, "RotationZ": 90.0 * (i % 4),
+        "QuaternionX": 0, "QuaternionY": 0, "QuaternionZ": 0.7071067811865476,
+        "QuaternionW": 0.7071067811865476,
+        "IsCurtain": i % 5 == 0, "IsMirror": i % 9 == 0, "ShowLights": i % 3 == 0,
+    }
+    if o["ShowLights"]:
+        o.update({"LightsColor": "#ffeecc", "LightsPower": 40.0, "LightRadius": 0.05,
+                  "LightSourcesPositions": [{"X": 0.1 * k, "Y": 0.0, "Z": 1.2} for k in range(3)]})
+    o.update(over)
+    return o
+
+
+def _data(objs: list[dict]) -> PostData:
+    return PostData.model_validate({
+        "SceneObjects": objs, "RenderJobID": 1, "SpaceImageID": 1,
+        "SceneGLTFUri": "https://cdn.example.com/scene.gltf",
+        "SpaceImageUri": "https://cdn.example.com/space.jpg",
+        "ResX": 1920, "ResY": 1080, "Samples": 256,
+    })
+
+
+def _both(data: PostData, model_paths: list[str] | None = None) -> tuple[str, str]:
+    model_paths = model_paths or [f"/tmp/b/models/{o.name}.blend" for o in data.scene_objects]
+    buf = io.StringIO()
+    blender_config.stream_config(buf, *PATHS, data, model_paths)
+    return buf.getvalue(), json.dumps(blender_config.build_config(*PATHS, data, model_paths))
+
+
+@pytest.mark.parametrize("n", [0, 1, 1100])          # 1100 spans several write blocks
+def test_streamed_config_is_byte_identical(n):
+    streamed, reference = _both(_data([_obj(i) for i in range(n)]))
+    assert streamed == reference
+
+
+def test_non_ascii_names_and_paths():
+    data = _data([_obj(0, ObjectName="Sofá 沙发 🛋", InnerPath="Objekt/Größe", LightsColor=None),
+                  _obj(1, ObjectName=None, InnerPath=None)])
+    streamed, reference = _both(data, ["/tmp/b/models/möbel.blend", "/tmp/b/models/椅子.blend"])
+    assert streamed == reference
+    assert "\\u6c99" in streamed                          # escaped like json.dumps
+
+
+def test_signed_zero_and_extreme_floats():
+    data = _data([_obj(0, PositionX=-0.0, PositionY=0.0, PositionZ=1e-300,
+                       RotationX=5e-324, ScaleX=1.7976931348623157e308),
+                  _obj(1, PositionX=0.0, PositionY=-0.0)])  # ±0.0 compare equal: not cached
+    streamed, reference = _both(data)
+    assert streamed == reference
+    assert '"PositionX": -0.0' in streamed and '"PositionX": 0.0' in streamed
+
+
+@pytest.mark.parametrize("field,value", [("PositionX", math.nan), ("ScaleZ", math.inf),
+                                         ("LightsPower", -math.inf)])
+def test_non_finite_numbers_use_the_fallback(field, value):
+    over = {field: value, "ShowLights": True} if field == "LightsPower" else {field: value}
+    data = _data([_obj(0), _obj(1, **over), _obj(2)])
+    streamed, reference = _both(data)
+    assert streamed == reference
+
+
+def test_non_finite_light_position():
+    data = _data([_obj(3, LightSourcesPositions=[{"X": math.nan, "Y": 0.0, "Z": 1.0}])])
+    streamed, reference = _both(data)
+    assert streamed == reference
+    assert "NaN" in streamed
+
+
+def test_write_config_matches_the_reference(tmp_path):
+    data = _data([_obj(i) for i in range(20)])
+    model_paths = [f"/tmp/b/models/{o.name}.blend" for o in data.scene_objects]
+    cfg = blender_config.write_config(tmp_path, *PATHS, data, model_paths)
+    assert cfg.read_text() == json.dumps(blender_config.build_config(*PATHS, data, model_paths))
@@ -0,0 +1,92 @@
+"""
+Job queue / backend checks:  python -m pytest test/test_jobs.py
+"""
+import asyncio
+
+import pytest
+
+from services.jobs import (FAILED, QUEUED, SUBMITTED, JobBackend, JobQueue, JobRecord,
+                           MemoryBackend, SqliteBackend)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteBackend(str(tmp_path / "jobs.sqlite"))
+    return MemoryBackend()
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class NoActive(JobBackend):
+        def create(self, rec): ...
+        def get(self, render_job_id): ...
+        def save(self, rec): ...
+
+    with pytest.raises(TypeError):
+        NoActive()
+
+
+def test_create_deduplicates(backend):
+    rec, created = backend.create(JobRecord("r1", "{}"))
+    assert created
+    again, created = backend.create(JobRecord("r1", '{"other": 1}'))
+    assert not created
+    assert again.payload == "{}"
+
+    rec.status = SUBMITTED
+    backend.save(rec)
+    again, created = backend.create(JobRecord("r1", "{}"))
+    assert not created and again.status == SUBMITTED
+
+
+def test_failed_job_can_be_posted_again(backend):
+    rec, _ = backend.create(JobRecord("r1", "{}"))
+    rec.status, rec.error = FAILED, "boom"
+    backend.save(rec)
+
+    rec, created = backend.create(JobRecord("r1", '{"retry": 1}'))
+    assert created
+    assert rec.status == QUEUED and rec.error is None
+    assert backend.get("r1").payload == '{"retry": 1}'
+
+
+def test_sqlite_resumes_queued_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    SqliteBackend(path).create(JobRecord("r1", '{"n": 1}'))    # process "crashed" here
+
+    async def run():
+        ran = []
+
+        async def runner(rec, job):
+            ran.append((rec.render_job_id, rec.payload))
+            return {"ok": True}
+
+        q = JobQueue(SqliteBackend(path), runner, workers=1)
+        q.start()
+        for _ in range(100):
+            if q.get("r1").status == SUBMITTED:
+                break
+            await asyncio.sleep(0.01)
+        await q.stop()
+        return ran, q.get("r1")
+
+    ran, rec = asyncio.run(run())
+    assert ran == [("r1", '{"n": 1}')]
+    assert rec.status == SUBMITTED and rec.result == {"ok": True}
+    assert rec.payload == ""           # dropped once finished
+
+
+def test_memory_backend_evicts_finished_jobs():
+    backend = MemoryBackend(retention_s=3600, max_finished=2)
+    for rid in ("a", "b", "c"):
+        rec, _ = backend.create(JobRecord(rid, "{}"))
+        rec.status = SUBMITTED
+        backend.save(rec)
+    queued, _ = backend.create(JobRecord("d", "{}"))
+    assert backend.get("a") is None
+    assert backend.get("b") and backend.get("c") and backend.get("d")
+
+    backend.retention_s = -1         # everything finished is past retention
+    backend.create(JobRecord("e", "{}"))
+    assert backend.get("b") is None and backend.get("c") is None
+    assert backend.get("d") is queued  # active jobs are never evicted
@@ -0,0 +1,51 @@
+"""
+Stitching synthetic border-render tiles (stdlib PNG path):  python -m pytest test/test_stitcher.py
+"""
+import json
+
+import pytest
+
+from services import stitcher
+
+WIDTH, HEIGHT, CH = 7, 5, 3          # odd sizes: cells differ by a pixel
+
+
+def _pixel(x: int, y: int) -> bytes:
+    return bytes(((x * 31 + y * 7) % 256, (x * 13) % 256, (y * 53) % 256))
+
+
+def _write_tiles(tiles_dir, cols: int, rows: int, meta: dict | None = None):
+    for i in range(cols * rows):
+        p = stitcher.placement(i, cols, rows, WIDTH, HEIGHT)
+        p.update({"output": "frame_0001.png", "format": "PNG", **(meta or {})})
+        rows_ = [b"".join(_pixel(p["x"] + dx, p["y"] + dy) for dx in range(p["w"]))
+                 for dy in range(p["h"])]
+        stitcher.write_png(str(tiles_dir / f"tile_{i}.png"), p["w"], p["h"], CH, rows_)
+        (tiles_dir / f"tile_{i}.json").write_text(json.dumps(p))
+
+
+def test_2x2_grid_stitches_to_the_full_frame(tmp_path):
+    tiles, out = tmp_path / "tiles", tmp_path / "out"
+    tiles.mkdir(), out.mkdir()
+    _write_tiles(tiles, 2, 2)
+
+    path = stitcher.stitch(str(tiles), str(out))
+
+    assert path == str(out / "frame_0001.png")
+    w, h, ch, rows = stitcher.read_png(path)
+    assert (w, h, ch) == (WIDTH, HEIGHT, CH)
+    expected = [b"".join(_pixel(x, y) for x in range(WIDTH)) for y in range(HEIGHT)]
+    assert [bytes(r) for r in rows] == expected
+
+
+def test_cells_cover_the_frame_exactly():
+    cells = [stitcher.placement(i, 2, 2, WIDTH, HEIGHT) for i in range(4)]
+    assert sum(c["w"] * c["h"] for c in cells) == WIDTH * HEIGHT
+    assert {(c["x"], c["y"]) for c in cells} == {(0, 0), (3, 0), (0, 3), (3, 3)}
+
+
+def test_high_bit_output_needs_blender(tmp_path):
+    _write_tiles(tmp_path, 2, 2, {"format": "OPEN_EXR", "depth": "32"})
+    assert stitcher.high_bit(json.loads((tmp_path / "tile_0.json").read_text()))
+    with pytest.raises(SystemExit):
+        stitcher.stitch(str(tmp_path), str(tmp_path))